@@ -8,7 +8,7 @@ from decimal import Decimal
 from collections import defaultdict
 
 from apps.obras.models import Obra, Etapa
-from apps.funcionarios.models import Funcionario, ApontamentoFuncionario
+from apps.funcionarios.models import Funcionario, ApontamentoFuncionario, ResumoDiarioFuncionario
 # REMOVIDO em 22/02/2026: app fiscalização descontinuado
 # from apps.fiscalizacao.models import RegistroFiscalizacao
 
@@ -394,27 +394,33 @@ class AnalyticsService:
         hoje = datetime.now().date()
         data_inicio = hoje - timedelta(weeks=semanas)
         
-        apontamentos = ApontamentoFuncionario.objects.filter(
-            funcionario=funcionario,
-            data__gte=data_inicio
-        ).select_related('obra', 'etapa').order_by('-data')
+        # Uma linha por dia trabalhado (resumo materializado)
+        resumos = [
+            resumo
+            for resumo in ResumoDiarioFuncionario.do_periodo(funcionario, data_inicio)
+            if resumo.qtd_apontamentos
+        ]
+        obra_ids = {int(obra_id) for resumo in resumos for obra_id in resumo.obras}
+        nomes_obras = dict(Obra.all_objects.filter(pk__in=obra_ids).values_list('pk', 'nome'))
+        nomes_etapas = dict(Etapa.ETAPA_CHOICES)
         
         semanas_dict = defaultdict(list)
         
-        for apontamento in apontamentos:
-            semana = apontamento.data.isocalendar()[1]
-            ano = apontamento.data.year
+        for resumo in reversed(resumos):
+            semana = resumo.data.isocalendar()[1]
+            ano = resumo.data.year
             chave = f"{ano}-W{semana}"
+            etapas = sorted(int(numero) for numero in resumo.etapas)
             
             semanas_dict[chave].append({
-                'data': apontamento.data,
-                'obra': apontamento.obra.nome,
-                'etapa': str(apontamento.etapa) if apontamento.etapa else None,
-                'horas': apontamento.horas_trabalhadas,
-                'valor': apontamento.valor_diaria,
-                'clima': apontamento.clima,
-                'ociosidade': apontamento.houve_ociosidade,
-                'retrabalho': apontamento.houve_retrabalho,
+                'data': resumo.data,
+                'obra': ', '.join(nomes_obras.get(int(obra_id), '—') for obra_id in resumo.obras),
+                'etapa': ', '.join(nomes_etapas.get(numero, str(numero)) for numero in etapas) or None,
+                'horas': resumo.horas,
+                'valor': resumo.valor,
+                'clima': resumo.clima,
+                'ociosidade': resumo.houve_ociosidade,
+                'retrabalho': resumo.houve_retrabalho,
             })
         
         resultado = []
@@ -0,0 +1 @@
+# busca app
@@ -0,0 +1,141 @@
+"""
+Índice de autocomplete em memória (por processo) para obras, funcionários e etapas.
+
+Os nomes ficam normalizados (sem acentos, minúsculos) num array ordenado de
+(termo, posição); a busca por prefixo é um bisect, sem tocar no banco. O
+índice é reconstruído de forma preguiçosa quando a versão muda — incrementada
+após o commit pelos signals de Obra, Funcionario e Etapa (ver
+apps.busca.models).
+
+A versão fica no banco (relatorios.VersaoDados), compartilhada por todos os
+workers mesmo com o cache locmem, e cada processo a relê no máximo a cada
+VERSAO_RELEITURA_SEGUNDOS: uma edição chega aos outros workers (índice e ETag)
+nesse intervalo, e o autocomplete não consulta o banco a cada tecla.
+"""
+
+import bisect
+import threading
+import time
+
+from django.db import transaction
+
+from apps.funcionarios.models import Funcionario
+from apps.obras.models import Etapa, Obra
+from apps.relatorios.models import VersaoDados
+
+from .documentos import normalizar, tokens
+
+CHAVE_VERSAO_AUTOCOMPLETE = 'busca:autocomplete:versao'
+VERSAO_RELEITURA_SEGUNDOS = 5
+_autocomplete = {'versao': None, 'obras': None, 'status_obras': None, 'funcionarios': None, 'etapas': None}
+_autocomplete_lock = threading.Lock()
+_versao_lida = {'valor': None, 'em': 0.0}
+
+
+def versao_autocomplete():
+    agora = time.monotonic()
+    if _versao_lida['valor'] is None or agora - _versao_lida['em'] >= VERSAO_RELEITURA_SEGUNDOS:
+        _versao_lida['valor'] = VersaoDados.atual(CHAVE_VERSAO_AUTOCOMPLETE)
+        _versao_lida['em'] = agora
+    return _versao_lida['valor']
+
+
+def _incrementar_versao_autocomplete():
+    VersaoDados.incrementar(CHAVE_VERSAO_AUTOCOMPLETE)
+    # Este processo relê a versão já na próxima chamada
+    _versao_lida['valor'] = None
+
+
+def invalidar_autocomplete():
+    """Descarta o índice em memória quando a transação atual for confirmada."""
+    transaction.on_commit(_incrementar_versao_autocomplete)
+
+
+class _IndicePrefixos:
+    """Itens ordenados por nome + array ordenado de (termo, posição do item)."""
+
+    def __init__(self, itens, campo_nome):
+        self.itens = sorted(itens, key=lambda item: normalizar(item[campo_nome]))
+        self.termos = sorted(
+            (termo, posicao)
+            for posicao, item in enumerate(self.itens)
+            for termo in set(tokens(item[campo_nome]))
+        )
+
+    def _posicoes(self, termo):
+        posicoes = set()
+        i = bisect.bisect_left(self.termos, (termo,))
+        while i < len(self.termos) and self.termos[i][0].startswith(termo):
+            posicoes.add(self.termos[i][1])
+            i += 1
+        return posicoes
+
+    def buscar(self, q, filtro=None, limite=None):
+        termos = tokens(q)
+        if termos:
+            posicoes = self._posicoes(termos[0])
+            for termo in termos[1:]:
+                if not posicoes:
+                    break
+                posicoes &= self._posicoes(termo)
+            candidatos = (self.itens[p] for p in sorted(posicoes))
+        else:
+            candidatos = iter(self.itens)
+
+        resultados = []
+        for item in candidatos:
+            if filtro is None or filtro(item):
+                resultados.append(item)
+                if limite and len(resultados) >= limite:
+                    break
+        return resultados
+
+
+def _carregar():
+    versao = versao_autocomplete()
+    with _autocomplete_lock:
+        if _autocomplete['versao'] != versao:
+            obras = list(Obra.objects.filter(ativo=True).values('id', 'nome', 'status'))
+            funcao_display = dict(Funcionario.FUNCAO_CHOICES)
+            funcionarios = [
+                {**f, 'funcao_display': str(funcao_display.get(f['funcao'], f['funcao']))}
+                for f in Funcionario.objects.filter(ativo=True).values('id', 'nome_completo', 'funcao')
+            ]
+            etapa_display = dict(Etapa.ETAPA_CHOICES)
+            etapas = {}
+            for etapa in (
+                Etapa.objects.filter(obra__ativo=True, obra__deleted_at__isnull=True)
+                .order_by('obra_id', 'numero_etapa')
+                .values('id', 'obra_id', 'numero_etapa', 'status')
+            ):
+                etapas.setdefault(etapa['obra_id'], []).append({
+                    'id': etapa['id'],
+                    'label': etapa_display.get(etapa['numero_etapa'], str(etapa['numero_etapa'])),
+                    'status': etapa['status'],
+                })
+            _autocomplete['obras'] = _IndicePrefixos(obras, 'nome')
+            _autocomplete['status_obras'] = {obra['id']: obra['status'] for obra in obras}
+            _autocomplete['funcionarios'] = _IndicePrefixos(funcionarios, 'nome_completo')
+            _autocomplete['etapas'] = etapas
+            _autocomplete['versao'] = versao
+        return dict(_autocomplete)
+
+
+def sugerir_obras(q, limite=10, status=None):
+    """Obras ativas cujo nome tem palavras começando com os termos de `q`."""
+    filtro = (lambda obra: obra['status'] in status) if status else None
+    return _carregar()['obras'].buscar(q, filtro=filtro, limite=limite)
+
+
+def sugerir_funcionarios(q='', limite=None):
+    """Funcionários ativos (todos, em ordem alfabética, quando `q` é vazio)."""
+    return _carregar()['funcionarios'].buscar(q, limite=limite)
+
+
+def etapas_da_obra(obra_id, status_obra=None, status=None):
+    """Etapas de uma obra ativa, opcionalmente restritas ao status da obra/etapa."""
+    indice = _carregar()
+    status_atual = indice['status_obras'].get(obra_id)
+    if status_atual is None or (status_obra and status_atual not in status_obra):
+        return []
+    return [e for e in indice['etapas'].get(obra_id, []) if not status or e['status'] == status]
@@ -0,0 +1,94 @@
+"""
+Montagem do texto indexado de cada tipo de cadastro.
+
+As funções só leem atributos do objeto (sem consultas além das FKs já
+carregadas), por isso servem tanto para os models atuais quanto para os
+models históricos usados na migração que popula o índice.
+"""
+
+import re
+import unicodedata
+
+# Pontuação entre dígitos (CPF, telefone, CEP) é removida para que
+# "123.456.789-09" e "12345678909" gerem o mesmo token.
+_SEPARADOR_DIGITOS = re.compile(r'(?<=\d)[\s.\-/()]+(?=\d)')
+_NAO_ALFANUMERICO = re.compile(r'[^a-z0-9]+')
+
+
+def normalizar(texto):
+    """Minúsculas, sem acentos, só letras/dígitos separados por um espaço."""
+    if not texto:
+        return ''
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    texto = _SEPARADOR_DIGITOS.sub('', texto)
+    return _NAO_ALFANUMERICO.sub(' ', texto).strip()
+
+
+def tokens(texto):
+    return normalizar(texto).split()
+
+
+def _juntar(*partes):
+    return ' '.join(p for p in (normalizar(parte) for parte in partes) if p)
+
+
+def documento_obra(obra):
+    cliente = obra.cliente
+    return {
+        'titulo': obra.nome,
+        'subtitulo': cliente.nome if cliente else '',
+        'texto': _juntar(obra.nome, obra.endereco, cliente and cliente.nome, cliente and cliente.cpf),
+        'situacao': obra.status,
+        'ativo': obra.ativo and obra.deleted_at is None,
+    }
+
+
+def documento_cliente(cliente):
+    return {
+        'titulo': cliente.nome,
+        'subtitulo': cliente.cpf or cliente.telefone or '',
+        'texto': _juntar(cliente.nome, cliente.cpf, cliente.telefone, cliente.email),
+        'situacao': '',
+        'ativo': cliente.ativo,
+    }
+
+
+def documento_funcionario(funcionario):
+    funcao = funcionario.get_funcao_display()
+    return {
+        'titulo': funcionario.nome_completo,
+        'subtitulo': funcao,
+        'texto': _juntar(funcionario.nome_completo, funcao, funcionario.cpf),
+        'situacao': funcionario.funcao,
+        'ativo': funcionario.ativo,
+    }
+
+
+def documento_fornecedor(fornecedor):
+    return {
+        'titulo': fornecedor.nome,
+        'subtitulo': fornecedor.telefone or '',
+        'texto': _juntar(fornecedor.nome, fornecedor.endereco, fornecedor.telefone),
+        'situacao': '',
+        'ativo': fornecedor.ativo,
+    }
+
+
+def documento_ferramenta(ferramenta):
+    return {
+        'titulo': ferramenta.nome,
+        'subtitulo': ferramenta.codigo,
+        'texto': _juntar(ferramenta.codigo, ferramenta.nome, ferramenta.descricao),
+        'situacao': ferramenta.categoria,
+        'ativo': ferramenta.ativo,
+    }
+
+
+DOCUMENTOS = {
+    'obra': documento_obra,
+    'cliente': documento_cliente,
+    'funcionario': documento_funcionario,
+    'fornecedor': documento_fornecedor,
+    'ferramenta': documento_ferramenta,
+}
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.busca.models import FONTES, DocumentoBusca
+from apps.busca.services import invalidar_indice
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstroi o indice da busca global (DocumentoBusca) a partir dos cadastros. "
+        "Necessario apenas apos cargas que nao disparam signals (update em massa, loaddata): "
+        "o indice e mantido pelos signals de cada model."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tipo",
+            action="append",
+            choices=sorted(FONTES),
+            help="Reconstroi apenas o(s) tipo(s) informado(s) (pode repetir).",
+        )
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=500,
+            help="Quantidade de documentos gravados por upsert (padrao: 500).",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            totais = DocumentoBusca.reconstruir(options["tipo"], lote=options["lote"])
+            invalidar_indice()
+        for tipo, total in totais.items():
+            self.stdout.write(f"  {tipo}: {total}")
+        self.stdout.write(self.style.SUCCESS(f"Documentos indexados: {sum(totais.values())}"))
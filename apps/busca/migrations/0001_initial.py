@@ -0,0 +1,96 @@
+# Generated by Django 5.0.1 on 2026-10-17 17:58
+
+from django.db import migrations, models
+
+from apps.busca.documentos import DOCUMENTOS
+
+
+FONTES = {
+    'obra': ('obras', 'Obra', ('cliente',)),
+    'cliente': ('clientes', 'Cliente', ()),
+    'funcionario': ('funcionarios', 'Funcionario', ()),
+    'fornecedor': ('fornecedores', 'Fornecedor', ()),
+    'ferramenta': ('ferramentas', 'Ferramenta', ()),
+}
+
+# Full-text ('simple') e trigram sobre o texto normalizado. A expressão do
+# índice trigram bate com o SQL do Django para contains ("texto"::text LIKE).
+INDICES_BUSCA = [
+    (
+        'busca_doc_texto_fts_idx',
+        'CREATE INDEX IF NOT EXISTS busca_doc_texto_fts_idx ON busca_documentobusca '
+        "USING gin (to_tsvector('simple', texto))",
+    ),
+    (
+        'busca_doc_texto_trgm_idx',
+        'CREATE INDEX IF NOT EXISTS busca_doc_texto_trgm_idx ON busca_documentobusca '
+        'USING gin ((texto::text) gin_trgm_ops)',
+    ),
+]
+
+
+def popular_documentos(apps, schema_editor):
+    DocumentoBusca = apps.get_model('busca', 'DocumentoBusca')
+    for tipo, (app_label, nome_modelo, relacionados) in FONTES.items():
+        modelo = apps.get_model(app_label, nome_modelo)
+        montar = DOCUMENTOS[tipo]
+        documentos = []
+        for objeto in modelo.objects.select_related(*relacionados).iterator(chunk_size=1000):
+            dados = montar(objeto)
+            dados['titulo'] = (dados['titulo'] or '')[:255]
+            dados['subtitulo'] = (dados['subtitulo'] or '')[:255]
+            documentos.append(DocumentoBusca(tipo=tipo, objeto_id=objeto.pk, **dados))
+        DocumentoBusca.objects.bulk_create(documentos, batch_size=1000)
+
+
+def criar_indices_busca(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for _, sql in INDICES_BUSCA:
+        schema_editor.execute(sql)
+
+
+def remover_indices_busca(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nome, _ in INDICES_BUSCA:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {nome}')
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('clientes', '0002_alter_cliente_cpf'),
+        ('ferramentas', '0005_ferramenta_classificacao_fornecedor_and_more'),
+        ('fornecedores', '0001_initial'),
+        ('funcionarios', '0028_resumodiariofuncionario'),
+        ('obras', '0012_etapa1fundacao_aterro_contrapiso_inicio_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentoBusca',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('obra', 'Obra'), ('cliente', 'Cliente'), ('funcionario', 'Funcionário'), ('fornecedor', 'Fornecedor'), ('ferramenta', 'Ferramenta')], max_length=20, verbose_name='Tipo')),
+                ('objeto_id', models.PositiveBigIntegerField(verbose_name='ID do objeto')),
+                ('titulo', models.CharField(max_length=255, verbose_name='Título')),
+                ('subtitulo', models.CharField(blank=True, default='', max_length=255, verbose_name='Subtítulo')),
+                ('texto', models.TextField(blank=True, default='', verbose_name='Texto indexado')),
+                ('situacao', models.CharField(blank=True, default='', max_length=30, verbose_name='Situação')),
+                ('ativo', models.BooleanField(default=True, verbose_name='Ativo')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+            ],
+            options={
+                'verbose_name': 'Documento de Busca',
+                'verbose_name_plural': 'Documentos de Busca',
+                'indexes': [models.Index(fields=['tipo', 'ativo'], name='busca_doc_tipo_ativo_idx')],
+                'unique_together': {('tipo', 'objeto_id')},
+            },
+        ),
+        migrations.RunPython(criar_indices_busca, remover_indices_busca),
+        migrations.RunPython(popular_documentos, migrations.RunPython.noop),
+    ]
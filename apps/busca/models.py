@@ -0,0 +1,251 @@
+from django.db import models
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from apps.clientes.models import Cliente
+from apps.ferramentas.models import Ferramenta
+from apps.fornecedores.models import Fornecedor
+from apps.funcionarios.models import Funcionario
+from apps.obras.models import Etapa, Obra
+
+from .autocomplete import invalidar_autocomplete
+from .documentos import DOCUMENTOS, tokens
+
+# Cadastros indexados: model, gerenciador que enxerga todos os registros
+# (Obra usa soft delete), FKs usadas no texto, área de permissão e URL de
+# detalhe de cada resultado.
+FONTES = {
+    'obra': {
+        'modelo': Obra,
+        'gerenciador': 'all_objects',
+        'select_related': ('cliente',),
+        'area': 'obras',
+        'url': 'obras:obra_detail',
+    },
+    'cliente': {
+        'modelo': Cliente,
+        'gerenciador': 'objects',
+        'select_related': (),
+        'area': 'clientes',
+        'url': 'clientes:cliente_detail',
+    },
+    'funcionario': {
+        'modelo': Funcionario,
+        'gerenciador': 'objects',
+        'select_related': (),
+        'area': 'funcionarios',
+        'url': 'funcionarios:funcionario_detail',
+    },
+    'fornecedor': {
+        'modelo': Fornecedor,
+        'gerenciador': 'objects',
+        'select_related': (),
+        'area': 'fornecedores',
+        'url': 'fornecedores:fornecedor_detail',
+    },
+    'ferramenta': {
+        'modelo': Ferramenta,
+        'gerenciador': 'objects',
+        'select_related': (),
+        'area': 'ferramentas',
+        'url': 'ferramentas:ferramenta_detail',
+    },
+}
+
+CAMPOS_DOCUMENTO = ['titulo', 'subtitulo', 'texto', 'situacao', 'ativo', 'updated_at']
+
+
+class DocumentoBusca(models.Model):
+    """Texto normalizado (sem acentos, minúsculo) de um cadastro, para a busca global.
+
+    Mantido pelos signals dos models indexados; no PostgreSQL o campo `texto`
+    tem índices GIN de full-text e trigram (ver migração 0001).
+    """
+
+    TIPO_CHOICES = [
+        ('obra', 'Obra'),
+        ('cliente', 'Cliente'),
+        ('funcionario', 'Funcionário'),
+        ('fornecedor', 'Fornecedor'),
+        ('ferramenta', 'Ferramenta'),
+    ]
+
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES, verbose_name='Tipo')
+    objeto_id = models.PositiveBigIntegerField(verbose_name='ID do objeto')
+    titulo = models.CharField(max_length=255, verbose_name='Título')
+    subtitulo = models.CharField(max_length=255, blank=True, default='', verbose_name='Subtítulo')
+    texto = models.TextField(blank=True, default='', verbose_name='Texto indexado')
+    situacao = models.CharField(max_length=30, blank=True, default='', verbose_name='Situação')
+    ativo = models.BooleanField(default=True, verbose_name='Ativo')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
+
+    class Meta:
+        verbose_name = 'Documento de Busca'
+        verbose_name_plural = 'Documentos de Busca'
+        unique_together = [['tipo', 'objeto_id']]
+        indexes = [
+            models.Index(fields=['tipo', 'ativo'], name='busca_doc_tipo_ativo_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()}: {self.titulo}"
+
+    @staticmethod
+    def _queryset_fonte(tipo):
+        fonte = FONTES[tipo]
+        qs = getattr(fonte['modelo'], fonte['gerenciador']).all()
+        if fonte['select_related']:
+            qs = qs.select_related(*fonte['select_related'])
+        return qs
+
+    @classmethod
+    def indexar(cls, tipo, objetos):
+        """Grava (insert ou update) o documento de cada objeto em um único upsert."""
+        montar = DOCUMENTOS[tipo]
+        documentos = []
+        for objeto in objetos:
+            dados = montar(objeto)
+            dados['titulo'] = (dados['titulo'] or '')[:255]
+            dados['subtitulo'] = (dados['subtitulo'] or '')[:255]
+            documentos.append(cls(tipo=tipo, objeto_id=objeto.pk, **dados))
+        if documentos:
+            cls.objects.bulk_create(
+                documentos,
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=['tipo', 'objeto_id'],
+                update_fields=CAMPOS_DOCUMENTO,
+            )
+        return len(documentos)
+
+    @classmethod
+    def remover(cls, tipo, ids):
+        return cls.objects.filter(tipo=tipo, objeto_id__in=list(ids)).delete()[0]
+
+    @classmethod
+    def reconstruir(cls, tipos=None, lote=500):
+        """Reindexa os cadastros do zero e remove documentos de objetos apagados.
+
+        Retorna {tipo: quantidade indexada}.
+        """
+        totais = {}
+        for tipo in tipos or FONTES:
+            total = 0
+            ids = set()
+            pendentes = []
+            for objeto in cls._queryset_fonte(tipo).order_by('pk').iterator(chunk_size=lote):
+                pendentes.append(objeto)
+                ids.add(objeto.pk)
+                if len(pendentes) >= lote:
+                    total += cls.indexar(tipo, pendentes)
+                    pendentes = []
+            total += cls.indexar(tipo, pendentes)
+            orfaos = set(cls.objects.filter(tipo=tipo).values_list('objeto_id', flat=True)) - ids
+            if orfaos:
+                cls.remover(tipo, orfaos)
+            totais[tipo] = total
+        return totais
+
+    @classmethod
+    def filtrar(cls, tipo, q):
+        """IDs (subconsulta) dos objetos do tipo cujo texto contém todos os termos de `q`.
+
+        Usado pelas buscas das listagens: `qs.filter(pk__in=DocumentoBusca.filtrar(...))`.
+        O `contains` casa com o índice trigram no PostgreSQL.
+        """
+        qs = cls.objects.filter(tipo=tipo)
+        for termo in tokens(q):
+            qs = qs.filter(texto__contains=termo)
+        return qs.values('objeto_id')
+
+
+def _indexar_instancia(tipo, instance):
+    from .services import invalidar_indice
+
+    DocumentoBusca.indexar(tipo, [instance])
+    invalidar_indice()
+
+
+def _remover_instancia(tipo, instance):
+    from .services import invalidar_indice
+
+    DocumentoBusca.remover(tipo, [instance.pk])
+    invalidar_indice()
+
+
+@receiver(post_save, sender=Obra)
+def indexar_obra(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _indexar_instancia('obra', instance)
+
+
+@receiver(post_save, sender=Funcionario)
+def indexar_funcionario(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _indexar_instancia('funcionario', instance)
+
+
+@receiver(post_save, sender=Fornecedor)
+def indexar_fornecedor(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _indexar_instancia('fornecedor', instance)
+
+
+@receiver(post_save, sender=Ferramenta)
+def indexar_ferramenta(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _indexar_instancia('ferramenta', instance)
+
+
+@receiver(post_save, sender=Cliente)
+def indexar_cliente(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    _indexar_instancia('cliente', instance)
+    # Nome/CPF do cliente fazem parte do texto das obras dele.
+    DocumentoBusca.indexar('obra', Obra.all_objects.filter(cliente=instance).select_related('cliente'))
+
+
+@receiver(pre_delete, sender=Cliente)
+def guardar_obras_do_cliente(sender, instance, **kwargs):
+    # As obras ficam com cliente NULL (SET_NULL via update, sem signals).
+    instance._busca_obras_ids = list(Obra.all_objects.filter(cliente=instance).values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Cliente)
+def remover_cliente(sender, instance, **kwargs):
+    _remover_instancia('cliente', instance)
+    obras_ids = getattr(instance, '_busca_obras_ids', None)
+    if obras_ids:
+        DocumentoBusca.indexar('obra', Obra.all_objects.filter(pk__in=obras_ids).select_related('cliente'))
+
+
+@receiver(post_delete, sender=Obra)
+def remover_obra(sender, instance, **kwargs):
+    _remover_instancia('obra', instance)
+
+
+@receiver(post_delete, sender=Funcionario)
+def remover_funcionario(sender, instance, **kwargs):
+    _remover_instancia('funcionario', instance)
+
+
+@receiver(post_delete, sender=Fornecedor)
+def remover_fornecedor(sender, instance, **kwargs):
+    _remover_instancia('fornecedor', instance)
+
+
+@receiver(post_delete, sender=Ferramenta)
+def remover_ferramenta(sender, instance, **kwargs):
+    _remover_instancia('ferramenta', instance)
+
+
+@receiver(post_save, sender=Obra)
+@receiver(post_delete, sender=Obra)
+@receiver(post_save, sender=Funcionario)
+@receiver(post_delete, sender=Funcionario)
+@receiver(post_save, sender=Etapa)
+@receiver(post_delete, sender=Etapa)
+def invalidar_cache_autocomplete(sender, raw=False, **kwargs):
+    if not raw:
+        invalidar_autocomplete()
@@ -0,0 +1,166 @@
+"""
+Busca global ranqueada sobre DocumentoBusca.
+
+- PostgreSQL: full-text ('simple', termos com prefixo) + similaridade trigram,
+  ambos servidos pelos índices GIN criados na migração;
+- outros bancos (SQLite local): índice de prefixos em memória, reconstruído
+  de forma preguiçosa quando a versão no cache muda.
+
+A versão (compartilhada entre workers quando há Redis) é incrementada pelos
+signals dos cadastros indexados, após o commit.
+"""
+
+import bisect
+import threading
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.urls import reverse
+
+from config.access_control import has_area_permission
+
+from .documentos import normalizar
+from .models import FONTES, DocumentoBusca
+
+LIMITE_PADRAO = 10
+LIMITE_MAXIMO = 50
+
+CHAVE_VERSAO_INDICE = 'busca:indice:versao'
+_indice = {'versao': None, 'termos': [], 'postagens': {}, 'documentos': {}}
+_indice_lock = threading.Lock()
+
+TIPO_DISPLAY = dict(DocumentoBusca.TIPO_CHOICES)
+
+
+def _versao_indice():
+    cache.add(CHAVE_VERSAO_INDICE, 1, timeout=None)
+    return cache.get(CHAVE_VERSAO_INDICE) or 1
+
+
+def _incrementar_versao_indice():
+    _indice['versao'] = None
+    try:
+        cache.incr(CHAVE_VERSAO_INDICE)
+    except ValueError:
+        cache.set(CHAVE_VERSAO_INDICE, _versao_indice() + 1, timeout=None)
+
+
+def invalidar_indice():
+    """Descarta o índice em memória quando a transação atual for confirmada."""
+    transaction.on_commit(_incrementar_versao_indice)
+
+
+def _carregar_indice():
+    versao = _versao_indice()
+    with _indice_lock:
+        if _indice['versao'] != versao:
+            postagens = {}
+            documentos = {}
+            linhas = DocumentoBusca.objects.filter(ativo=True).values_list(
+                'pk', 'tipo', 'objeto_id', 'titulo', 'subtitulo', 'situacao', 'texto'
+            )
+            for pk, tipo, objeto_id, titulo, subtitulo, situacao, texto in linhas.iterator(chunk_size=2000):
+                documentos[pk] = (tipo, objeto_id, titulo, subtitulo, situacao, normalizar(titulo))
+                for termo in set(texto.split()):
+                    postagens.setdefault(termo, []).append(pk)
+            _indice['termos'] = sorted(postagens)
+            _indice['postagens'] = postagens
+            _indice['documentos'] = documentos
+            _indice['versao'] = versao
+        return _indice['termos'], _indice['postagens'], _indice['documentos']
+
+
+def _buscar_em_memoria(termos_consulta, consulta, tipos, situacoes, limite):
+    termos, postagens, documentos = _carregar_indice()
+    pontos = None
+    for termo in termos_consulta:
+        # 2 pontos para o termo exato, 1 para termos que só começam com ele.
+        pontos_termo = {}
+        i = bisect.bisect_left(termos, termo)
+        while i < len(termos) and termos[i].startswith(termo):
+            peso = 2 if termos[i] == termo else 1
+            for pk in postagens[termos[i]]:
+                if pontos_termo.get(pk, 0) < peso:
+                    pontos_termo[pk] = peso
+            i += 1
+        if pontos is None:
+            pontos = pontos_termo
+        else:
+            pontos = {pk: p + pontos_termo[pk] for pk, p in pontos.items() if pk in pontos_termo}
+        if not pontos:
+            return []
+
+    resultados = []
+    for pk, p in pontos.items():
+        tipo, objeto_id, titulo, subtitulo, situacao, titulo_normalizado = documentos[pk]
+        if tipo not in tipos or (situacoes and situacao not in situacoes):
+            continue
+        if titulo_normalizado.startswith(consulta):
+            p += 3
+        resultados.append((p, titulo, tipo, objeto_id, subtitulo))
+    resultados.sort(key=lambda r: (-r[0], r[1].lower()))
+    return [
+        {'tipo': tipo, 'id': objeto_id, 'titulo': titulo, 'subtitulo': subtitulo, 'relevancia': float(p)}
+        for p, titulo, tipo, objeto_id, subtitulo in resultados[:limite]
+    ]
+
+
+def _buscar_postgres(termos_consulta, consulta, tipos, situacoes, limite):
+    # Termos só têm [a-z0-9] (normalizar), então podem compor o tsquery.
+    parametros = {
+        'tsquery': ' & '.join(f'{termo}:*' for termo in termos_consulta),
+        'consulta': consulta,
+        'tipos': list(tipos),
+        'limite': limite,
+    }
+    filtro_situacao = ''
+    if situacoes:
+        filtro_situacao = 'AND d.situacao = ANY(%(situacoes)s)'
+        parametros['situacoes'] = list(situacoes)
+    sql = f"""
+        SELECT d.tipo, d.objeto_id, d.titulo, d.subtitulo,
+               ts_rank(to_tsvector('simple', d.texto), consulta) * 2
+               + word_similarity(%(consulta)s, d.texto)
+               + word_similarity(%(consulta)s, lower(d.titulo)) AS relevancia
+          FROM {DocumentoBusca._meta.db_table} d, to_tsquery('simple', %(tsquery)s) consulta
+         WHERE d.ativo
+           AND d.tipo = ANY(%(tipos)s)
+           {filtro_situacao}
+           AND (to_tsvector('simple', d.texto) @@ consulta OR %(consulta)s <%% d.texto)
+         ORDER BY relevancia DESC, d.titulo
+         LIMIT %(limite)s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, parametros)
+        return [
+            {'tipo': tipo, 'id': objeto_id, 'titulo': titulo, 'subtitulo': subtitulo, 'relevancia': float(relevancia)}
+            for tipo, objeto_id, titulo, subtitulo, relevancia in cursor.fetchall()
+        ]
+
+
+def buscar(q, tipos=None, limite=LIMITE_PADRAO, situacoes=None):
+    """Resultados ranqueados de `q` nos cadastros ativos dos `tipos` pedidos.
+
+    Cada resultado: {'tipo', 'tipo_display', 'id', 'titulo', 'subtitulo', 'url', 'relevancia'}.
+    """
+    consulta = normalizar(q)
+    termos_consulta = consulta.split()
+    tipos = [t for t in (tipos if tipos is not None else FONTES) if t in FONTES]
+    if not termos_consulta or not tipos:
+        return []
+    limite = max(1, min(int(limite), LIMITE_MAXIMO))
+
+    if connection.vendor == 'postgresql':
+        resultados = _buscar_postgres(termos_consulta, consulta, tipos, situacoes, limite)
+    else:
+        resultados = _buscar_em_memoria(termos_consulta, consulta, tipos, situacoes, limite)
+
+    for resultado in resultados:
+        resultado['tipo_display'] = TIPO_DISPLAY[resultado['tipo']]
+        resultado['url'] = reverse(FONTES[resultado['tipo']]['url'], args=[resultado['id']])
+    return resultados
+
+
+def tipos_permitidos(user, request=None):
+    """Tipos indexados cuja área o usuário pode visualizar."""
+    return [tipo for tipo, fonte in FONTES.items() if has_area_permission(user, fonte['area'], 'view', request)]
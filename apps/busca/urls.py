@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+app_name = 'busca'
+
+urlpatterns = [
+    path('', views.busca_api, name='busca_api'),
+]
@@ -0,0 +1,32 @@
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+
+from .services import LIMITE_PADRAO, buscar, tipos_permitidos
+
+
+@login_required
+def busca_api(request):
+    """Busca global ranqueada (obras, clientes, funcionários, fornecedores, ferramentas).
+
+    Query params:
+    - q: termos da busca (sem acentos/maiúsculas; casam como prefixo)
+    - tipo: restringe a um ou mais tipos (repetível ou separado por vírgula)
+    - limit: máximo de resultados (padrão 10, máximo 50)
+
+    Só retorna tipos cuja área o usuário pode visualizar.
+    """
+    q = request.GET.get('q', '').strip()
+    if not q:
+        return JsonResponse({'results': []})
+
+    try:
+        limit = int(request.GET.get('limit', LIMITE_PADRAO))
+    except (TypeError, ValueError):
+        limit = LIMITE_PADRAO
+
+    tipos = tipos_permitidos(request.user, request)
+    pedidos = {t.strip() for valor in request.GET.getlist('tipo') for t in valor.split(',') if t.strip()}
+    if pedidos:
+        tipos = [t for t in tipos if t in pedidos]
+
+    return JsonResponse({'results': buscar(q, tipos=tipos, limite=limit)})
@@ -1,8 +1,8 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db import models
 from .models import Cliente
+from apps.busca.models import DocumentoBusca
 from .forms import ClienteForm
 from django.core.paginator import Paginator
 
@@ -15,12 +15,7 @@ def cliente_list(request):
     # search
     busca = request.GET.get('q', '').strip()
     if busca:
-        qs = qs.filter(
-            models.Q(nome__icontains=busca)
-            | models.Q(cpf__icontains=busca)
-            | models.Q(telefone__icontains=busca)
-            | models.Q(email__icontains=busca)
-        )
+        qs = qs.filter(pk__in=DocumentoBusca.filtrar('cliente', busca))
 
     total_resultado = qs.count()
     clientes_qs = qs.order_by('nome')
@@ -1,10 +1,12 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db.models import Count
 from django.utils.html import format_html
 from .models import (
     Ferramenta, MovimentacaoFerramenta,
     ConferenciaFerramenta, ItemConferencia,
-    LocalizacaoFerramenta
+    LocalizacaoFerramenta, SnapshotEstoque
 )
+from .services import reparar_estoque, verificar_estoque
 
 
 class LocalizacaoFerramentaInline(admin.TabularInline):
@@ -44,6 +46,47 @@ class FerramentaAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).com_distribuicao()
+
+    actions = ['verificar_estoque_selecionadas', 'reparar_estoque_selecionadas']
+
+    def verificar_estoque_selecionadas(self, request, queryset):
+        relatorio = verificar_estoque(list(queryset.values_list('pk', flat=True)))
+        if not relatorio['ferramentas_divergentes']:
+            self.message_user(request, f"{relatorio['ferramentas_verificadas']} ferramenta(s) com estoque consistente.")
+            return
+        codigos = sorted({item['codigo'] for item in relatorio['totais'] + relatorio['localizacoes']})
+        self.message_user(
+            request,
+            f"{relatorio['ferramentas_divergentes']} ferramenta(s) com divergência: {', '.join(codigos[:20])}"
+            f"{'...' if len(codigos) > 20 else ''}",
+            level=messages.WARNING,
+        )
+    verificar_estoque_selecionadas.short_description = "Verificar consistência do estoque"
+
+    def reparar_estoque_selecionadas(self, request, queryset):
+        resultado = reparar_estoque(
+            list(queryset.values_list('pk', flat=True)), localizacoes=True, responsavel=request.user
+        )
+        self.message_user(
+            request,
+            f"Estoque corrigido pelo histórico: {resultado['localizacoes']} localização(ões), "
+            f"{resultado['totais']} total(is).",
+        )
+        if resultado['ignoradas']:
+            codigos = list(
+                Ferramenta.objects.filter(pk__in=resultado['ignoradas']).order_by('codigo').values_list('codigo', flat=True)
+            )
+            self.message_user(
+                request,
+                f"Localizações mantidas (sem histórico de movimentações completo): {', '.join(codigos[:20])}"
+                f"{'...' if len(codigos) > 20 else ''}",
+                level=messages.WARNING,
+            )
+    reparar_estoque_selecionadas.short_description = "Corrigir estoque pelo histórico de movimentações"
+    reparar_estoque_selecionadas.allowed_permissions = ('change',)
+
     def foto_thumb(self, obj):
         if obj.foto:
             return format_html('<img src="{}" width="50" height="50" />', obj.foto.url)
@@ -137,3 +180,21 @@ class ItemConferenciaAdmin(admin.ModelAdmin):
             return format_html('<span style="color: orange;">{}</span>', dif)
         return format_html('<span style="color: green;">0</span>')
     diferenca_display.short_description = 'Diferença'
+
+
+@admin.register(SnapshotEstoque)
+class SnapshotEstoqueAdmin(admin.ModelAdmin):
+    """Snapshots gerados pelo comando gerar_snapshots_estoque (somente leitura)."""
+    list_display = ['momento', 'total_itens', 'created_at']
+    date_hierarchy = 'momento'
+    readonly_fields = ['momento', 'created_at']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(_total_itens=Count('itens'))
+
+    def has_add_permission(self, request):
+        return False
+
+    def total_itens(self, obj):
+        return obj._total_itens
+    total_itens.short_description = 'Saldos'
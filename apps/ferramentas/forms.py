@@ -132,6 +132,9 @@ class MovimentacaoForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
+        self.fields['tipo'].choices = [
+            choice for choice in self.fields['tipo'].choices if choice[0] != 'ajuste_estoque'
+        ]
         self.fields['ferramenta'].queryset = Ferramenta.objects.filter(ativo=True).select_related('fornecedor').order_by('nome')
         self.fields['fornecedor_movimentacao'].queryset = Fornecedor.objects.filter(ativo=True).order_by('nome')
         self.fields['obra_origem'].queryset = Obra.objects.filter(ativo=True).order_by('nome')
@@ -200,7 +203,7 @@ class MovimentacaoForm(forms.ModelForm):
 
     def _build_ferramenta_saldos_map(self):
         mapa = {}
-        ferramentas = Ferramenta.objects.filter(ativo=True).only('id', 'quantidade_total')
+        ferramentas = Ferramenta.objects.filter(ativo=True).only('id', 'quantidade_total').com_distribuicao()
         for ferramenta in ferramentas:
             mapa[str(ferramenta.id)] = {
                 'deposito': ferramenta.quantidade_deposito,
@@ -229,7 +232,7 @@ class MovimentacaoForm(forms.ModelForm):
 
     def _build_ferramenta_info_map(self):
         mapa = {}
-        ferramentas = Ferramenta.objects.filter(ativo=True).select_related('fornecedor').order_by('nome')
+        ferramentas = Ferramenta.objects.filter(ativo=True).select_related('fornecedor').com_distribuicao().order_by('nome')
         for ferramenta in ferramentas:
             mapa[str(ferramenta.id)] = {
                 'classificacao': ferramenta.classificacao,
@@ -0,0 +1,70 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.ferramentas.models import SnapshotEstoque
+from apps.ferramentas.services import fim_do_dia
+
+
+def _data(valor):
+    try:
+        return datetime.date.fromisoformat(valor)
+    except ValueError:
+        raise CommandError(f"Data invalida: {valor} (use AAAA-MM-DD).")
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera snapshots da posicao do estoque de ferramentas (saldo por ferramenta e local) "
+        "no fim de cada dia informado, usados pelas consultas de posicao historica. "
+        "Sem opcoes, gera o snapshot de ontem (para rodar diariamente no cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--data",
+            type=_data,
+            action="append",
+            dest="datas",
+            help="Dia do snapshot, AAAA-MM-DD (pode repetir).",
+        )
+        parser.add_argument(
+            "--desde",
+            type=_data,
+            help="Gera snapshots a partir deste dia ate ontem, a cada --intervalo dias.",
+        )
+        parser.add_argument(
+            "--intervalo",
+            type=int,
+            default=7,
+            help="Intervalo em dias entre snapshots com --desde (padrao 7).",
+        )
+        parser.add_argument(
+            "--recriar",
+            action="store_true",
+            help="Recalcula o primeiro snapshot a partir de todo o historico, sem usar snapshots anteriores.",
+        )
+
+    def handle(self, *args, **options):
+        ontem = timezone.localdate() - datetime.timedelta(days=1)
+        datas = set(options["datas"] or [])
+        if options["desde"]:
+            if options["intervalo"] < 1:
+                raise CommandError("--intervalo deve ser maior que zero.")
+            dia = options["desde"]
+            while dia <= ontem:
+                datas.add(dia)
+                dia += datetime.timedelta(days=options["intervalo"])
+        if not datas:
+            datas = {ontem}
+
+        futuras = [dia for dia in datas if dia > ontem]
+        if futuras:
+            raise CommandError(f"So e possivel gerar snapshot de dias encerrados (ate {ontem.isoformat()}).")
+
+        # Em ordem: cada snapshot parte do anterior.
+        for indice, dia in enumerate(sorted(datas)):
+            snapshot = SnapshotEstoque.gerar(fim_do_dia(dia), recriar=options["recriar"] and indice == 0)
+            self.stdout.write(f"{dia.isoformat()}: {snapshot.itens.count()} saldo(s) por ferramenta/local.")
+        self.stdout.write(self.style.SUCCESS(f"Snapshots gerados: {len(datas)}"))
@@ -0,0 +1,97 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.ferramentas.services import reparar_estoque, verificar_estoque
+
+
+class Command(BaseCommand):
+    help = (
+        "Confere o estoque de todas as ferramentas: quantidade_total x soma das localizacoes "
+        "(consulta agrupada) e localizacoes x historico de movimentacoes (passada em streaming). "
+        "Sem --apply apenas relata; com --apply corrige as localizacoes pelo historico e os totais "
+        "pela soma das localizacoes, registrando cada local alterado como movimentacao de ajuste em "
+        "nome de --usuario (ferramentas sem historico completo mantem as localizacoes). "
+        "--json gera o relatorio em JSON (para o cron noturno)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ferramenta",
+            type=int,
+            action="append",
+            dest="ferramentas",
+            help="ID da ferramenta (pode repetir). Padrao: todas.",
+        )
+        parser.add_argument(
+            "--sem-historico",
+            action="store_true",
+            help="Confere apenas totais x localizacoes, sem acumular o historico de movimentacoes.",
+        )
+        parser.add_argument(
+            "--apply",
+            action="store_true",
+            help="Corrige as divergencias no banco. Sem esta flag, roda em modo simulacao.",
+        )
+        parser.add_argument(
+            "--usuario",
+            help="Username do responsavel pelas movimentacoes de ajuste (obrigatorio com --apply, salvo --sem-historico).",
+        )
+        parser.add_argument("--json", action="store_true", help="Escreve o relatorio em JSON no stdout.")
+        parser.add_argument("--saida", help="Grava o relatorio JSON neste arquivo.")
+
+    def handle(self, *args, **options):
+        historico = not options["sem_historico"]
+        responsavel = None
+        if options["apply"] and historico:
+            if not options["usuario"]:
+                raise CommandError("Informe --usuario para registrar os ajustes de localizacao.")
+            try:
+                responsavel = get_user_model().objects.get(username=options["usuario"])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"Usuario '{options['usuario']}' nao encontrado.")
+        relatorio = verificar_estoque(options["ferramentas"], historico=historico)
+
+        relatorio["reparo"] = None
+        if options["apply"] and relatorio["ferramentas_divergentes"]:
+            ids = {item["ferramenta_id"] for item in relatorio["totais"] + (relatorio["localizacoes"] or [])}
+            relatorio["reparo"] = reparar_estoque(ids, localizacoes=historico, responsavel=responsavel)
+
+        if options["saida"]:
+            with open(options["saida"], "w", encoding="utf-8") as arquivo:
+                json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+        if options["json"]:
+            self.stdout.write(json.dumps(relatorio, ensure_ascii=False, indent=2))
+            return
+
+        self.stdout.write(
+            f"{relatorio['ferramentas_verificadas']} ferramenta(s) verificada(s); "
+            f"{relatorio['ferramentas_divergentes']} com divergencia."
+        )
+        for item in relatorio["totais"]:
+            self.stdout.write(
+                f"  {item['codigo']}: total={item['quantidade_total']}, "
+                f"soma das localizacoes={item['soma_localizacoes']}"
+            )
+        for item in relatorio["localizacoes"] or []:
+            local = f"obra {item['obra_id']}" if item["local_tipo"] == "obra" else item["local_tipo"]
+            self.stdout.write(
+                f"  {item['codigo']} em {local}: atual={item['atual']}, pelo historico={item['esperado']}"
+            )
+        for item in relatorio["historico_incompleto"] or []:
+            self.stdout.write(
+                f"  {item['codigo']}: historico de movimentacoes incompleto; localizacoes nao serao alteradas"
+            )
+
+        if not relatorio["ferramentas_divergentes"]:
+            self.stdout.write(self.style.SUCCESS("Estoque consistente."))
+        elif relatorio["reparo"] is None:
+            self.stdout.write(self.style.WARNING("Use --apply para corrigir as divergencias."))
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Corrigido: {relatorio['reparo']['localizacoes']} localizacao(oes), "
+                    f"{relatorio['reparo']['totais']} total(is)."
+                )
+            )
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.1 on 2026-10-17 18:08
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def corrigir_saldos_negativos(apps, schema_editor):
+    # O motor antigo apagava localizações com saldo <= 0 e podia deixar o total
+    # negativo; corrige antes de criar as constraints.
+    Ferramenta = apps.get_model('ferramentas', 'Ferramenta')
+    LocalizacaoFerramenta = apps.get_model('ferramentas', 'LocalizacaoFerramenta')
+    LocalizacaoFerramenta.objects.filter(quantidade__lt=0).delete()
+    soma = (
+        LocalizacaoFerramenta.objects.filter(ferramenta_id=OuterRef('pk'))
+        .values('ferramenta_id')
+        .annotate(total=Sum('quantidade'))
+        .values('total')
+    )
+    Ferramenta.objects.filter(quantidade_total__lt=0).update(quantidade_total=Coalesce(Subquery(soma), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ferramentas', '0005_ferramenta_classificacao_fornecedor_and_more'),
+        ('fornecedores', '0001_initial'),
+        ('obras', '0012_etapa1fundacao_aterro_contrapiso_inicio_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(corrigir_saldos_negativos, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ferramenta',
+            constraint=models.CheckConstraint(check=models.Q(('quantidade_total__gte', 0)), name='ferramenta_quantidade_total_nao_negativa'),
+        ),
+        migrations.AddConstraint(
+            model_name='localizacaoferramenta',
+            constraint=models.CheckConstraint(check=models.Q(('quantidade__gte', 0)), name='localizacao_quantidade_nao_negativa'),
+        ),
+    ]
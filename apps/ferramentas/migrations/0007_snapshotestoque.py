@@ -0,0 +1,69 @@
+# Generated by Django 5.0.1 on 2026-10-17 18:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ferramentas', '0006_estoque_nao_negativo'),
+        ('obras', '0012_etapa1fundacao_aterro_contrapiso_inicio_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotEstoque',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('momento', models.DateTimeField(unique=True, verbose_name='Momento')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+            ],
+            options={
+                'verbose_name': 'Snapshot de Estoque',
+                'verbose_name_plural': 'Snapshots de Estoque',
+                'ordering': ['-momento'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SnapshotEstoqueItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('local_tipo', models.CharField(choices=[('deposito', 'Depósito'), ('obra', 'Em Obra'), ('manutencao', 'Manutenção'), ('perdida', 'Perdida/Extraviada')], max_length=20, verbose_name='Tipo de Local')),
+                ('quantidade', models.IntegerField(verbose_name='Quantidade')),
+            ],
+            options={
+                'verbose_name': 'Item de Snapshot de Estoque',
+                'verbose_name_plural': 'Itens de Snapshot de Estoque',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='movimentacaoferramenta',
+            index=models.Index(fields=['data_movimentacao'], name='ferr_mov_data_idx'),
+        ),
+        migrations.AddField(
+            model_name='snapshotestoqueitem',
+            name='ferramenta',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots_estoque', to='ferramentas.ferramenta', verbose_name='Ferramenta'),
+        ),
+        migrations.AddField(
+            model_name='snapshotestoqueitem',
+            name='obra',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='snapshots_estoque_ferramentas', to='obras.obra', verbose_name='Obra'),
+        ),
+        migrations.AddField(
+            model_name='snapshotestoqueitem',
+            name='snapshot',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='itens', to='ferramentas.snapshotestoque', verbose_name='Snapshot'),
+        ),
+        migrations.AddIndex(
+            model_name='snapshotestoqueitem',
+            index=models.Index(fields=['snapshot', 'ferramenta'], name='ferr_snapitem_snap_ferr_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='snapshotestoqueitem',
+            index=models.Index(fields=['snapshot', 'obra'], name='ferr_snapitem_snap_obra_idx'),
+        ),
+    ]
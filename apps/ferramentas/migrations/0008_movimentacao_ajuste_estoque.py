@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-17 18:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ferramentas', '0007_snapshotestoque'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='movimentacaoferramenta',
+            name='tipo',
+            field=models.CharField(choices=[('entrada_deposito', 'Entrada no Depósito (Compra/Recebimento)'), ('saida_obra', 'Saída para Obra'), ('transferencia', 'Transferência entre Obras'), ('retorno_deposito', 'Retorno ao Depósito'), ('envio_manutencao', 'Envio para Manutenção'), ('retorno_manutencao', 'Retorno de Manutenção'), ('perda', 'Perda/Extravio'), ('descarte', 'Descarte/Baixa'), ('devolver_fornecedor', 'Devolver ao Fornecedor'), ('ajuste_estoque', 'Ajuste de Estoque (correção pelo histórico)')], max_length=25, verbose_name='Tipo de Movimentação'),
+        ),
+    ]
@@ -3,12 +3,36 @@ from decimal import Decimal
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from django.db import models, transaction
-from django.db.models import F, Q, Sum
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 from apps.fornecedores.models import Fornecedor
 from apps.obras.models import Obra
 
 
+# Anotação de com_distribuicao() usada por cada propriedade de quantidade por local.
+ANOTACOES_DISTRIBUICAO = {
+    'deposito': '_qtd_deposito',
+    'obra': '_qtd_obras',
+    'manutencao': '_qtd_manutencao',
+    'perdida': '_qtd_perdida',
+}
+
+
+class FerramentaQuerySet(models.QuerySet):
+    def com_distribuicao(self):
+        """Anota a quantidade em depósito, obras, manutenção e perdida em uma única consulta.
+
+        As propriedades quantidade_deposito/em_obras/manutencao/perdida usam as
+        anotações quando presentes, sem consultar as localizações de novo.
+        """
+        return self.annotate(**{
+            anotacao: Coalesce(Sum('localizacoes__quantidade', filter=Q(localizacoes__local_tipo=local_tipo)), 0)
+            for local_tipo, anotacao in ANOTACOES_DISTRIBUICAO.items()
+        })
+
+
 class Ferramenta(models.Model):
     """Representa um tipo/modelo de ferramenta."""
 
@@ -65,10 +89,18 @@ class Ferramenta(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
 
+    objects = FerramentaQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Ferramenta'
         verbose_name_plural = 'Ferramentas'
         ordering = ['nome']
+        constraints = [
+            models.CheckConstraint(
+                check=Q(quantidade_total__gte=0),
+                name='ferramenta_quantidade_total_nao_negativa',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.codigo} - {self.nome} ({self.quantidade_total} un.)'
@@ -77,22 +109,37 @@ class Ferramenta(models.Model):
     def eh_alugada(self):
         return self.classificacao == 'alugada'
 
+    def _quantidade_anotada(self, local_tipo):
+        return self.__dict__.get(ANOTACOES_DISTRIBUICAO[local_tipo])
+
     @property
     def quantidade_deposito(self):
+        anotada = self._quantidade_anotada('deposito')
+        if anotada is not None:
+            return anotada
         loc = self.localizacoes.filter(local_tipo='deposito').first()
         return loc.quantidade if loc else 0
 
     @property
     def quantidade_em_obras(self):
+        anotada = self._quantidade_anotada('obra')
+        if anotada is not None:
+            return anotada
         return self.localizacoes.filter(local_tipo='obra').aggregate(total=Sum('quantidade'))['total'] or 0
 
     @property
     def quantidade_manutencao(self):
+        anotada = self._quantidade_anotada('manutencao')
+        if anotada is not None:
+            return anotada
         loc = self.localizacoes.filter(local_tipo='manutencao').first()
         return loc.quantidade if loc else 0
 
     @property
     def quantidade_perdida(self):
+        anotada = self._quantidade_anotada('perdida')
+        if anotada is not None:
+            return anotada
         loc = self.localizacoes.filter(local_tipo='perdida').first()
         return loc.quantidade if loc else 0
 
@@ -180,6 +227,10 @@ class LocalizacaoFerramenta(models.Model):
                 condition=Q(local_tipo='obra'),
                 name='unique_ferramenta_obra',
             ),
+            models.CheckConstraint(
+                check=Q(quantidade__gte=0),
+                name='localizacao_quantidade_nao_negativa',
+            ),
         ]
 
     def __str__(self):
@@ -240,6 +291,8 @@ class MovimentacaoFerramenta(models.Model):
         ('perda', 'Perda/Extravio'),
         ('descarte', 'Descarte/Baixa'),
         ('devolver_fornecedor', 'Devolver ao Fornecedor'),
+        # Gravado só por reparar_estoque para documentar a correção; não movimenta estoque.
+        ('ajuste_estoque', 'Ajuste de Estoque (correção pelo histórico)'),
     ]
     tipo = models.CharField(max_length=25, choices=TIPO_CHOICES, verbose_name='Tipo de Movimentação')
 
@@ -275,6 +328,10 @@ class MovimentacaoFerramenta(models.Model):
         verbose_name = 'Movimentação de Ferramenta'
         verbose_name_plural = 'Movimentações de Ferramentas'
         ordering = ['-data_movimentacao']
+        indexes = [
+            # Faixas de data das posições históricas (services.estoque_em).
+            models.Index(fields=['data_movimentacao'], name='ferr_mov_data_idx'),
+        ]
 
     def __str__(self):
         return (
@@ -316,85 +373,12 @@ class MovimentacaoFerramenta(models.Model):
             self.atualizar_localizacoes()
 
     def atualizar_localizacoes(self):
-        ferramenta = self.ferramenta
-        quantidade = self.quantidade
+        """Aplica a movimentação no estoque (ver apps.ferramentas.services.aplicar_movimentacoes)."""
+        from .services import aplicar_movimentacoes
 
-        if self.tipo == 'entrada_deposito':
-            self._adicionar_em_localizacao('deposito', None, quantidade)
-            ferramenta.quantidade_total = F('quantidade_total') + quantidade
-            ferramenta.save(update_fields=['quantidade_total'])
-            ferramenta.refresh_from_db()
-
-        elif self.tipo == 'saida_obra':
-            self._remover_de_localizacao('deposito', None, quantidade)
-            self._adicionar_em_localizacao('obra', self.obra_destino, quantidade)
-
-        elif self.tipo == 'transferencia':
-            self._remover_de_localizacao('obra', self.obra_origem, quantidade)
-            self._adicionar_em_localizacao('obra', self.obra_destino, quantidade)
-
-        elif self.tipo == 'retorno_deposito':
-            self._remover_de_localizacao('obra', self.obra_origem, quantidade)
-            self._adicionar_em_localizacao('deposito', None, quantidade)
-
-        elif self.tipo == 'envio_manutencao':
-            if self.obra_origem:
-                self._remover_de_localizacao('obra', self.obra_origem, quantidade)
-            else:
-                self._remover_de_localizacao('deposito', None, quantidade)
-            self._adicionar_em_localizacao('manutencao', None, quantidade)
-
-        elif self.tipo == 'retorno_manutencao':
-            self._remover_de_localizacao('manutencao', None, quantidade)
-            self._adicionar_em_localizacao('deposito', None, quantidade)
-
-        elif self.tipo == 'perda':
-            if self.obra_origem:
-                self._remover_de_localizacao('obra', self.obra_origem, quantidade)
-            else:
-                self._remover_de_localizacao('deposito', None, quantidade)
-            self._adicionar_em_localizacao('perdida', None, quantidade)
-
-        elif self.tipo == 'descarte':
-            if self.obra_origem:
-                self._remover_de_localizacao('obra', self.obra_origem, quantidade)
-            else:
-                self._remover_de_localizacao('deposito', None, quantidade)
-            ferramenta.quantidade_total = F('quantidade_total') - quantidade
-            ferramenta.save(update_fields=['quantidade_total'])
-            ferramenta.refresh_from_db()
-
-        elif self.tipo == 'devolver_fornecedor':
-            self._remover_de_localizacao('deposito', None, quantidade)
-            ferramenta.quantidade_total = F('quantidade_total') - quantidade
-            ferramenta.save(update_fields=['quantidade_total'])
-            ferramenta.refresh_from_db()
-
-    def _adicionar_em_localizacao(self, local_tipo, obra, quantidade):
-        filtro = {'ferramenta': self.ferramenta, 'local_tipo': local_tipo}
-        if local_tipo == 'obra':
-            filtro['obra'] = obra
-
-        loc, created = LocalizacaoFerramenta.objects.get_or_create(
-            **filtro,
-            defaults={'quantidade': quantidade},
-        )
-        if not created:
-            LocalizacaoFerramenta.objects.filter(pk=loc.pk).update(quantidade=F('quantidade') + quantidade)
-
-    def _remover_de_localizacao(self, local_tipo, obra, quantidade):
-        filtro = {'ferramenta': self.ferramenta, 'local_tipo': local_tipo}
-        if local_tipo == 'obra':
-            filtro['obra'] = obra
-
-        try:
-            loc = LocalizacaoFerramenta.objects.get(**filtro)
-            LocalizacaoFerramenta.objects.filter(pk=loc.pk).update(quantidade=F('quantidade') - quantidade)
-            loc.refresh_from_db()
-            if loc.quantidade <= 0:
-                loc.delete()
-        except LocalizacaoFerramenta.DoesNotExist:
-            pass
+        totais = aplicar_movimentacoes([self])
+        if self.ferramenta_id in totais:
+            self.ferramenta.quantidade_total = totais[self.ferramenta_id]
 
 
 class ConferenciaFerramenta(models.Model):
@@ -504,3 +488,93 @@ class ItemConferencia(models.Model):
             self.status = 'sobra'
 
         super().save(*args, **kwargs)
+
+
+class SnapshotEstoque(models.Model):
+    """Posição do estoque (saldo por ferramenta e local) num momento.
+
+    Inclui as movimentações com data_movimentacao anterior a `momento`. As
+    consultas de posição histórica (services.estoque_em) partem do snapshot
+    mais próximo e acumulam só as movimentações seguintes.
+    """
+
+    momento = models.DateTimeField(unique=True, verbose_name='Momento')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
+
+    class Meta:
+        verbose_name = 'Snapshot de Estoque'
+        verbose_name_plural = 'Snapshots de Estoque'
+        ordering = ['-momento']
+
+    def __str__(self):
+        return f'Estoque em {timezone.localtime(self.momento).strftime("%d/%m/%Y %H:%M")}'
+
+    @classmethod
+    def gerar(cls, momento, recriar=False):
+        """Grava (ou substitui) o snapshot de `momento`.
+
+        Parte do snapshot anterior mais próximo; com recriar=True acumula todo o
+        histórico de movimentações. Retorna o snapshot.
+        """
+        from .services import estoque_em
+
+        with transaction.atomic():
+            cls.objects.filter(momento=momento).delete()
+            saldos = estoque_em(momento, usar_snapshot=not recriar)
+            snapshot = cls.objects.create(momento=momento)
+            SnapshotEstoqueItem.objects.bulk_create(
+                [
+                    SnapshotEstoqueItem(
+                        snapshot=snapshot,
+                        ferramenta_id=ferramenta_id,
+                        local_tipo=local_tipo,
+                        obra_id=obra_id,
+                        quantidade=quantidade,
+                    )
+                    for (ferramenta_id, local_tipo, obra_id), quantidade in saldos.items()
+                ],
+                batch_size=1000,
+            )
+        return snapshot
+
+
+class SnapshotEstoqueItem(models.Model):
+    snapshot = models.ForeignKey(
+        SnapshotEstoque,
+        on_delete=models.CASCADE,
+        related_name='itens',
+        verbose_name='Snapshot',
+    )
+    ferramenta = models.ForeignKey(
+        Ferramenta,
+        on_delete=models.CASCADE,
+        related_name='snapshots_estoque',
+        verbose_name='Ferramenta',
+    )
+    local_tipo = models.CharField(
+        max_length=20,
+        choices=LocalizacaoFerramenta.LOCAL_TIPO_CHOICES,
+        verbose_name='Tipo de Local',
+    )
+    # SET_NULL como obra_origem/obra_destino das movimentações. Itens de obras
+    # excluídas ficam com obra NULL e são somados na leitura (services.estoque_em).
+    obra = models.ForeignKey(
+        Obra,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='snapshots_estoque_ferramentas',
+        verbose_name='Obra',
+    )
+    quantidade = models.IntegerField(verbose_name='Quantidade')
+
+    class Meta:
+        verbose_name = 'Item de Snapshot de Estoque'
+        verbose_name_plural = 'Itens de Snapshot de Estoque'
+        indexes = [
+            models.Index(fields=['snapshot', 'ferramenta'], name='ferr_snapitem_snap_ferr_idx'),
+            models.Index(fields=['snapshot', 'obra'], name='ferr_snapitem_snap_obra_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.snapshot} - {self.ferramenta_id} {self.local_tipo} {self.obra_id or ""}: {self.quantidade}'
@@ -0,0 +1,659 @@
+"""
+Motor de estoque de ferramentas.
+
+Uma movimentação vira "pernas": saída de um local (delta negativo), entrada em
+outro (delta positivo) e, para entrada/descarte/devolução, variação de
+Ferramenta.quantidade_total. `aplicar_deltas` aplica as pernas de uma ou várias
+movimentações numa transação:
+
+- trava as ferramentas envolvidas (SELECT ... FOR UPDATE em ordem de pk, a
+  mesma ordem para todas as transações, evitando deadlock);
+- confere o saldo dos locais de saída numa consulta e levanta
+  EstoqueInsuficiente antes de escrever;
+- um UPDATE para todas as saídas e um upsert (INSERT ... ON CONFLICT DO UPDATE)
+  por tipo de local para as entradas;
+- apaga as localizações zeradas e atualiza quantidade_total num UPDATE.
+
+As CheckConstraints de LocalizacaoFerramenta.quantidade e
+Ferramenta.quantidade_total rejeitam saldo negativo no banco mesmo para
+escritas que não passem por aqui.
+
+`movimentar_em_lote` registra uma movimentação por ferramenta de um kit (envio
+para obra, retorno ao depósito) com um bulk_create e uma única aplicação de
+estoque para todos os itens.
+
+`estoque_em` reconstrói a posição do estoque num momento passado a partir do
+SnapshotEstoque anterior mais próximo, acumulando só as movimentações seguintes;
+`estoque_na_conferencia` usa essa posição para comparar uma ConferenciaFerramenta
+com o que o sistema registrava na obra no momento dela.
+
+`verificar_estoque` confere o inventário inteiro (totais x soma das
+localizações numa consulta agrupada; localizações x histórico de
+movimentações numa passada em streaming) e `reparar_estoque` corrige as
+divergências em lote.
+"""
+
+import datetime
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Ferramenta, LocalizacaoFerramenta, MovimentacaoFerramenta, SnapshotEstoque
+
+
+class EstoqueInsuficiente(ValidationError):
+    """Saída maior que o saldo do local (ou que o total da ferramenta)."""
+
+
+def pernas_movimentacao(tipo, quantidade, obra_origem_id=None, obra_destino_id=None, origem_tipo=''):
+    """
+    Pernas de uma movimentação: ([(local_tipo, obra_id, delta), ...], delta_total).
+
+    A origem de envio_manutencao/perda/descarte vem de origem_tipo, de modo que
+    uma obra excluída (obra_origem NULL) não vira saída do depósito; só
+    movimentações antigas sem origem_tipo usam a presença de obra_origem.
+    """
+    da_obra = origem_tipo == 'obra' if origem_tipo else bool(obra_origem_id)
+    origem = ('obra', obra_origem_id) if da_obra else ('deposito', None)
+
+    if tipo == 'entrada_deposito':
+        return [('deposito', None, quantidade)], quantidade
+    if tipo == 'saida_obra':
+        return [('deposito', None, -quantidade), ('obra', obra_destino_id, quantidade)], 0
+    if tipo == 'transferencia':
+        return [('obra', obra_origem_id, -quantidade), ('obra', obra_destino_id, quantidade)], 0
+    if tipo == 'retorno_deposito':
+        return [('obra', obra_origem_id, -quantidade), ('deposito', None, quantidade)], 0
+    if tipo == 'envio_manutencao':
+        return [(*origem, -quantidade), ('manutencao', None, quantidade)], 0
+    if tipo == 'retorno_manutencao':
+        return [('manutencao', None, -quantidade), ('deposito', None, quantidade)], 0
+    if tipo == 'perda':
+        return [(*origem, -quantidade), ('perdida', None, quantidade)], 0
+    if tipo == 'descarte':
+        return [(*origem, -quantidade)], -quantidade
+    if tipo == 'devolver_fornecedor':
+        return [('deposito', None, -quantidade)], -quantidade
+    if tipo == 'ajuste_estoque':
+        # Registro do reparo de estoque (reparar_estoque): não movimenta nada.
+        return [], 0
+    raise ValidationError(f'Tipo de movimentação desconhecido: {tipo}')
+
+
+def deltas_movimentacoes(movimentacoes):
+    """Soma as pernas das movimentações: ({(ferramenta_id, local_tipo, obra_id): delta}, {ferramenta_id: delta})."""
+    deltas = defaultdict(int)
+    totais = defaultdict(int)
+    for mov in movimentacoes:
+        pernas, delta_total = pernas_movimentacao(
+            mov.tipo, mov.quantidade, mov.obra_origem_id, mov.obra_destino_id, mov.origem_tipo,
+        )
+        for local_tipo, obra_id, delta in pernas:
+            if local_tipo == 'obra' and not obra_id:
+                raise ValidationError('Obra é obrigatória para movimentar ferramentas de/para obra.')
+            deltas[(mov.ferramenta_id, local_tipo, obra_id)] += delta
+        if delta_total:
+            totais[mov.ferramenta_id] += delta_total
+    return deltas, totais
+
+
+def _descricao_local(local_tipo, obra_id, obras):
+    if local_tipo == 'obra':
+        return obras.get(obra_id, f'obra {obra_id}')
+    if local_tipo == 'total':
+        return 'estoque total'
+    return dict(LocalizacaoFerramenta.LOCAL_TIPO_CHOICES).get(local_tipo, local_tipo)
+
+
+def _erro_estoque(faltas, ferramentas):
+    from apps.obras.models import Obra
+
+    obras = dict(
+        Obra.all_objects.filter(pk__in={obra_id for _, _, obra_id, _, _ in faltas if obra_id})
+        .values_list('pk', 'nome')
+    )
+    mensagens = [
+        f'{ferramentas[ferramenta_id]}: apenas {disponivel} unidade(s) em '
+        f'{_descricao_local(local_tipo, obra_id, obras)}, movimentação de {solicitado}.'
+        for ferramenta_id, local_tipo, obra_id, disponivel, solicitado in faltas
+    ]
+    return EstoqueInsuficiente(mensagens)
+
+
+def _upsert_entradas(entradas, agora):
+    """INSERT ... ON CONFLICT DO UPDATE somando a quantidade, um por índice único parcial."""
+    qn = connection.ops.quote_name
+    tabela = qn(LocalizacaoFerramenta._meta.db_table)
+    alvos = {
+        # Mesmos predicados das UniqueConstraints de LocalizacaoFerramenta.
+        True: f"({qn('ferramenta_id')}, {qn('obra_id')}) WHERE {qn('local_tipo')} = 'obra'",
+        False: f"({qn('ferramenta_id')}, {qn('local_tipo')}) WHERE {qn('obra_id')} IS NULL",
+    }
+    colunas = ', '.join(qn(c) for c in ('ferramenta_id', 'local_tipo', 'obra_id', 'quantidade', 'created_at', 'updated_at'))
+    for em_obra, alvo in alvos.items():
+        linhas = [
+            (ferramenta_id, local_tipo, obra_id, delta, agora, agora)
+            for (ferramenta_id, local_tipo, obra_id), delta in entradas.items()
+            if (local_tipo == 'obra') == em_obra
+        ]
+        if not linhas:
+            continue
+        valores = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(linhas))
+        sql = (
+            f'INSERT INTO {tabela} ({colunas}) VALUES {valores} '
+            f'ON CONFLICT {alvo} DO UPDATE SET '
+            f"{qn('quantidade')} = {tabela}.{qn('quantidade')} + EXCLUDED.{qn('quantidade')}, "
+            f"{qn('updated_at')} = EXCLUDED.{qn('updated_at')}"
+        )
+        params = [
+            connection.ops.adapt_datetimefield_value(valor) if valor is agora else valor
+            for linha in linhas for valor in linha
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+
+def _somar_entradas(entradas, existentes, agora):
+    """Alternativa sem ON CONFLICT: UPDATE das localizações existentes e bulk_create das novas.
+
+    Seguro porque as ferramentas estão travadas por aplicar_deltas.
+    """
+    atualizar = {existentes[chave][0]: delta for chave, delta in entradas.items() if chave in existentes}
+    if atualizar:
+        _somar_por_pk(atualizar, agora)
+    LocalizacaoFerramenta.objects.bulk_create([
+        LocalizacaoFerramenta(ferramenta_id=ferramenta_id, local_tipo=local_tipo, obra_id=obra_id, quantidade=delta)
+        for (ferramenta_id, local_tipo, obra_id), delta in entradas.items()
+        if (ferramenta_id, local_tipo, obra_id) not in existentes
+    ])
+
+
+def _somar_por_pk(deltas_por_pk, agora):
+    LocalizacaoFerramenta.objects.filter(pk__in=list(deltas_por_pk)).update(
+        quantidade=F('quantidade') + Case(
+            *[When(pk=pk, then=Value(delta)) for pk, delta in deltas_por_pk.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        ),
+        updated_at=agora,
+    )
+
+
+@transaction.atomic
+def aplicar_deltas(deltas, totais=None):
+    """
+    Aplica variações de estoque por local e de quantidade_total.
+
+    deltas: {(ferramenta_id, local_tipo, obra_id): delta}; totais: {ferramenta_id: delta}.
+    Levanta EstoqueInsuficiente (nada é gravado) se alguma saída deixaria saldo negativo.
+    Retorna {ferramenta_id: quantidade_total atualizada}.
+    """
+    totais = {ferramenta_id: delta for ferramenta_id, delta in (totais or {}).items() if delta}
+    deltas = {chave: delta for chave, delta in deltas.items() if delta}
+    ferramenta_ids = sorted({chave[0] for chave in deltas} | set(totais))
+    if not ferramenta_ids:
+        return {}
+
+    travadas = {
+        pk: (codigo, quantidade_total)
+        for pk, codigo, quantidade_total in (
+            Ferramenta.objects.select_for_update()
+            .filter(pk__in=ferramenta_ids)
+            .order_by('pk')
+            .values_list('pk', 'codigo', 'quantidade_total')
+        )
+    }
+    existentes = {
+        (ferramenta_id, local_tipo, obra_id): (pk, quantidade)
+        for pk, ferramenta_id, local_tipo, obra_id, quantidade in (
+            LocalizacaoFerramenta.objects.filter(ferramenta_id__in=ferramenta_ids)
+            .values_list('pk', 'ferramenta_id', 'local_tipo', 'obra_id', 'quantidade')
+        )
+    }
+
+    faltas = []
+    for (ferramenta_id, local_tipo, obra_id), delta in deltas.items():
+        disponivel = existentes.get((ferramenta_id, local_tipo, obra_id), (None, 0))[1]
+        if delta < 0 and disponivel + delta < 0:
+            faltas.append((ferramenta_id, local_tipo, obra_id, disponivel, -delta))
+    for ferramenta_id, delta in totais.items():
+        if travadas[ferramenta_id][1] + delta < 0:
+            faltas.append((ferramenta_id, 'total', None, travadas[ferramenta_id][1], -delta))
+    if faltas:
+        raise _erro_estoque(faltas, {pk: codigo for pk, (codigo, _) in travadas.items()})
+
+    agora = timezone.now()
+    saidas = {existentes[chave][0]: delta for chave, delta in deltas.items() if delta < 0}
+    if saidas:
+        _somar_por_pk(saidas, agora)
+        LocalizacaoFerramenta.objects.filter(pk__in=list(saidas), quantidade__lte=0).delete()
+
+    entradas = {chave: delta for chave, delta in deltas.items() if delta > 0}
+    if entradas:
+        if connection.vendor in ('postgresql', 'sqlite'):
+            _upsert_entradas(entradas, agora)
+        else:
+            _somar_entradas(entradas, existentes, agora)
+
+    if totais:
+        Ferramenta.objects.filter(pk__in=list(totais)).update(
+            quantidade_total=F('quantidade_total') + Case(
+                *[When(pk=pk, then=Value(delta)) for pk, delta in totais.items()],
+                default=Value(0),
+                output_field=IntegerField(),
+            ),
+        )
+    return {pk: quantidade_total + totais.get(pk, 0) for pk, (_, quantidade_total) in travadas.items()}
+
+
+def aplicar_movimentacoes(movimentacoes):
+    """Aplica no estoque as pernas de uma ou mais movimentações já gravadas."""
+    return aplicar_deltas(*deltas_movimentacoes(movimentacoes))
+
+
+# origem_tipo/destino_tipo gravados em cada movimentação (mesmos valores do MovimentacaoForm).
+ORIGEM_DESTINO_TIPO = {
+    'entrada_deposito': ('compra', 'deposito'),
+    'saida_obra': ('deposito', 'obra'),
+    'transferencia': ('obra', 'obra'),
+    'retorno_deposito': ('obra', 'deposito'),
+    'envio_manutencao': ('deposito', 'manutencao'),
+    'retorno_manutencao': ('manutencao', 'deposito'),
+    'perda': ('deposito', 'perdida'),
+    'descarte': ('deposito', 'descarte'),
+    'devolver_fornecedor': ('deposito', 'fornecedor'),
+}
+
+TIPOS_COM_OBRA_ORIGEM = {'transferencia', 'retorno_deposito', 'envio_manutencao', 'perda', 'descarte'}
+TIPOS_COM_OBRA_DESTINO = {'saida_obra', 'transferencia'}
+
+
+@transaction.atomic
+def registrar_movimentacoes(movimentacoes):
+    """
+    Grava movimentações ainda não salvas num bulk_create e aplica o estoque de
+    todas numa única chamada de aplicar_deltas (sem MovimentacaoFerramenta.save()).
+    """
+    movimentacoes = list(movimentacoes)
+    if not movimentacoes:
+        return []
+    aplicar_movimentacoes(movimentacoes)
+    return MovimentacaoFerramenta.objects.bulk_create(movimentacoes)
+
+
+def movimentar_em_lote(itens, tipo, responsavel, obra_origem=None, obra_destino=None, observacoes=''):
+    """
+    Movimenta várias ferramentas de uma vez (mobilização/desmobilização de obra).
+
+    itens: [(ferramenta_id, quantidade), ...]; ferramentas repetidas são somadas
+    numa só movimentação. Valida as ferramentas numa consulta e o saldo dos
+    locais de saída em outra (aplicar_deltas); levanta ValidationError sem gravar
+    nada se algum item for inválido. Retorna as movimentações criadas.
+    """
+    if tipo not in ORIGEM_DESTINO_TIPO:
+        raise ValidationError(f'Tipo de movimentação desconhecido: {tipo}')
+    obra_origem_id = getattr(obra_origem, 'pk', obra_origem) if tipo in TIPOS_COM_OBRA_ORIGEM else None
+    obra_destino_id = getattr(obra_destino, 'pk', obra_destino) if tipo in TIPOS_COM_OBRA_DESTINO else None
+    if tipo == 'transferencia' and obra_origem_id and obra_origem_id == obra_destino_id:
+        raise ValidationError('A obra de destino deve ser diferente da origem.')
+
+    quantidades = {}
+    erros = []
+    for ferramenta_id, quantidade in itens:
+        try:
+            ferramenta_id, quantidade = int(ferramenta_id), int(quantidade)
+        except (TypeError, ValueError):
+            erros.append(f'Item inválido: ferramenta={ferramenta_id}, quantidade={quantidade}.')
+            continue
+        if quantidade <= 0:
+            erros.append(f'Quantidade deve ser maior que zero (ferramenta {ferramenta_id}).')
+            continue
+        quantidades[ferramenta_id] = quantidades.get(ferramenta_id, 0) + quantidade
+    if not quantidades and not erros:
+        erros.append('Informe ao menos uma ferramenta.')
+
+    ferramentas = {
+        pk: (codigo, classificacao, fornecedor_id)
+        for pk, codigo, classificacao, fornecedor_id in Ferramenta.objects.filter(pk__in=list(quantidades))
+        .values_list('pk', 'codigo', 'classificacao', 'fornecedor_id')
+    }
+    for ferramenta_id in quantidades:
+        if ferramenta_id not in ferramentas:
+            erros.append(f'Ferramenta {ferramenta_id} não encontrada.')
+        elif tipo == 'devolver_fornecedor':
+            codigo, classificacao, fornecedor_id = ferramentas[ferramenta_id]
+            if classificacao != 'alugada' or not fornecedor_id:
+                erros.append(f'{codigo}: somente ferramentas alugadas com fornecedor podem ser devolvidas.')
+    if erros:
+        raise ValidationError(erros)
+
+    origem_tipo, destino_tipo = ORIGEM_DESTINO_TIPO[tipo]
+    if obra_origem_id:
+        origem_tipo = 'obra'
+    return registrar_movimentacoes(
+        MovimentacaoFerramenta(
+            ferramenta_id=ferramenta_id,
+            quantidade=quantidade,
+            tipo=tipo,
+            origem_tipo=origem_tipo,
+            obra_origem_id=obra_origem_id,
+            destino_tipo=destino_tipo,
+            obra_destino_id=obra_destino_id,
+            responsavel=responsavel,
+            observacoes=observacoes or None,
+        )
+        for ferramenta_id, quantidade in quantidades.items()
+    )
+
+
+# Movimentações lidas por consulta ao acumular o histórico.
+HISTORICO_LOTE_TAMANHO = 2000
+
+
+def fim_do_dia(data):
+    """Momento (início do dia seguinte, no fuso local) que fecha o dia `data`."""
+    return timezone.make_aware(datetime.datetime.combine(data + datetime.timedelta(days=1), datetime.time.min))
+
+
+def acumular_movimentacoes(saldos, movimentacoes, incompletas=None):
+    """
+    Aplica em `saldos` ({(ferramenta_id, local_tipo, obra_id): quantidade}) as
+    movimentações (ferramenta_id, tipo, quantidade, obra_origem_id,
+    obra_destino_id, origem_tipo), em ordem. Como o motor anterior a
+    aplicar_deltas, uma saída maior que o saldo zera o local em vez de deixá-lo
+    negativo; se `incompletas` (set) for informado, recebe as ferramentas em
+    que isso aconteceu (estoque que entrou sem movimentação).
+    """
+    for ferramenta_id, tipo, quantidade, obra_origem_id, obra_destino_id, origem_tipo in movimentacoes:
+        pernas, _ = pernas_movimentacao(tipo, quantidade, obra_origem_id, obra_destino_id, origem_tipo)
+        for local_tipo, obra_id, delta in pernas:
+            chave = (ferramenta_id, local_tipo, obra_id)
+            saldo = saldos.get(chave, 0) + delta
+            if saldo > 0:
+                saldos[chave] = saldo
+            else:
+                saldos.pop(chave, None)
+                if saldo < 0 and incompletas is not None:
+                    incompletas.add(ferramenta_id)
+    return saldos
+
+
+def historico_movimentacoes(inicio=None, fim=None, ferramenta_ids=None, obra_id=None):
+    """Movimentações com inicio <= data_movimentacao < fim, em ordem, lidas em blocos."""
+    qs = MovimentacaoFerramenta.objects.all()
+    if inicio is not None:
+        qs = qs.filter(data_movimentacao__gte=inicio)
+    if fim is not None:
+        qs = qs.filter(data_movimentacao__lt=fim)
+    if ferramenta_ids is not None:
+        qs = qs.filter(ferramenta_id__in=list(ferramenta_ids))
+    if obra_id is not None:
+        qs = qs.filter(Q(obra_origem_id=obra_id) | Q(obra_destino_id=obra_id))
+    return (
+        qs.order_by('data_movimentacao', 'pk')
+        .values_list('ferramenta_id', 'tipo', 'quantidade', 'obra_origem_id', 'obra_destino_id', 'origem_tipo')
+        .iterator(chunk_size=HISTORICO_LOTE_TAMANHO)
+    )
+
+
+def estoque_em(momento, ferramenta_ids=None, obra_id=None, usar_snapshot=True):
+    """
+    Posição do estoque em `momento` (datetime, ou date = fim daquele dia):
+    {(ferramenta_id, local_tipo, obra_id): quantidade}, só locais com saldo.
+
+    Considera as movimentações anteriores a `momento`. Com obra_id, retorna só
+    os saldos naquela obra (e lê só as movimentações que a envolvem).
+    """
+    if not isinstance(momento, datetime.datetime):
+        momento = fim_do_dia(momento)
+
+    saldos = {}
+    inicio = None
+    snapshot = None
+    if usar_snapshot:
+        snapshot = SnapshotEstoque.objects.filter(momento__lte=momento).order_by('-momento').first()
+    if snapshot is not None:
+        inicio = snapshot.momento
+        itens = snapshot.itens.all()
+        if ferramenta_ids is not None:
+            itens = itens.filter(ferramenta_id__in=list(ferramenta_ids))
+        if obra_id is not None:
+            itens = itens.filter(local_tipo='obra', obra_id=obra_id)
+        for ferramenta_id, local_tipo, item_obra_id, quantidade in itens.values_list(
+            'ferramenta_id', 'local_tipo', 'obra_id', 'quantidade'
+        ).iterator(chunk_size=HISTORICO_LOTE_TAMANHO):
+            # Itens de obras excluídas (obra_id NULL) caem na mesma chave: soma.
+            chave = (ferramenta_id, local_tipo, item_obra_id)
+            saldos[chave] = saldos.get(chave, 0) + quantidade
+
+    acumular_movimentacoes(saldos, historico_movimentacoes(inicio, momento, ferramenta_ids, obra_id))
+    if obra_id is not None:
+        saldos = {chave: quantidade for chave, quantidade in saldos.items() if chave[1:] == ('obra', obra_id)}
+    return saldos
+
+
+def estoque_na_conferencia(conferencia):
+    """Saldo de cada ferramenta na obra da conferência no momento dela ({ferramenta_id: quantidade})."""
+    saldos = estoque_em(conferencia.data_conferencia, obra_id=conferencia.obra_id)
+    return {ferramenta_id: quantidade for (ferramenta_id, _, _), quantidade in saldos.items()}
+
+
+def _soma_localizacoes():
+    return Coalesce(
+        Subquery(
+            LocalizacaoFerramenta.objects.filter(ferramenta_id=OuterRef('pk'))
+            .values('ferramenta_id')
+            .annotate(total=Sum('quantidade'))
+            .values('total')
+        ),
+        0,
+    )
+
+
+def divergencias_totais(ferramenta_ids=None):
+    """[(ferramenta_id, quantidade_total, soma das localizações)] onde os dois diferem (uma consulta)."""
+    qs = Ferramenta.objects.annotate(soma=Coalesce(Sum('localizacoes__quantidade'), 0))
+    if ferramenta_ids is not None:
+        qs = qs.filter(pk__in=list(ferramenta_ids))
+    return list(
+        qs.exclude(quantidade_total=F('soma'))
+        .order_by('pk')
+        .values_list('pk', 'quantidade_total', 'soma')
+    )
+
+
+def _localizacoes_atuais(ferramenta_ids=None):
+    qs = LocalizacaoFerramenta.objects.all()
+    if ferramenta_ids is not None:
+        qs = qs.filter(ferramenta_id__in=list(ferramenta_ids))
+    return {
+        (ferramenta_id, local_tipo, obra_id): (pk, quantidade)
+        for pk, ferramenta_id, local_tipo, obra_id, quantidade in qs.values_list(
+            'pk', 'ferramenta_id', 'local_tipo', 'obra_id', 'quantidade'
+        ).iterator(chunk_size=HISTORICO_LOTE_TAMANHO)
+    }
+
+
+def _localizacoes_esperadas(ferramenta_ids=None, incompletas=None):
+    """Saldos pelo histórico completo, sem os de obras excluídas (obra_id NULL nas movimentações)."""
+    saldos = acumular_movimentacoes({}, historico_movimentacoes(ferramenta_ids=ferramenta_ids), incompletas)
+    return {chave: quantidade for chave, quantidade in saldos.items() if chave[1] != 'obra' or chave[2]}
+
+
+def _sem_historico_confiavel(ferramenta_ids, incompletas):
+    """Ferramentas sem nenhuma movimentação ou com estoque que não veio de movimentações."""
+    com_historico = set(
+        MovimentacaoFerramenta.objects.filter(ferramenta_id__in=list(ferramenta_ids))
+        .exclude(tipo='ajuste_estoque')
+        .values_list('ferramenta_id', flat=True)
+        .distinct()
+    )
+    return {ferramenta_id for ferramenta_id in ferramenta_ids if ferramenta_id not in com_historico} | set(incompletas)
+
+
+def divergencias_localizacoes(ferramenta_ids=None, incompletas=None):
+    """[(ferramenta_id, local_tipo, obra_id, atual, esperado pelo histórico)] onde diferem."""
+    esperadas = _localizacoes_esperadas(ferramenta_ids, incompletas)
+    atuais = _localizacoes_atuais(ferramenta_ids)
+    divergencias = []
+    for chave in sorted(set(esperadas) | set(atuais), key=lambda c: (c[0], c[1], c[2] or 0)):
+        atual = atuais[chave][1] if chave in atuais else 0
+        esperado = esperadas.get(chave, 0)
+        if atual != esperado:
+            divergencias.append((*chave, atual, esperado))
+    return divergencias
+
+
+def verificar_estoque(ferramenta_ids=None, historico=True):
+    """
+    Relatório (serializável em JSON) das divergências do inventário:
+
+    - totais: quantidade_total diferente da soma das localizações;
+    - localizacoes (historico=True): saldo por local diferente do obtido
+      acumulando todas as movimentações;
+    - historico_incompleto (historico=True): ferramentas com divergência de
+      localização sem movimentações ou com estoque lançado fora delas, que
+      reparar_estoque não regrava.
+    """
+    codigos = Ferramenta.objects.all()
+    if ferramenta_ids is not None:
+        codigos = codigos.filter(pk__in=list(ferramenta_ids))
+    codigos = dict(codigos.values_list('pk', 'codigo'))
+
+    relatorio = {
+        'gerado_em': timezone.now().isoformat(),
+        'ferramentas_verificadas': len(codigos),
+        'totais': [
+            {
+                'ferramenta_id': ferramenta_id,
+                'codigo': codigos.get(ferramenta_id),
+                'quantidade_total': quantidade_total,
+                'soma_localizacoes': soma,
+            }
+            for ferramenta_id, quantidade_total, soma in divergencias_totais(ferramenta_ids)
+        ],
+        'localizacoes': None,
+        'historico_incompleto': None,
+    }
+    if historico:
+        incompletas = set()
+        relatorio['localizacoes'] = [
+            {
+                'ferramenta_id': ferramenta_id,
+                'codigo': codigos.get(ferramenta_id),
+                'local_tipo': local_tipo,
+                'obra_id': obra_id,
+                'atual': atual,
+                'esperado': esperado,
+            }
+            for ferramenta_id, local_tipo, obra_id, atual, esperado in divergencias_localizacoes(
+                ferramenta_ids, incompletas
+            )
+        ]
+        divergentes = {item['ferramenta_id'] for item in relatorio['localizacoes']}
+        relatorio['historico_incompleto'] = [
+            {'ferramenta_id': ferramenta_id, 'codigo': codigos.get(ferramenta_id)}
+            for ferramenta_id in sorted(_sem_historico_confiavel(divergentes, incompletas))
+        ]
+    relatorio['ferramentas_divergentes'] = len(
+        {item['ferramenta_id'] for item in relatorio['totais'] + (relatorio['localizacoes'] or [])}
+    )
+    return relatorio
+
+
+@transaction.atomic
+def reparar_estoque(ferramenta_ids, localizacoes=False, responsavel=None):
+    """
+    Corrige o estoque das ferramentas informadas, com as linhas travadas:
+
+    - localizacoes=True: regrava LocalizacaoFerramenta com os saldos do histórico
+      (UPDATE das divergentes, DELETE das que não deveriam existir, bulk_create
+      das que faltam) e registra, para cada local alterado, uma movimentação
+      'ajuste_estoque' em nome de `responsavel` com o saldo anterior e o novo.
+      Ferramentas sem movimentações, ou com estoque lançado fora delas
+      (cadastro/inline), não têm as localizações alteradas;
+    - sempre: quantidade_total = soma das localizações, num único UPDATE.
+
+    Retorna {'localizacoes': linhas alteradas, 'totais': ferramentas atualizadas,
+    'ignoradas': ferramentas cujas localizações não foram regravadas}.
+    """
+    ferramenta_ids = sorted(set(ferramenta_ids))
+    resultado = {'localizacoes': 0, 'totais': 0, 'ignoradas': []}
+    if not ferramenta_ids:
+        return resultado
+    if localizacoes and responsavel is None:
+        raise ValidationError('Informe o responsável pelos ajustes de estoque.')
+    list(Ferramenta.objects.select_for_update().filter(pk__in=ferramenta_ids).order_by('pk').values_list('pk'))
+
+    if localizacoes:
+        incompletas = set()
+        esperadas = _localizacoes_esperadas(ferramenta_ids, incompletas)
+        ignoradas = _sem_historico_confiavel(ferramenta_ids, incompletas)
+        esperadas = {chave: quantidade for chave, quantidade in esperadas.items() if chave[0] not in ignoradas}
+        atuais = {
+            chave: valor for chave, valor in _localizacoes_atuais(ferramenta_ids).items()
+            if chave[0] not in ignoradas
+        }
+        agora = timezone.now()
+        ajustes = {
+            pk: esperadas[chave] - quantidade
+            for chave, (pk, quantidade) in atuais.items()
+            if chave in esperadas and esperadas[chave] != quantidade
+        }
+        if ajustes:
+            _somar_por_pk(ajustes, agora)
+        sobras = [pk for chave, (pk, _) in atuais.items() if chave not in esperadas]
+        if sobras:
+            LocalizacaoFerramenta.objects.filter(pk__in=sobras).delete()
+        faltantes = [
+            LocalizacaoFerramenta(ferramenta_id=ferramenta_id, local_tipo=local_tipo, obra_id=obra_id, quantidade=quantidade)
+            for (ferramenta_id, local_tipo, obra_id), quantidade in esperadas.items()
+            if (ferramenta_id, local_tipo, obra_id) not in atuais
+        ]
+        LocalizacaoFerramenta.objects.bulk_create(faltantes, batch_size=1000)
+
+        alterados = [
+            (chave, atuais[chave][1] if chave in atuais else 0, esperadas.get(chave, 0))
+            for chave in set(atuais) | set(esperadas)
+            if (atuais[chave][1] if chave in atuais else 0) != esperadas.get(chave, 0)
+        ]
+        MovimentacaoFerramenta.objects.bulk_create(
+            [_movimentacao_ajuste(chave, anterior, novo, responsavel) for chave, anterior, novo in sorted(
+                alterados, key=lambda a: (a[0][0], a[0][1], a[0][2] or 0)
+            )],
+            batch_size=1000,
+        )
+        resultado['localizacoes'] = len(ajustes) + len(sobras) + len(faltantes)
+        resultado['ignoradas'] = sorted(ignoradas)
+
+    resultado['totais'] = (
+        Ferramenta.objects.filter(pk__in=ferramenta_ids)
+        .annotate(soma=_soma_localizacoes())
+        .exclude(quantidade_total=F('soma'))
+        .update(quantidade_total=_soma_localizacoes())
+    )
+    return resultado
+
+
+def _movimentacao_ajuste(chave, anterior, novo, responsavel):
+    """Movimentação 'ajuste_estoque' (sem efeito no estoque) que documenta um local regravado."""
+    ferramenta_id, local_tipo, obra_id = chave
+    removido = novo < anterior
+    return MovimentacaoFerramenta(
+        ferramenta_id=ferramenta_id,
+        tipo='ajuste_estoque',
+        quantidade=abs(novo - anterior),
+        origem_tipo=local_tipo if removido else 'ajuste',
+        obra_origem_id=obra_id if removido else None,
+        destino_tipo='ajuste' if removido else local_tipo,
+        obra_destino_id=None if removido else obra_id,
+        responsavel=responsavel,
+        observacoes=(
+            f'Correção pelo histórico de movimentações: '
+            f'{_descricao_local(local_tipo, obra_id, {})} de {anterior} para {novo} unidade(s).'
+        ),
+    )
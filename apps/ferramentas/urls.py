@@ -11,6 +11,7 @@ urlpatterns = [
     path('criar/', views.ferramenta_create, name='ferramenta_create'),
     path('movimentar/', views.movimentacao_create, name='movimentacao_create'),
     path('movimentar/criar/', views.MovimentacaoCreateView.as_view(), name='movimentacao_create_cbv'),
+    path('movimentar/lote/', views.movimentacao_lote_create, name='movimentacao_lote_create'),
     
     # Conferências - ORDEM IMPORTANTE!
     path('conferencia/', views.conferencia_list, name='conferencia_list'),
@@ -1,19 +1,23 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
 from django.db import models
-from django.http import Http404, HttpResponse
+from django.http import Http404, HttpResponse, JsonResponse
 from django.template.loader import render_to_string
 from .models import (
     Ferramenta, ConferenciaFerramenta, MovimentacaoFerramenta, 
     ItemConferencia, LocalizacaoFerramenta
 )
 from .forms import FerramentaForm, MovimentacaoForm, ConferenciaForm, ItemConferenciaForm
+from .services import estoque_em, estoque_na_conferencia, movimentar_em_lote, registrar_movimentacoes
+from apps.busca.models import DocumentoBusca
 from django.contrib import messages
 from apps.obras.models import Obra
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views import generic
 from django.urls import reverse_lazy
 from django.views import View
+from django.views.decorators.http import require_POST
 from django.forms import inlineformset_factory
 from django.db import transaction
 from django.shortcuts import render
@@ -22,6 +26,7 @@ from django.utils import timezone
 from openpyxl import Workbook
 import random
 from decimal import Decimal
+import datetime
 import json
 
 
@@ -43,10 +48,7 @@ def _filtrar_ferramentas_queryset(request):
         qs = qs.filter(ativo=False)
 
     if busca:
-        qs = qs.filter(
-            models.Q(nome__icontains=busca) |
-            models.Q(codigo__icontains=busca)
-        )
+        qs = qs.filter(pk__in=DocumentoBusca.filtrar('ferramenta', busca))
     if codigo:
         qs = qs.filter(codigo__icontains=codigo)
     if nome:
@@ -61,6 +63,19 @@ def _filtrar_ferramentas_queryset(request):
     return qs, busca, categoria, classificacao, fornecedor, status
 
 
+def _distribuicao_obras_em(data, ferramenta_ids):
+    """Quantidade por obra no fim de `data` (posição histórica via snapshots), no formato do relatório."""
+    totais = {}
+    for (_, local_tipo, obra_id), quantidade in estoque_em(data, ferramenta_ids=ferramenta_ids).items():
+        if local_tipo == 'obra':
+            totais[obra_id] = totais.get(obra_id, 0) + quantidade
+    nomes = dict(Obra.all_objects.filter(pk__in=[pk for pk in totais if pk]).values_list('pk', 'nome'))
+    return sorted(
+        ({'obra_id': obra_id, 'obra__nome': nomes.get(obra_id), 'total': total} for obra_id, total in totais.items()),
+        key=lambda item: item['obra__nome'] or '',
+    )
+
+
 def _build_ferramenta_relatorio_data(request, paginate=True):
     ids = request.GET.getlist('ids')
     ferramenta_filtro = request.GET.get('ferramenta', '').strip()
@@ -70,6 +85,11 @@ def _build_ferramenta_relatorio_data(request, paginate=True):
     destino_filtro = request.GET.get('destino', '').strip()
     data_inicial = request.GET.get('data_inicial', '').strip()
     data_final = request.GET.get('data_final', '').strip()
+    posicao_em_filtro = request.GET.get('posicao_em', '').strip()
+    try:
+        posicao_em = datetime.date.fromisoformat(posicao_em_filtro) if posicao_em_filtro else None
+    except ValueError:
+        posicao_em = None
 
     if ids:
         base_ferramentas_qs = Ferramenta.objects.select_related('fornecedor').filter(id__in=ids)
@@ -85,7 +105,7 @@ def _build_ferramenta_relatorio_data(request, paginate=True):
     if fornecedor_filtro:
         base_ferramentas_qs = base_ferramentas_qs.filter(fornecedor_id=fornecedor_filtro)
 
-    ferramentas_lista = list(base_ferramentas_qs.order_by('nome'))
+    ferramentas_lista = list(base_ferramentas_qs.com_distribuicao().order_by('nome'))
     ferramenta_ids = [f.id for f in ferramentas_lista]
 
     total_modelos = len(ferramentas_lista)
@@ -107,6 +127,8 @@ def _build_ferramenta_relatorio_data(request, paginate=True):
         .annotate(total=models.Sum('quantidade'))
         .order_by('obra__nome')
     )
+    if posicao_em:
+        obras_distribuicao_qs = _distribuicao_obras_em(posicao_em, ferramenta_ids)
 
     movimentacoes_qs = (
         MovimentacaoFerramenta.objects
@@ -184,7 +206,9 @@ def _build_ferramenta_relatorio_data(request, paginate=True):
             'destino': destino_filtro,
             'data_inicial': data_inicial,
             'data_final': data_final,
+            'posicao_em': posicao_em_filtro if posicao_em else '',
         },
+        'posicao_em': posicao_em,
     }
 
 
@@ -286,21 +310,19 @@ def ferramenta_list(request):
 
     total_ferramentas = base_status_qs.count()
     
-    # Somar quantidades por localização
-    from django.db.models import Sum
-    total_deposito = LocalizacaoFerramenta.objects.filter(
-        local_tipo='deposito', **localizacao_filters
-    ).aggregate(total=Sum('quantidade'))['total'] or 0
-    
-    total_em_obra = LocalizacaoFerramenta.objects.filter(
-        local_tipo='obra', **localizacao_filters
-    ).aggregate(total=Sum('quantidade'))['total'] or 0
-    
-    total_manutencao = LocalizacaoFerramenta.objects.filter(
-        local_tipo='manutencao', **localizacao_filters
-    ).aggregate(total=Sum('quantidade'))['total'] or 0
-    
+    # Somar quantidades por localização (uma consulta para os três totais)
+    from django.db.models import Q, Sum
+    totais_localizacao = LocalizacaoFerramenta.objects.filter(**localizacao_filters).aggregate(
+        deposito=Sum('quantidade', filter=Q(local_tipo='deposito')),
+        obra=Sum('quantidade', filter=Q(local_tipo='obra')),
+        manutencao=Sum('quantidade', filter=Q(local_tipo='manutencao')),
+    )
+    total_deposito = totais_localizacao['deposito'] or 0
+    total_em_obra = totais_localizacao['obra'] or 0
+    total_manutencao = totais_localizacao['manutencao'] or 0
+
     total_resultado = qs.count()
+    qs = qs.com_distribuicao()
 
     # Pagination
     from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
@@ -346,32 +368,41 @@ def ferramenta_list(request):
     return render(request, 'ferramentas/ferramenta_list.html', context)
 
 
+def _gerar_pdf_ferramenta_relatorio(context, base_url=None):
+    """Renderiza o relatório em PDF (WeasyPrint, com xhtml2pdf como fallback). Retorna None em falha."""
+    html = render_to_string('ferramentas/ferramenta_relatorio_pdf.html', context)
+    try:
+        from weasyprint import HTML
+        return HTML(string=html, base_url=base_url).write_pdf()
+    except Exception:
+        from io import BytesIO
+        from xhtml2pdf import pisa
+
+        pdf_buffer = BytesIO()
+        pisa_status = pisa.CreatePDF(html, dest=pdf_buffer)
+        if pisa_status.err:
+            return None
+        return pdf_buffer.getvalue()
+
+
 @login_required
 def ferramenta_relatorio_impressao(request):
     export = request.GET.get('export', '').strip().lower()
+    if export in {'pdf', 'xlsx'} and request.GET.get('segundo_plano'):
+        from apps.relatorios.services.exportacao_jobs import enfileirar_exportacao
+
+        job = enfileirar_exportacao(f'ferramentas_{export}', request)
+        return redirect('relatorios:exportacao_detail', pk=job.pk)
+
     if export in {'pdf', 'xlsx'}:
         context = _build_ferramenta_relatorio_data(request, paginate=False)
         if export == 'xlsx':
             return _exportar_ferramenta_relatorio_excel(context)
 
-        html = render_to_string(
-            'ferramentas/ferramenta_relatorio_pdf.html',
-            context,
-            request=request,
-        )
-        try:
-            from weasyprint import HTML
-            pdf = HTML(string=html, base_url=request.build_absolute_uri('/')).write_pdf()
-        except Exception:
-            from io import BytesIO
-            from xhtml2pdf import pisa
-
-            pdf_buffer = BytesIO()
-            pisa_status = pisa.CreatePDF(html, dest=pdf_buffer)
-            if pisa_status.err:
-                messages.error(request, 'Não foi possível gerar o PDF deste relatório agora.')
-                return render(request, 'ferramentas/ferramenta_relatorio_impressao.html', _build_ferramenta_relatorio_data(request, paginate=True))
-            pdf = pdf_buffer.getvalue()
+        pdf = _gerar_pdf_ferramenta_relatorio(context, base_url=request.build_absolute_uri('/'))
+        if pdf is None:
+            messages.error(request, 'Não foi possível gerar o PDF deste relatório agora.')
+            return render(request, 'ferramentas/ferramenta_relatorio_impressao.html', _build_ferramenta_relatorio_data(request, paginate=True))
         response = HttpResponse(pdf, content_type='application/pdf')
         response['Content-Disposition'] = 'attachment; filename="relatorio_ferramentas.pdf"'
         return response
@@ -499,7 +530,7 @@ def ferramenta_relatorio_impressao(request):
 @login_required
 def ferramenta_detail(request, pk):
     """Detalhes de uma ferramenta"""
-    ferramenta = get_object_or_404(Ferramenta.objects.select_related('fornecedor'), pk=pk)
+    ferramenta = get_object_or_404(Ferramenta.objects.select_related('fornecedor').com_distribuicao(), pk=pk)
     movimentacoes_qs = ferramenta.movimentacoes.select_related('responsavel', 'obra_origem', 'obra_destino', 'ferramenta__fornecedor').all()
     from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
     paginator = Paginator(movimentacoes_qs, 10)
@@ -606,26 +637,36 @@ def movimentacao_create(request):
                 messages.error(request, 'Adicione ao menos uma movimentação antes de salvar.')
                 return render(request, 'ferramentas/movimentacao_form.html', {'form': MovimentacaoForm(), 'title': 'Movimentar Ferramenta'})
 
-            with transaction.atomic():
-                total_criadas = 0
-                for idx, item in enumerate(itens, start=1):
-                    form_item = MovimentacaoForm(item)
-                    if not form_item.is_valid():
-                        erro = '; '.join(
-                            f'{campo}: {", ".join(msgs)}'
-                            for campo, msgs in form_item.errors.items()
-                        )
-                        messages.error(request, f'Erro no item {idx}: {erro}')
-                        return render(
-                            request,
-                            'ferramentas/movimentacao_form.html',
-                            {'form': MovimentacaoForm(), 'title': 'Movimentar Ferramenta'}
-                        )
-
-                    mov = form_item.save(commit=False)
-                    mov.responsavel = request.user
-                    mov.save()
-                    total_criadas += 1
+            movimentacoes = []
+            for idx, item in enumerate(itens, start=1):
+                form_item = MovimentacaoForm(item)
+                if not form_item.is_valid():
+                    erro = '; '.join(
+                        f'{campo}: {", ".join(msgs)}'
+                        for campo, msgs in form_item.errors.items()
+                    )
+                    messages.error(request, f'Erro no item {idx}: {erro}')
+                    return render(
+                        request,
+                        'ferramentas/movimentacao_form.html',
+                        {'form': MovimentacaoForm(), 'title': 'Movimentar Ferramenta'}
+                    )
+
+                mov = form_item.save(commit=False)
+                mov.responsavel = request.user
+                movimentacoes.append(mov)
+
+            # Um bulk_create e uma aplicação de estoque para todos os itens;
+            # se o saldo não comportar o conjunto, nada é gravado.
+            try:
+                total_criadas = len(registrar_movimentacoes(movimentacoes))
+            except ValidationError as exc:
+                messages.error(request, '; '.join(exc.messages))
+                return render(
+                    request,
+                    'ferramentas/movimentacao_form.html',
+                    {'form': MovimentacaoForm(), 'title': 'Movimentar Ferramenta'}
+                )
 
             messages.success(request, f'{total_criadas} movimentação(ões) registrada(s).')
             return redirect('ferramentas:ferramenta_list')
@@ -634,9 +675,13 @@ def movimentacao_create(request):
         if form.is_valid():
             mov = form.save(commit=False)
             mov.responsavel = request.user
-            mov.save()
-            messages.success(request, 'Movimentação registrada.')
-            return redirect('ferramentas:ferramenta_detail', pk=mov.ferramenta.pk)
+            try:
+                mov.save()
+            except ValidationError as exc:
+                messages.error(request, '; '.join(exc.messages))
+            else:
+                messages.success(request, 'Movimentação registrada.')
+                return redirect('ferramentas:ferramenta_detail', pk=mov.ferramenta.pk)
     else:
         # allow preselecting ferramenta via GET param ?f=<pk>
         f_pk = request.GET.get('f')
@@ -648,6 +693,53 @@ def movimentacao_create(request):
     return render(request, 'ferramentas/movimentacao_form.html', {'form': form, 'title': 'Movimentar Ferramenta'})
 
 
+@login_required
+@require_POST
+def movimentacao_lote_create(request):
+    """Movimenta várias ferramentas de uma vez (kit enviado para obra, retorno ao depósito).
+
+    Corpo JSON:
+    {"tipo": "saida_obra", "obra_origem": id, "obra_destino": id, "observacoes": "...",
+     "itens": [{"ferramenta": id, "quantidade": n}, ...]}
+
+    Todos os itens são gravados ou nenhum: em erro de validação/saldo retorna 400
+    com a lista de erros.
+    """
+    try:
+        dados = json.loads(request.body or b'{}')
+        itens = [(item['ferramenta'], item['quantidade']) for item in dados.get('itens') or []]
+    except (json.JSONDecodeError, AttributeError, KeyError, TypeError):
+        return JsonResponse({'status': 'error', 'errors': ['JSON inválido.']}, status=400)
+
+    obras = {}
+    for campo in ('obra_origem', 'obra_destino'):
+        valor = dados.get(campo)
+        if valor:
+            obras[campo] = Obra.objects.filter(pk=valor, ativo=True).first() if str(valor).isdigit() else None
+            if obras[campo] is None:
+                return JsonResponse({'status': 'error', 'errors': [f'{campo}: obra não encontrada.']}, status=400)
+
+    try:
+        movimentacoes = movimentar_em_lote(
+            itens,
+            tipo=dados.get('tipo'),
+            responsavel=request.user,
+            obra_origem=obras.get('obra_origem'),
+            obra_destino=obras.get('obra_destino'),
+            observacoes=(dados.get('observacoes') or '').strip(),
+        )
+    except ValidationError as exc:
+        return JsonResponse({'status': 'error', 'errors': exc.messages}, status=400)
+
+    return JsonResponse({
+        'status': 'ok',
+        'movimentacoes': [
+            {'id': mov.pk, 'ferramenta': mov.ferramenta_id, 'quantidade': mov.quantidade}
+            for mov in movimentacoes
+        ],
+    })
+
+
 @login_required
 def conferencia_list(request):
     """Lista conferências de ferramentas"""
@@ -662,10 +754,23 @@ def conferencia_list(request):
 @login_required
 def conferencia_detail(request, pk):
     conf = get_object_or_404(ConferenciaFerramenta, pk=pk)
-    itens = conf.itens.select_related('ferramenta').all()
+    itens = list(conf.itens.select_related('ferramenta').all())
+
+    # Posição registrada no sistema para a obra no momento da conferência
+    # (snapshot mais próximo + movimentações seguintes).
+    posicao = estoque_na_conferencia(conf)
+    for it in itens:
+        it.estoque_na_data = posicao.pop(it.ferramenta_id, 0)
+        it.diferenca_estoque = it.quantidade_encontrada - it.estoque_na_data
+    nao_conferidas = [
+        {'ferramenta': ferramenta, 'quantidade': posicao[ferramenta.pk]}
+        for ferramenta in Ferramenta.objects.filter(pk__in=list(posicao)).order_by('codigo')
+    ]
+
     context = {
         'conferencia': conf,
         'itens': itens,
+        'nao_conferidas': nao_conferidas,
         'title': f'Conferência - {conf.obra.nome}'
     }
     return render(request, 'ferramentas/conferencia_detail.html', context)
@@ -948,7 +1053,11 @@ class MovimentacaoCreateView(LoginRequiredMixin, generic.CreateView):
     def form_valid(self, form):
         obj = form.save(commit=False)
         obj.responsavel = self.request.user
-        obj.save()
+        try:
+            obj.save()
+        except ValidationError as exc:
+            messages.error(self.request, '; '.join(exc.messages))
+            return self.form_invalid(form)
         messages.success(self.request, 'Movimentação registrada.')
         return redirect('ferramentas:ferramenta_detail', pk=obj.ferramenta.pk)
 
@@ -1,11 +1,11 @@
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
-from django.db import models
 from django.shortcuts import get_object_or_404, redirect, render
 
 from .forms import FornecedorForm
 from .models import Fornecedor
+from apps.busca.models import DocumentoBusca
 
 
 @login_required
@@ -15,11 +15,7 @@ def fornecedor_list(request):
 
     busca = request.GET.get('q', '').strip()
     if busca:
-        qs = qs.filter(
-            models.Q(nome__icontains=busca)
-            | models.Q(endereco__icontains=busca)
-            | models.Q(telefone__icontains=busca)
-        )
+        qs = qs.filter(pk__in=DocumentoBusca.filtrar('fornecedor', busca))
 
     total_resultado = qs.count()
     fornecedores_qs = qs.order_by('nome')
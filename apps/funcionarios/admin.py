@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Funcionario, ApontamentoFuncionario, FechamentoSemanal, UserProfile
+from .models import Funcionario, ApontamentoFuncionario, FechamentoSemanal, ResumoSemanaFechamento, UserProfile
 from .models import ApontamentoDiarioLote, FuncionarioLote, FotoApontamento
 from .models import HistoricoAlteracaoEtapa
 
@@ -105,11 +105,14 @@ class FechamentoSemanalAdmin(admin.ModelAdmin):
     actions = ['calcular_totais_selecionados']
     
     def calcular_totais_selecionados(self, request, queryset):
-        for fechamento in queryset:
-            fechamento.calcular_totais()
-        self.message_user(request, f"{queryset.count()} fechamento(s) recalculado(s).")
+        total = FechamentoSemanal.recalcular_em_lote(queryset)
+        self.message_user(request, f"{total} fechamento(s) recalculado(s).")
     calcular_totais_selecionados.short_description = "Recalcular totais"
 
+    def delete_queryset(self, request, queryset):
+        with ResumoSemanaFechamento.agrupar():
+            super().delete_queryset(request, queryset)
+
 
 # ================ APONTAMENTO EM LOTE ================
 
@@ -0,0 +1,91 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.funcionarios.models import ApontamentoFuncionario
+from apps.funcionarios.services import excluir_apontamentos
+
+
+def _data(valor):
+    try:
+        return datetime.date.fromisoformat(valor)
+    except ValueError:
+        raise CommandError(f"Data invalida: {valor} (use AAAA-MM-DD).")
+
+
+class Command(BaseCommand):
+    help = (
+        "Exclui apontamentos em lote (ex.: apontamentos de uma obra ou importacao incorreta): "
+        "remove os RegistroProducao orfaos, recalcula o rateio dos dias afetados, os fechamentos "
+        "abertos e o resumo diario, e grava um historico consolidado por etapa. "
+        "Sem --apply roda em modo simulacao."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--obra", type=int, help="ID da obra.")
+        parser.add_argument("--etapa", type=int, help="ID da etapa.")
+        parser.add_argument(
+            "--funcionario",
+            type=int,
+            action="append",
+            help="ID do funcionario (pode repetir).",
+        )
+        parser.add_argument(
+            "--id",
+            type=int,
+            action="append",
+            dest="ids",
+            help="ID do apontamento (pode repetir).",
+        )
+        parser.add_argument("--data-inicio", type=_data, help="Data inicial (AAAA-MM-DD).")
+        parser.add_argument("--data-fim", type=_data, help="Data final (AAAA-MM-DD).")
+        parser.add_argument(
+            "--usuario",
+            help="Username registrado como autor no historico das etapas.",
+        )
+        parser.add_argument(
+            "--apply",
+            action="store_true",
+            help="Aplica a exclusao no banco. Sem esta flag, roda em modo simulacao.",
+        )
+
+    def handle(self, *args, **options):
+        filtros = {}
+        if options["obra"]:
+            filtros["obra_id"] = options["obra"]
+        if options["etapa"]:
+            filtros["etapa_id"] = options["etapa"]
+        if options["funcionario"]:
+            filtros["funcionario_id__in"] = options["funcionario"]
+        if options["ids"]:
+            filtros["pk__in"] = options["ids"]
+        if options["data_inicio"]:
+            filtros["data__gte"] = options["data_inicio"]
+        if options["data_fim"]:
+            filtros["data__lte"] = options["data_fim"]
+        if not filtros:
+            raise CommandError("Informe ao menos um filtro (--obra, --etapa, --funcionario, --id ou datas).")
+
+        usuario = None
+        if options["usuario"]:
+            usuario = User.objects.filter(username=options["usuario"]).first()
+            if usuario is None:
+                raise CommandError(f"Usuario nao encontrado: {options['usuario']}")
+
+        resultado = excluir_apontamentos(
+            ApontamentoFuncionario.objects.filter(**filtros),
+            usuario=usuario,
+            simular=not options["apply"],
+        )
+
+        prefixo = "" if options["apply"] else "SIMULACAO: "
+        self.stdout.write(
+            f"{prefixo}{resultado['apontamentos']} apontamento(s) em {resultado['dias']} dia(s) de funcionario; "
+            f"{resultado['registros_orfaos']} registro(s) de producao orfao(s); "
+            f"{resultado['fotos']} foto(s); {resultado['historicos']} historico(s) de etapa."
+        )
+        if not options["apply"]:
+            self.stdout.write(self.style.WARNING("Use --apply para aplicar a exclusao."))
+            return
+        self.stdout.write(self.style.SUCCESS("Exclusao concluida."))
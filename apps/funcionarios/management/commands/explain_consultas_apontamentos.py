@@ -0,0 +1,172 @@
+import datetime
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+
+from apps.funcionarios.models import ApontamentoFuncionario, RegistroProducao
+
+
+TABELA = ApontamentoFuncionario._meta.db_table
+
+# Varredura completa da tabela de apontamentos no plano de cada backend
+# (no SQLite "SCAN" sem SEARCH, inclusive de índice inteiro; U0.. são os
+# aliases usados nas subconsultas).
+PADROES_SEQ_SCAN = {
+    'postgresql': re.compile(rf'Seq Scan on "?{TABELA}"?'),
+    'sqlite': re.compile(rf'\bSCAN ({TABELA}|U\d+)\b'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Roda EXPLAIN nas consultas representativas de ApontamentoFuncionario "
+        "(normalizacao do dia, fechamento semanal, listagem, filtros por obra/etapa, "
+        "fatos de producao) contra o banco atual e aponta as que ainda fazem "
+        "varredura sequencial da tabela."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verbose-plan",
+            action="store_true",
+            help="Mostra o plano completo de cada consulta.",
+        )
+        parser.add_argument(
+            "--forcar-indices",
+            action="store_true",
+            help=(
+                "PostgreSQL: desliga enable_seqscan durante o EXPLAIN, para verificar se existe "
+                "indice utilizavel mesmo em bancos pequenos (onde o planner prefere seq scan)."
+            ),
+        )
+        parser.add_argument(
+            "--falhar",
+            action="store_true",
+            help="Termina com erro se alguma consulta fizer varredura sequencial (uso em CI).",
+        )
+
+    def _amostra(self):
+        """Valores reais do banco para parametrizar as consultas."""
+        apontamento = (
+            ApontamentoFuncionario.objects.exclude(etapa__isnull=True)
+            .order_by('-data')
+            .values('funcionario_id', 'obra_id', 'etapa_id', 'data')
+            .first()
+        ) or (
+            ApontamentoFuncionario.objects.order_by('-data')
+            .values('funcionario_id', 'obra_id', 'etapa_id', 'data')
+            .first()
+        )
+        if not apontamento:
+            return {'funcionario_id': 0, 'obra_id': 0, 'etapa_id': 0, 'data': datetime.date.today()}
+        return apontamento
+
+    def _consultas(self, amostra):
+        funcionario_id = amostra['funcionario_id']
+        obra_id = amostra['obra_id']
+        etapa_id = amostra['etapa_id']
+        data = amostra['data']
+        inicio_semana = data - datetime.timedelta(days=data.weekday())
+        fim_semana = inicio_semana + datetime.timedelta(days=6)
+        inicio_mes = data.replace(day=1)
+        apontamentos = ApontamentoFuncionario.objects
+
+        return [
+            (
+                'normalizacao do dia (funcionario, data)',
+                apontamentos.filter(funcionario_id=funcionario_id, data=data)
+                .only('pk', 'funcionario_id', 'obra_id', 'data', 'horas_trabalhadas', 'valor_diaria')
+                .order_by('created_at', 'pk'),
+            ),
+            (
+                'fechamento semanal (funcionario, periodo)',
+                apontamentos.filter(funcionario_id=funcionario_id, data__range=(inicio_semana, fim_semana))
+                .values_list('data', 'valor_diaria', 'houve_ociosidade', 'houve_retrabalho'),
+            ),
+            (
+                'detalhe da semana (periodo, funcionarios)',
+                apontamentos.filter(data__range=(inicio_semana, fim_semana), funcionario_id__in=[funcionario_id])
+                .order_by('funcionario_id', 'data'),
+            ),
+            (
+                'listagem por periodo (data desc)',
+                apontamentos.filter(data__gte=inicio_mes, data__lte=data)
+                .order_by('-data', '-created_at')[:20],
+            ),
+            (
+                'listagem por dia',
+                apontamentos.filter(data=data).order_by('-data', '-created_at')[:20],
+            ),
+            (
+                'obra por periodo (analytics)',
+                apontamentos.filter(obra_id=obra_id, data__gte=inicio_mes, data__lte=data),
+            ),
+            (
+                'obra/etapa por periodo',
+                apontamentos.filter(obra_id=obra_id, etapa_id=etapa_id, data__gte=inicio_mes, data__lte=data),
+            ),
+            (
+                'api do funcionario (funcionario, periodo)',
+                apontamentos.filter(funcionario_id=funcionario_id, data__gte=inicio_mes, data__lte=data)
+                .order_by('data'),
+            ),
+            (
+                'fatos de producao (Exists funcionario/obra/data)',
+                RegistroProducao.objects.filter(data=data).annotate(
+                    _tem_apontamento=Exists(
+                        apontamentos.filter(
+                            funcionario_id=OuterRef('funcionario_id'),
+                            obra_id=OuterRef('obra_id'),
+                            data=OuterRef('data'),
+                        )
+                    )
+                ),
+            ),
+        ]
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        padrao = PADROES_SEQ_SCAN.get(vendor)
+        if padrao is None:
+            raise CommandError(f"Backend '{vendor}' nao suportado (use PostgreSQL ou SQLite).")
+
+        amostra = self._amostra()
+        self.stdout.write(
+            f"Banco: {vendor} | amostra: funcionario={amostra['funcionario_id']} "
+            f"obra={amostra['obra_id']} etapa={amostra['etapa_id']} data={amostra['data']}"
+        )
+
+        com_seq_scan = []
+        with transaction.atomic():
+            if options["forcar_indices"]:
+                if vendor != 'postgresql':
+                    raise CommandError("--forcar-indices so se aplica ao PostgreSQL.")
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+
+            for nome, queryset in self._consultas(amostra):
+                plano = queryset.explain()
+                seq_scan = bool(padrao.search(plano))
+                if seq_scan:
+                    com_seq_scan.append(nome)
+                    self.stdout.write(self.style.WARNING(f"  SEQ SCAN  {nome}"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"  indice    {nome}"))
+                if options["verbose_plan"]:
+                    for linha in plano.splitlines():
+                        self.stdout.write(f"            {linha}")
+
+        if not com_seq_scan:
+            self.stdout.write(self.style.SUCCESS("Nenhuma consulta com varredura sequencial."))
+            return
+
+        self.stdout.write(
+            self.style.WARNING(
+                f"{len(com_seq_scan)} consulta(s) com varredura sequencial. Em tabelas pequenas o "
+                "planner pode preferir seq scan; rode ANALYZE ou use --forcar-indices."
+            )
+        )
+        if options["falhar"]:
+            raise CommandError("Consultas com varredura sequencial: " + ", ".join(com_seq_scan))
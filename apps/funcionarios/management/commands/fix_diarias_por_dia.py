@@ -39,39 +39,12 @@ class Command(BaseCommand):
             )
         )
 
-        adjusted_groups = 0
-        total_rows = 0
+        pares = list(duplicated_groups.values_list("funcionario_id", "data"))
 
         with transaction.atomic():
-            for group in duplicated_groups:
-                funcionario_id = group["funcionario_id"]
-                data = group["data"]
-
-                before = {
-                    pk: (horas, valor)
-                    for pk, horas, valor in ApontamentoFuncionario.objects.filter(
-                        funcionario_id=funcionario_id,
-                        data=data,
-                    ).values_list("pk", "horas_trabalhadas", "valor_diaria")
-                }
-
-                ApontamentoFuncionario.ratear_diaria_por_obra(
-                    funcionario_id=funcionario_id,
-                    data=data,
-                )
-
-                after = {
-                    pk: (horas, valor)
-                    for pk, horas, valor in ApontamentoFuncionario.objects.filter(
-                        funcionario_id=funcionario_id,
-                        data=data,
-                    ).values_list("pk", "horas_trabalhadas", "valor_diaria")
-                }
-
-                changed_rows = sum(1 for pk, novo in after.items() if before.get(pk) != novo)
-                if changed_rows > 0:
-                    adjusted_groups += 1
-                    total_rows += changed_rows
+            alterados = ApontamentoFuncionario.normalizar_apontamentos_em_lote(pares)
+            total_rows = len(alterados)
+            adjusted_groups = len({(ap.funcionario_id, ap.data) for ap in alterados})
 
             if not apply_changes:
                 self.stdout.write(
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from apps.funcionarios.models import Funcionario, ResumoDiarioFuncionario
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstroi o resumo diario por funcionario (ResumoDiarioFuncionario) a partir de "
+        "ApontamentoFuncionario e RegistroProducao. A carga inicial e feita pela migracao e "
+        "a tabela e mantida pelos caminhos de escrita; use para refazer resumos divergentes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--funcionario",
+            type=int,
+            action="append",
+            help="Reconstroi apenas o(s) funcionario(s) informado(s) (pode repetir).",
+        )
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=200,
+            help="Quantidade de funcionarios processados por transacao (padrao: 200).",
+        )
+
+    def handle(self, *args, **options):
+        funcionarios = Funcionario.objects.all()
+        if options["funcionario"]:
+            funcionarios = funcionarios.filter(pk__in=options["funcionario"])
+        total = ResumoDiarioFuncionario.reconstruir(funcionarios, lote=options["lote"])
+        self.stdout.write(self.style.SUCCESS(f"Resumos diarios reconstruidos: {total}"))
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.1 on 2026-10-17 17:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funcionarios', '0024_alter_funcionario_funcao'),
+        ('obras', '0012_etapa1fundacao_aterro_contrapiso_inicio_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='apontamentofuncionario',
+            name='funcionario',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='apontamentos', to='funcionarios.funcionario', verbose_name='Funcionário'),
+        ),
+        migrations.AlterField(
+            model_name='apontamentofuncionario',
+            name='obra',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='apontamentos_funcionarios', to='obras.obra', verbose_name='Obra'),
+        ),
+        migrations.AddIndex(
+            model_name='apontamentofuncionario',
+            index=models.Index(fields=['funcionario', 'data'], include=('obra', 'created_at', 'horas_trabalhadas', 'valor_diaria', 'houve_ociosidade', 'houve_retrabalho'), name='apont_func_data_cov_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='apontamentofuncionario',
+            index=models.Index(fields=['obra', 'data'], name='apont_obra_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='apontamentofuncionario',
+            index=models.Index(fields=['obra', 'etapa', 'data'], name='apont_obra_etapa_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='apontamentofuncionario',
+            index=models.Index(fields=['-data', '-created_at'], name='apont_data_created_idx'),
+        ),
+    ]
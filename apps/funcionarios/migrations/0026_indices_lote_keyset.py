@@ -0,0 +1,24 @@
+# Generated by Django 5.0.1 on 2026-10-17 17:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funcionarios', '0025_indices_apontamentofuncionario'),
+        ('obras', '0012_etapa1fundacao_aterro_contrapiso_inicio_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='apontamentodiariolote',
+            index=models.Index(fields=['-data', '-created_at', '-id'], name='lote_data_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='apontamentodiariolote',
+            index=models.Index(fields=['obra', '-data', '-created_at', '-id'], name='lote_obra_data_created_idx'),
+        ),
+    ]
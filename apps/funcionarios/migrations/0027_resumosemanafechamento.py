@@ -0,0 +1,75 @@
+# Generated by Django 5.0.1 on 2026-10-17 17:49
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def popular_resumos(apps, schema_editor):
+    FechamentoSemanal = apps.get_model('funcionarios', 'FechamentoSemanal')
+    ResumoSemanaFechamento = apps.get_model('funcionarios', 'ResumoSemanaFechamento')
+
+    linhas = (
+        FechamentoSemanal.objects
+        .values('data_inicio', 'data_fim')
+        .annotate(
+            total_funcionarios=Count('id'),
+            total_dias=Sum('total_dias'),
+            total_valor=Sum('total_valor'),
+            total_ociosidade=Sum('dias_ociosidade'),
+            total_retrabalho=Sum('dias_retrabalho'),
+            qtd_fechados=Count('id', filter=Q(status='fechado')),
+            qtd_pagos=Count('id', filter=Q(status='pago')),
+        )
+        .order_by()
+    )
+    ResumoSemanaFechamento.objects.bulk_create(
+        [
+            ResumoSemanaFechamento(
+                data_inicio=linha['data_inicio'],
+                data_fim=linha['data_fim'],
+                total_funcionarios=linha['total_funcionarios'],
+                total_dias=linha['total_dias'] or 0,
+                total_valor=linha['total_valor'] or Decimal('0.00'),
+                total_ociosidade=linha['total_ociosidade'] or 0,
+                total_retrabalho=linha['total_retrabalho'] or 0,
+                qtd_fechados=linha['qtd_fechados'],
+                qtd_pagos=linha['qtd_pagos'],
+            )
+            for linha in linhas
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funcionarios', '0026_indices_lote_keyset'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoSemanaFechamento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_inicio', models.DateField(verbose_name='Data Início da Semana')),
+                ('data_fim', models.DateField(verbose_name='Data Fim da Semana')),
+                ('total_funcionarios', models.PositiveIntegerField(default=0, verbose_name='Funcionários')),
+                ('total_dias', models.PositiveIntegerField(default=0, verbose_name='Total de Dias')),
+                ('total_valor', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, verbose_name='Total a Pagar (R$)')),
+                ('total_ociosidade', models.PositiveIntegerField(default=0, verbose_name='Dias com Ociosidade')),
+                ('total_retrabalho', models.PositiveIntegerField(default=0, verbose_name='Dias com Retrabalho')),
+                ('qtd_fechados', models.PositiveIntegerField(default=0, verbose_name='Fechados')),
+                ('qtd_pagos', models.PositiveIntegerField(default=0, verbose_name='Pagos')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+            ],
+            options={
+                'verbose_name': 'Resumo Semanal de Fechamentos',
+                'verbose_name_plural': 'Resumos Semanais de Fechamentos',
+                'ordering': ['-data_inicio', '-data_fim'],
+                'unique_together': {('data_inicio', 'data_fim')},
+            },
+        ),
+        migrations.RunPython(popular_resumos, migrations.RunPython.noop),
+    ]
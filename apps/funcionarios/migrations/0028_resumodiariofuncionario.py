@@ -0,0 +1,108 @@
+# Generated by Django 5.0.1 on 2026-10-17 17:52
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def popular_resumos(apps, schema_editor):
+    Funcionario = apps.get_model('funcionarios', 'Funcionario')
+    ApontamentoFuncionario = apps.get_model('funcionarios', 'ApontamentoFuncionario')
+    RegistroProducao = apps.get_model('funcionarios', 'RegistroProducao')
+    ResumoDiarioFuncionario = apps.get_model('funcionarios', 'ResumoDiarioFuncionario')
+
+    # Mesmo cálculo de ResumoDiarioFuncionario._calcular, em blocos de funcionários.
+    ids = list(Funcionario.objects.order_by('pk').values_list('pk', flat=True))
+    for inicio in range(0, len(ids), 200):
+        bloco = ids[inicio:inicio + 200]
+        resumos = {}
+
+        def resumo_do_par(funcionario_id, data):
+            chave = (funcionario_id, data)
+            if chave not in resumos:
+                resumos[chave] = ResumoDiarioFuncionario(
+                    funcionario_id=funcionario_id, data=data,
+                    obras={}, etapas={}, producao={}, obras_producao=[],
+                )
+            return resumos[chave]
+
+        linhas = (
+            ApontamentoFuncionario.objects
+            .filter(funcionario_id__in=bloco)
+            .order_by('funcionario_id', 'data', 'created_at', 'pk')
+            .values_list(
+                'funcionario_id', 'data', 'obra_id', 'etapa__numero_etapa', 'clima',
+                'houve_ociosidade', 'houve_retrabalho', 'horas_trabalhadas', 'valor_diaria', 'metragem_executada',
+            )
+        )
+        for (funcionario_id, data, obra_id, numero_etapa, clima,
+             ociosidade, retrabalho, horas, valor, metragem) in linhas.iterator(chunk_size=2000):
+            resumo = resumo_do_par(funcionario_id, data)
+            horas = horas or Decimal('0.0')
+            valor = valor or Decimal('0.00')
+            metragem = metragem or Decimal('0.00')
+            resumo.qtd_apontamentos += 1
+            resumo.horas += horas
+            resumo.valor += valor
+            resumo.metragem += metragem
+            resumo.houve_ociosidade = resumo.houve_ociosidade or ociosidade
+            resumo.houve_retrabalho = resumo.houve_retrabalho or retrabalho
+            resumo.clima = resumo.clima or clima or ''
+            obra = resumo.obras.setdefault(str(obra_id), {'horas': '0.0', 'valor': '0.00', 'metragem': '0.00'})
+            obra['horas'] = str(Decimal(obra['horas']) + horas)
+            obra['valor'] = str(Decimal(obra['valor']) + valor)
+            obra['metragem'] = str(Decimal(obra['metragem']) + metragem)
+            if numero_etapa is not None:
+                chave_etapa = str(numero_etapa)
+                resumo.etapas[chave_etapa] = str(Decimal(resumo.etapas.get(chave_etapa, '0.00')) + metragem)
+
+        linhas = (
+            RegistroProducao.objects
+            .filter(funcionario_id__in=bloco)
+            .order_by()
+            .values_list('funcionario_id', 'data', 'obra_id', 'indicador', 'quantidade')
+        )
+        for funcionario_id, data, obra_id, indicador, quantidade in linhas.iterator(chunk_size=2000):
+            resumo = resumo_do_par(funcionario_id, data)
+            resumo.producao[indicador] = str(Decimal(resumo.producao.get(indicador, '0.00')) + quantidade)
+            if obra_id not in resumo.obras_producao:
+                resumo.obras_producao.append(obra_id)
+
+        ResumoDiarioFuncionario.objects.bulk_create(list(resumos.values()), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funcionarios', '0027_resumosemanafechamento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoDiarioFuncionario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField(verbose_name='Data')),
+                ('qtd_apontamentos', models.PositiveIntegerField(default=0, verbose_name='Apontamentos')),
+                ('horas', models.DecimalField(decimal_places=1, default=Decimal('0.0'), max_digits=6, verbose_name='Horas')),
+                ('valor', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10, verbose_name='Valor (R$)')),
+                ('metragem', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, verbose_name='Metragem')),
+                ('houve_ociosidade', models.BooleanField(default=False, verbose_name='Houve Ociosidade')),
+                ('houve_retrabalho', models.BooleanField(default=False, verbose_name='Houve Retrabalho')),
+                ('clima', models.CharField(blank=True, max_length=10, verbose_name='Clima')),
+                ('obras', models.JSONField(blank=True, default=dict, verbose_name='Obras')),
+                ('etapas', models.JSONField(blank=True, default=dict, verbose_name='Etapas')),
+                ('producao', models.JSONField(blank=True, default=dict, verbose_name='Produção por Indicador')),
+                ('obras_producao', models.JSONField(blank=True, default=list, verbose_name='Obras com Produção')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('funcionario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumos_diarios', to='funcionarios.funcionario', verbose_name='Funcionário')),
+            ],
+            options={
+                'verbose_name': 'Resumo Diário do Funcionário',
+                'verbose_name_plural': 'Resumos Diários dos Funcionários',
+                'ordering': ['funcionario', 'data'],
+                'unique_together': {('funcionario', 'data')},
+            },
+        ),
+        migrations.RunPython(popular_resumos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.0.1 on 2026-10-17 18:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funcionarios', '0028_resumodiariofuncionario'),
+        ('obras', '0012_etapa1fundacao_aterro_contrapiso_inicio_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='apontamentofuncionario',
+            name='apont_func_data_cov_idx',
+        ),
+        migrations.AddIndex(
+            model_name='apontamentofuncionario',
+            index=models.Index(fields=['funcionario', 'data'], include=('id', 'obra', 'created_at', 'horas_trabalhadas', 'valor_diaria', 'houve_ociosidade', 'houve_retrabalho'), name='apont_func_data_cov_idx'),
+        ),
+    ]
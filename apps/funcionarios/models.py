@@ -1,9 +1,48 @@
 from django.db import models, transaction
-from django.db.models import Sum
+from django.db.models import Count, F, FilteredRelation, Q, Sum
 from django.core.validators import MinValueValidator, MaxValueValidator
 from decimal import Decimal
 from apps.obras.models import Obra, Etapa
 from django.contrib.auth.models import User
+from django.utils import timezone
+from contextlib import contextmanager
+import threading
+import time
+
+# Marca (por thread) que já existe um FechamentoSemanal.manter_totais ativo;
+# chamadas aninhadas (save -> normalização) não recontam o mesmo dia.
+_manutencao_fechamentos = threading.local()
+
+# Chaves pendentes (por thread) dos resumos materializados dentro de agrupar().
+_resumo_semanas = threading.local()
+_resumo_diario = threading.local()
+
+
+def _registrar_pendentes(pendencias, chaves, atualizar):
+    """Atualiza as chaves agora ou, dentro de _agrupar_pendentes(), ao final do bloco."""
+    pendentes = getattr(pendencias, 'pendentes', None)
+    if pendentes is not None:
+        pendentes.update(chaves)
+        return
+    atualizar(chaves)
+
+
+@contextmanager
+def _agrupar_pendentes(pendencias, atualizar):
+    """
+    Junta as chaves registradas dentro do bloco e chama `atualizar` uma só vez
+    no final. Blocos aninhados reaproveitam o externo.
+    """
+    if getattr(pendencias, 'pendentes', None) is not None:
+        yield
+        return
+    pendencias.pendentes = set()
+    try:
+        yield
+        chaves = pendencias.pendentes
+    finally:
+        pendencias.pendentes = None
+    atualizar(chaves)
 
 
 class Funcionario(models.Model):
@@ -105,6 +144,7 @@ class ApontamentoFuncionario(models.Model):
         Funcionario,
         on_delete=models.PROTECT,
         related_name='apontamentos',
+        db_index=False,  # coberto por apont_func_data_cov_idx
         verbose_name="Funcionário"
     )
     
@@ -112,6 +152,7 @@ class ApontamentoFuncionario(models.Model):
         Obra,
         on_delete=models.CASCADE,
         related_name='apontamentos_funcionarios',
+        db_index=False,  # coberto por apont_obra_data_idx
         verbose_name="Obra"
     )
     
@@ -212,13 +253,34 @@ class ApontamentoFuncionario(models.Model):
         # ✅ PERMITE mesmo funcionário ir e voltar da mesma obra no mesmo dia
         # Cada apontamento é único e registra um período trabalhado
         # Sem unique_together = registros ilimitados
+        #
+        # Índices dos caminhos quentes (funcionario/obra já são a 1ª coluna dos
+        # compostos, por isso as FKs não têm índice próprio). O INCLUDE (só
+        # PostgreSQL) cobre a normalização do dia (id, obra, created_at, horas,
+        # valor) e o fechamento semanal (horas, valor, ociosidade, retrabalho)
+        # sem visitar a tabela; fora do PostgreSQL as colunas extras são
+        # ignoradas e o aviso models.W040 é silenciado em settings.
+        # Ver `manage.py explain_consultas_apontamentos`.
+        indexes = [
+            models.Index(
+                fields=['funcionario', 'data'],
+                include=[
+                    'id', 'obra', 'created_at', 'horas_trabalhadas', 'valor_diaria',
+                    'houve_ociosidade', 'houve_retrabalho',
+                ],
+                name='apont_func_data_cov_idx',
+            ),
+            models.Index(fields=['obra', 'data'], name='apont_obra_data_idx'),
+            models.Index(fields=['obra', 'etapa', 'data'], name='apont_obra_etapa_data_idx'),
+            models.Index(fields=['-data', '-created_at'], name='apont_data_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.funcionario.nome_completo} - {self.obra.nome} - {self.data.strftime('%d/%m/%Y')}"
     
     BASE_HORAS_DIA = Decimal('8.0')
 
-    def save(self, *args, **kwargs):
+    def save(self, *args, normalizar=True, **kwargs):
         diaria_base = self.funcionario.valor_diaria or Decimal('0.00')
         if self.funcionario and self.funcionario.funcao == 'fiscal':
             diaria_base = Decimal('0.00')
@@ -228,9 +290,23 @@ class ApontamentoFuncionario(models.Model):
         if self.valor_diaria is None:
             self.valor_diaria = diaria_base
 
-        with transaction.atomic():
+        pares = [(self.funcionario_id, self.data)]
+        if self.pk:
+            anterior = type(self).objects.filter(pk=self.pk).values_list('funcionario_id', 'data').first()
+            if anterior:
+                pares.append(anterior)
+
+        with FechamentoSemanal.manter_totais(pares):
             super().save(*args, **kwargs)
-            self._normalizar_valor_diaria_dia(diaria_base)
+            # normalizar=False: o chamador normaliza o dia depois, em lote
+            # (ex.: apontamento em lote com varios funcionarios).
+            if normalizar:
+                self._normalizar_valor_diaria_dia(diaria_base)
+
+    def delete(self, *args, **kwargs):
+        # O post_delete renormaliza o dia; tudo entra no delta do fechamento.
+        with FechamentoSemanal.manter_totais([(self.funcionario_id, self.data)]):
+            return super().delete(*args, **kwargs)
 
     def _normalizar_valor_diaria_dia(self, diaria_base):
         """
@@ -242,10 +318,10 @@ class ApontamentoFuncionario(models.Model):
           diferentes), somente um apontamento daquela obra recebe horas/valor
           da obra no dia. Os demais ficam zerados.
         """
-        type(self).normalizar_apontamentos_dia(
-            funcionario_id=self.funcionario_id,
-            data=self.data,
-            diaria_base=diaria_base,
+        type(self).normalizar_apontamentos_em_lote(
+            [(self.funcionario_id, self.data)],
+            diarias_base={self.funcionario_id: diaria_base},
+            funcionarios={self.funcionario_id: self.funcionario},
         )
 
     @classmethod
@@ -272,37 +348,111 @@ class ApontamentoFuncionario(models.Model):
         - Se houver mais de um apontamento da mesma obra no dia, concentra
           horas/valor no primeiro e zera os demais (etapas nao duplicam custo).
         """
-        funcionario_data = (
-            Funcionario.objects.filter(pk=funcionario_id)
-            .values('valor_diaria', 'funcao')
-            .first()
-        ) or {}
-        is_fiscal = funcionario_data.get('funcao') == 'fiscal'
+        cls.normalizar_apontamentos_em_lote(
+            [(funcionario_id, data)],
+            diarias_base=None if diaria_base is None else {funcionario_id: diaria_base},
+        )
 
-        if diaria_base is None:
-            if is_fiscal:
-                diaria_base = Decimal('0.00')
-            else:
-                diaria_base = funcionario_data.get('valor_diaria') or Decimal('0.00')
-        elif is_fiscal:
-            diaria_base = Decimal('0.00')
+    # Quantidade de pares (funcionario, data) carregados por consulta.
+    NORMALIZACAO_LOTE_TAMANHO = 500
 
-        rows = list(
-            cls.objects.filter(
-                funcionario_id=funcionario_id,
-                data=data,
-            )
-            .values('pk', 'obra_id', 'horas_trabalhadas')
-            .order_by('created_at', 'pk')
-        )
+    @classmethod
+    def normalizar_apontamentos_em_lote(cls, pares, diarias_base=None, funcionarios=None):
+        """
+        Normaliza varios dias de uma vez (mesmas regras de normalizar_apontamentos_dia).
 
-        if not rows:
-            return
+        pares: iteravel de (funcionario_id, data).
+        diarias_base: {funcionario_id: Decimal} opcional; sobrescreve a diaria do cadastro.
+        funcionarios: {funcionario_id: Funcionario} opcional; evita recarregar o cadastro.
+
+        Carrega os funcionarios e os apontamentos de cada bloco de pares em uma
+        consulta cada, calcula o rateio em memoria e grava apenas as linhas
+        alteradas com um unico bulk_update por bloco.
+
+        Retorna a lista de apontamentos alterados.
+        """
+        pares = list(dict.fromkeys(
+            (funcionario_id, data)
+            for funcionario_id, data in pares
+            if funcionario_id and data
+        ))
+        if not pares:
+            return []
+
+        diarias_base = diarias_base or {}
+        cadastro = {
+            pk: (func.valor_diaria, func.funcao)
+            for pk, func in (funcionarios or {}).items()
+        }
+        faltantes = {funcionario_id for funcionario_id, _ in pares} - set(cadastro)
+        if faltantes:
+            cadastro.update({
+                pk: (valor_diaria, funcao)
+                for pk, valor_diaria, funcao in Funcionario.objects.filter(
+                    pk__in=faltantes
+                ).values_list('pk', 'valor_diaria', 'funcao')
+            })
+
+        alterados = []
+        tamanho = cls.NORMALIZACAO_LOTE_TAMANHO
+        for inicio in range(0, len(pares), tamanho):
+            bloco = pares[inicio:inicio + tamanho]
+
+            # Um filtro por data (com IN de funcionarios) evita o produto
+            # cartesiano funcionario x data do bloco.
+            funcionarios_por_data = {}
+            for funcionario_id, data in bloco:
+                funcionarios_por_data.setdefault(data, []).append(funcionario_id)
+            filtro = Q()
+            for data, ids in funcionarios_por_data.items():
+                filtro |= Q(data=data, funcionario_id__in=ids)
+
+            rows_por_par = {}
+            for row in (
+                cls.objects.filter(filtro)
+                .only('pk', 'funcionario_id', 'obra_id', 'data', 'horas_trabalhadas', 'valor_diaria')
+                .order_by('created_at', 'pk')
+            ):
+                rows_por_par.setdefault((row.funcionario_id, row.data), []).append(row)
+
+            for par, rows in rows_por_par.items():
+                funcionario_id = par[0]
+                valor_cadastro, funcao = cadastro.get(funcionario_id, (None, None))
+                is_fiscal = funcao == 'fiscal'
+                if is_fiscal:
+                    diaria_base = Decimal('0.00')
+                elif funcionario_id in diarias_base:
+                    diaria_base = diarias_base[funcionario_id]
+                else:
+                    diaria_base = valor_cadastro or Decimal('0.00')
+
+                for row, horas, valor in cls._calcular_rateio_dia(rows, diaria_base, is_fiscal):
+                    if row.horas_trabalhadas != horas or row.valor_diaria != valor:
+                        row.horas_trabalhadas = horas
+                        row.valor_diaria = valor
+                        alterados.append(row)
+
+        if alterados:
+            with FechamentoSemanal.manter_totais((row.funcionario_id, row.data) for row in alterados):
+                cls.objects.bulk_update(
+                    alterados,
+                    ['horas_trabalhadas', 'valor_diaria'],
+                    batch_size=tamanho,
+                )
+        return alterados
 
+    @classmethod
+    def _calcular_rateio_dia(cls, rows, diaria_base, is_fiscal):
+        """
+        Calcula o rateio de um funcionario/dia em memoria.
+
+        rows: apontamentos do dia ordenados por (created_at, pk).
+        Retorna lista de (apontamento, horas, valor).
+        """
         obras_ordem = []
         obra_para_rows = {}
         for row in rows:
-            obra_id = row['obra_id']
+            obra_id = row.obra_id
             if obra_id not in obra_para_rows:
                 obra_para_rows[obra_id] = []
                 obras_ordem.append(obra_id)
@@ -315,7 +465,7 @@ class ApontamentoFuncionario(models.Model):
             # Usa a soma do MAIOR horario por obra no dia (capada em 8h).
             # Isso evita duplicidade por etapa na mesma obra e e idempotente.
             horas_base_dia = sum(
-                max((r['horas_trabalhadas'] or Decimal('0.0')) for r in rows_obra)
+                max((r.horas_trabalhadas or Decimal('0.0')) for r in rows_obra)
                 for rows_obra in obra_para_rows.values()
             )
         if horas_base_dia > cls.BASE_HORAS_DIA:
@@ -332,14 +482,14 @@ class ApontamentoFuncionario(models.Model):
         total_centavos = cls._valor_para_centavos(valor_total_dia)
         total_obras = len(obras_ordem)
         if total_obras == 0:
-            return
+            return []
 
         centavos_por_obra_base = total_centavos // total_obras
         resto_obras = total_centavos % total_obras
         decihoras_por_obra_base = total_decihoras // total_obras
         resto_decihoras = total_decihoras % total_obras
 
-        updates = []
+        rateio = []
         for idx_obra, obra_id in enumerate(obras_ordem):
             centavos_obra = centavos_por_obra_base + (1 if idx_obra < resto_obras else 0)
             decihoras_obra = decihoras_por_obra_base + (1 if idx_obra < resto_decihoras else 0)
@@ -348,24 +498,14 @@ class ApontamentoFuncionario(models.Model):
                 continue
 
             # Regra por obra: concentra no primeiro registro da obra/dia.
-            primeiro_pk = rows_obra[0]['pk']
-            updates.append((
-                primeiro_pk,
+            rateio.append((
+                rows_obra[0],
                 cls._decihoras_para_valor(decihoras_obra),
                 cls._centavos_para_valor(centavos_obra),
             ))
             for row in rows_obra[1:]:
-                updates.append((row['pk'], Decimal('0.0'), Decimal('0.00')))
-
-        with transaction.atomic():
-            for pk, horas, valor in updates:
-                cls.objects.filter(pk=pk).exclude(
-                    horas_trabalhadas=horas,
-                    valor_diaria=valor,
-                ).update(
-                    horas_trabalhadas=horas,
-                    valor_diaria=valor,
-                )
+                rateio.append((row, Decimal('0.0'), Decimal('0.00')))
+        return rateio
 
     @classmethod
     def ratear_diaria_por_obra(cls, funcionario_id, data, diaria_base=None):
@@ -453,27 +593,232 @@ class FechamentoSemanal(models.Model):
     def __str__(self):
         return f"{self.funcionario.nome_completo} - {self.data_inicio.strftime('%d/%m/%Y')} a {self.data_fim.strftime('%d/%m/%Y')}"
     
+    CAMPOS_TOTAIS = ['total_dias', 'total_horas', 'total_valor', 'dias_ociosidade', 'dias_retrabalho']
+
+    @staticmethod
+    def _totais_por_funcionario(apontamentos):
+        """
+        Totais do período por funcionário em uma única consulta agrupada
+        (dias/ociosidade/retrabalho contam datas distintas).
+        """
+        return (
+            apontamentos
+            .exclude(funcionario__funcao='fiscal')
+            .values('funcionario_id')
+            .annotate(
+                total_dias=Count('data', distinct=True),
+                total_horas=Sum('horas_trabalhadas'),
+                total_valor=Sum('valor_diaria'),
+                dias_ociosidade=Count('data', distinct=True, filter=Q(houve_ociosidade=True)),
+                dias_retrabalho=Count('data', distinct=True, filter=Q(houve_retrabalho=True)),
+            )
+            .order_by()
+        )
+
+    @classmethod
+    def gerar_em_lote(cls, data_inicio, data_fim, funcionarios=None):
+        """
+        Gera (ou atualiza) os fechamentos do período para todos os funcionários
+        com apontamento: uma consulta agrupada para os totais e um
+        INSERT ... ON CONFLICT para gravar. Fechamentos já existentes mantêm
+        status/pagamento e só têm os totais atualizados.
+
+        Retorna {'criados', 'atualizados', 'tempos'} (segundos por fase).
+        """
+        if funcionarios is None:
+            funcionarios = Funcionario.objects.filter(ativo=True)
+        tempos = {}
+
+        inicio = time.perf_counter()
+        totais = list(cls._totais_por_funcionario(
+            ApontamentoFuncionario.objects.filter(
+                funcionario__in=funcionarios,
+                data__gte=data_inicio,
+                data__lte=data_fim,
+            )
+        ))
+        tempos['agregacao'] = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        existentes = set(
+            cls.objects.filter(
+                data_inicio=data_inicio,
+                data_fim=data_fim,
+                funcionario_id__in=[linha['funcionario_id'] for linha in totais],
+            ).values_list('funcionario_id', flat=True)
+        )
+        tempos['existentes'] = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        fechamentos = [
+            cls(
+                funcionario_id=linha['funcionario_id'],
+                data_inicio=data_inicio,
+                data_fim=data_fim,
+                status='fechado',
+                total_dias=linha['total_dias'],
+                total_horas=linha['total_horas'] or Decimal('0.0'),
+                total_valor=linha['total_valor'] or Decimal('0.00'),
+                dias_ociosidade=linha['dias_ociosidade'],
+                dias_retrabalho=linha['dias_retrabalho'],
+            )
+            for linha in totais
+        ]
+        if fechamentos:
+            with transaction.atomic():
+                cls.objects.bulk_create(
+                    fechamentos,
+                    batch_size=500,
+                    update_conflicts=True,
+                    unique_fields=['funcionario', 'data_inicio', 'data_fim'],
+                    update_fields=cls.CAMPOS_TOTAIS + ['updated_at'],
+                )
+                ResumoSemanaFechamento.atualizar([(data_inicio, data_fim)])
+        tempos['gravacao'] = time.perf_counter() - inicio
+
+        return {
+            'criados': len(fechamentos) - len(existentes),
+            'atualizados': len(existentes),
+            'tempos': tempos,
+        }
+
+    # ----------------- Manutenção incremental (fechamentos abertos) -----------------
+
+    @staticmethod
+    def _filtro_pares(pares):
+        filtro = Q()
+        for funcionario_id, data in pares:
+            filtro |= Q(funcionario_id=funcionario_id, data=data)
+        return filtro
+
+    @staticmethod
+    def _contribuicao_dias(pares):
+        """
+        Contribuição de cada (funcionario_id, data) para um fechamento:
+        dias/ociosidade/retrabalho valem 0 ou 1 (datas distintas), horas e valor somam.
+        """
+        linhas = (
+            ApontamentoFuncionario.objects
+            .filter(FechamentoSemanal._filtro_pares(pares))
+            .exclude(funcionario__funcao='fiscal')
+            .values('funcionario_id', 'data')
+            .annotate(
+                horas=Sum('horas_trabalhadas'),
+                valor=Sum('valor_diaria'),
+                ociosos=Count('pk', filter=Q(houve_ociosidade=True)),
+                retrabalhos=Count('pk', filter=Q(houve_retrabalho=True)),
+            )
+            .order_by()
+        )
+        return {
+            (linha['funcionario_id'], linha['data']): (
+                1,
+                linha['horas'] or Decimal('0.0'),
+                linha['valor'] or Decimal('0.00'),
+                1 if linha['ociosos'] else 0,
+                1 if linha['retrabalhos'] else 0,
+            )
+            for linha in linhas
+        }
+
+    @classmethod
+    @contextmanager
+    def manter_totais(cls, pares):
+        """
+        Mantém os fechamentos abertos (status 'fechado') em dia com as
+        alterações de apontamento feitas dentro do bloco.
+
+        pares: (funcionario_id, data) que o bloco pode alterar (incluir os
+        valores antigos em edições). Os fechamentos que cobrem essas datas são
+        travados (select_for_update, por pk) antes da leitura — a trava por
+        funcionário/semana serializa alterações concorrentes —; a contribuição
+        de cada dia é lida antes e depois do bloco e só a diferença é aplicada.
+        Os mesmos dias são recalculados no ResumoDiarioFuncionario ao final.
+
+        Blocos aninhados na mesma thread reaproveitam o bloco externo.
+        """
+        if getattr(_manutencao_fechamentos, 'ativo', False):
+            ResumoDiarioFuncionario.registrar(pares)
+            yield
+            return
+
+        campo_data = ApontamentoFuncionario._meta.get_field('data')
+        pares = {
+            (int(funcionario_id), campo_data.to_python(data))
+            for funcionario_id, data in pares
+            if funcionario_id and data
+        }
+
+        with transaction.atomic(), ResumoDiarioFuncionario.agrupar():
+            ResumoDiarioFuncionario.registrar(pares)
+            _manutencao_fechamentos.ativo = True
+            try:
+                abertos = []
+                if pares:
+                    filtro = Q()
+                    for funcionario_id, data in pares:
+                        filtro |= Q(funcionario_id=funcionario_id, data_inicio__lte=data, data_fim__gte=data)
+                    abertos = list(
+                        cls.objects.select_for_update()
+                        .filter(filtro, status='fechado')
+                        .order_by('pk')
+                    )
+                antes = cls._contribuicao_dias(pares) if abertos else {}
+
+                yield
+
+                if abertos:
+                    depois = cls._contribuicao_dias(pares)
+                    cls._aplicar_deltas(abertos, pares, antes, depois)
+            finally:
+                _manutencao_fechamentos.ativo = False
+
+    @classmethod
+    def _aplicar_deltas(cls, abertos, pares, antes, depois):
+        vazio = (0, Decimal('0.0'), Decimal('0.00'), 0, 0)
+        alterados = []
+        for fechamento in abertos:
+            delta = [0, Decimal('0.0'), Decimal('0.00'), 0, 0]
+            for funcionario_id, data in pares:
+                if funcionario_id != fechamento.funcionario_id:
+                    continue
+                if not (fechamento.data_inicio <= data <= fechamento.data_fim):
+                    continue
+                novo = depois.get((funcionario_id, data), vazio)
+                velho = antes.get((funcionario_id, data), vazio)
+                for indice in range(5):
+                    delta[indice] += novo[indice] - velho[indice]
+            if not any(delta):
+                continue
+            fechamento.total_dias = max(fechamento.total_dias + delta[0], 0)
+            fechamento.total_horas = max(fechamento.total_horas + delta[1], Decimal('0.0'))
+            fechamento.total_valor = max(fechamento.total_valor + delta[2], Decimal('0.00'))
+            fechamento.dias_ociosidade = max(fechamento.dias_ociosidade + delta[3], 0)
+            fechamento.dias_retrabalho = max(fechamento.dias_retrabalho + delta[4], 0)
+            fechamento.updated_at = timezone.now()
+            alterados.append(fechamento)
+        if alterados:
+            cls.objects.bulk_update(alterados, cls.CAMPOS_TOTAIS + ['updated_at'])
+            ResumoSemanaFechamento.registrar(
+                (fechamento.data_inicio, fechamento.data_fim) for fechamento in alterados
+            )
+
     def calcular_totais(self):
-        """Calcula os totais baseado nos apontamentos da semana"""
+        """Calcula os totais baseado nos apontamentos da semana (uma agregação + save)"""
         apontamentos = ApontamentoFuncionario.objects.filter(
-            funcionario=self.funcionario,
+            funcionario_id=self.funcionario_id,
             data__gte=self.data_inicio,
             data__lte=self.data_fim
         ).exclude(funcionario__funcao='fiscal')
-        # Count distinct days (one diária per date)
-        dates_qs = apontamentos.values_list('data', flat=True).distinct()
-        self.total_dias = dates_qs.count()
-
+        # Dias = datas distintas (uma diária por data), idem ociosidade/retrabalho
         totais = apontamentos.aggregate(
+            total_dias=Count('data', distinct=True),
             total_horas=Sum('horas_trabalhadas'),
             total_valor=Sum('valor_diaria'),
+            dias_ociosidade=Count('data', distinct=True, filter=Q(houve_ociosidade=True)),
+            dias_retrabalho=Count('data', distinct=True, filter=Q(houve_retrabalho=True)),
         )
-        self.total_horas = totais.get('total_horas') or Decimal('0.0')
-        self.total_valor = totais.get('total_valor') or Decimal('0.00')
-
-        # Count distinct dates where there was ociosidade / retrabalho
-        self.dias_ociosidade = apontamentos.filter(houve_ociosidade=True).values('data').distinct().count()
-        self.dias_retrabalho = apontamentos.filter(houve_retrabalho=True).values('data').distinct().count()
+        self._aplicar_totais(totais)
         self.save()
         
         return {
@@ -483,6 +828,59 @@ class FechamentoSemanal(models.Model):
             'dias_ociosidade': self.dias_ociosidade,
             'dias_retrabalho': self.dias_retrabalho,
         }
+
+    def _aplicar_totais(self, totais):
+        self.total_dias = totais.get('total_dias') or 0
+        self.total_horas = totais.get('total_horas') or Decimal('0.0')
+        self.total_valor = totais.get('total_valor') or Decimal('0.00')
+        self.dias_ociosidade = totais.get('dias_ociosidade') or 0
+        self.dias_retrabalho = totais.get('dias_retrabalho') or 0
+
+    @classmethod
+    def recalcular_em_lote(cls, queryset):
+        """
+        Recalcula os totais de vários fechamentos (períodos quaisquer) com uma
+        consulta agrupada e um bulk_update. Retorna a quantidade atualizada.
+        """
+        periodo = FilteredRelation(
+            'funcionario__apontamentos',
+            condition=Q(
+                funcionario__apontamentos__data__gte=F('data_inicio'),
+                funcionario__apontamentos__data__lte=F('data_fim'),
+            ),
+        )
+        sem_fiscal = ~Q(funcionario__funcao='fiscal')
+        linhas = (
+            queryset
+            .annotate(ap_periodo=periodo)
+            .order_by()
+            .values('pk')
+            .annotate(
+                total_dias=Count('ap_periodo__data', distinct=True, filter=sem_fiscal),
+                total_horas=Sum('ap_periodo__horas_trabalhadas', filter=sem_fiscal),
+                total_valor=Sum('ap_periodo__valor_diaria', filter=sem_fiscal),
+                dias_ociosidade=Count(
+                    'ap_periodo__data', distinct=True,
+                    filter=sem_fiscal & Q(ap_periodo__houve_ociosidade=True),
+                ),
+                dias_retrabalho=Count(
+                    'ap_periodo__data', distinct=True,
+                    filter=sem_fiscal & Q(ap_periodo__houve_retrabalho=True),
+                ),
+            )
+        )
+        agora = timezone.now()
+        fechamentos = []
+        for linha in linhas:
+            fechamento = cls(pk=linha['pk'], updated_at=agora)
+            fechamento._aplicar_totais(linha)
+            fechamentos.append(fechamento)
+        if fechamentos:
+            cls.objects.bulk_update(fechamentos, cls.CAMPOS_TOTAIS + ['updated_at'], batch_size=500)
+            ResumoSemanaFechamento.registrar(
+                queryset.order_by().values_list('data_inicio', 'data_fim').distinct()
+            )
+        return len(fechamentos)
     
     def get_apontamentos(self):
         """Retorna apontamentos do período"""
@@ -518,6 +916,141 @@ class FechamentoSemanal(models.Model):
         return obras_etapas
 
 
+class ResumoSemanaFechamento(models.Model):
+    """
+    Resumo por semana (data_inicio, data_fim) dos fechamentos, usado pelo
+    índice paginado de fechamento_list.
+
+    Mantido a cada alteração de FechamentoSemanal (signals e caminhos em
+    lote); `reconstruir()` refaz a tabela inteira.
+    """
+
+    data_inicio = models.DateField(verbose_name="Data Início da Semana")
+    data_fim = models.DateField(verbose_name="Data Fim da Semana")
+    total_funcionarios = models.PositiveIntegerField(default=0, verbose_name="Funcionários")
+    total_dias = models.PositiveIntegerField(default=0, verbose_name="Total de Dias")
+    total_valor = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name="Total a Pagar (R$)"
+    )
+    total_ociosidade = models.PositiveIntegerField(default=0, verbose_name="Dias com Ociosidade")
+    total_retrabalho = models.PositiveIntegerField(default=0, verbose_name="Dias com Retrabalho")
+    qtd_fechados = models.PositiveIntegerField(default=0, verbose_name="Fechados")
+    qtd_pagos = models.PositiveIntegerField(default=0, verbose_name="Pagos")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Atualizado em")
+
+    class Meta:
+        verbose_name = "Resumo Semanal de Fechamentos"
+        verbose_name_plural = "Resumos Semanais de Fechamentos"
+        ordering = ['-data_inicio', '-data_fim']
+        unique_together = ['data_inicio', 'data_fim']
+
+    def __str__(self):
+        return f"{self.data_inicio.strftime('%d/%m/%Y')} a {self.data_fim.strftime('%d/%m/%Y')}"
+
+    CAMPOS_RESUMO = [
+        'total_funcionarios', 'total_dias', 'total_valor', 'total_ociosidade',
+        'total_retrabalho', 'qtd_fechados', 'qtd_pagos',
+    ]
+
+    @property
+    def status_geral(self):
+        if self.qtd_pagos == self.total_funcionarios:
+            return 'pago'
+        if self.qtd_pagos > 0:
+            return 'parcial'
+        return 'fechado'
+
+    @staticmethod
+    def _totais_por_semana(fechamentos):
+        return (
+            fechamentos
+            .values('data_inicio', 'data_fim')
+            .annotate(
+                total_funcionarios=Count('id'),
+                total_dias=Sum('total_dias'),
+                total_valor=Sum('total_valor'),
+                total_ociosidade=Sum('dias_ociosidade'),
+                total_retrabalho=Sum('dias_retrabalho'),
+                qtd_fechados=Count('id', filter=Q(status='fechado')),
+                qtd_pagos=Count('id', filter=Q(status='pago')),
+            )
+            .order_by()
+        )
+
+    @classmethod
+    def _gravar(cls, linhas):
+        resumos = [
+            cls(
+                data_inicio=linha['data_inicio'],
+                data_fim=linha['data_fim'],
+                total_funcionarios=linha['total_funcionarios'],
+                total_dias=linha['total_dias'] or 0,
+                total_valor=linha['total_valor'] or Decimal('0.00'),
+                total_ociosidade=linha['total_ociosidade'] or 0,
+                total_retrabalho=linha['total_retrabalho'] or 0,
+                qtd_fechados=linha['qtd_fechados'],
+                qtd_pagos=linha['qtd_pagos'],
+            )
+            for linha in linhas
+        ]
+        if resumos:
+            cls.objects.bulk_create(
+                resumos,
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=['data_inicio', 'data_fim'],
+                update_fields=cls.CAMPOS_RESUMO + ['updated_at'],
+            )
+        return resumos
+
+    @classmethod
+    def atualizar(cls, semanas):
+        """
+        Recalcula o resumo das semanas (data_inicio, data_fim) informadas:
+        uma consulta agrupada, um INSERT ... ON CONFLICT e a remoção das
+        semanas que ficaram sem fechamento.
+        """
+        semanas = {(inicio, fim) for inicio, fim in semanas if inicio and fim}
+        if not semanas:
+            return 0
+        filtro = Q()
+        for inicio, fim in semanas:
+            filtro |= Q(data_inicio=inicio, data_fim=fim)
+        with transaction.atomic():
+            resumos = cls._gravar(cls._totais_por_semana(FechamentoSemanal.objects.filter(filtro)))
+            vazias = semanas - {(resumo.data_inicio, resumo.data_fim) for resumo in resumos}
+            if vazias:
+                filtro_vazias = Q()
+                for inicio, fim in vazias:
+                    filtro_vazias |= Q(data_inicio=inicio, data_fim=fim)
+                cls.objects.filter(filtro_vazias).delete()
+        return len(semanas)
+
+    @classmethod
+    def registrar(cls, semanas):
+        """Atualiza as semanas agora ou, dentro de agrupar(), ao final do bloco."""
+        _registrar_pendentes(_resumo_semanas, semanas, cls.atualizar)
+
+    @classmethod
+    def agrupar(cls):
+        """
+        Junta as semanas alteradas dentro do bloco (ex.: exclusão de uma
+        semana inteira, que dispara um post_delete por fechamento) e
+        recalcula cada uma só uma vez no final.
+        """
+        return _agrupar_pendentes(_resumo_semanas, cls.atualizar)
+
+    @classmethod
+    def reconstruir(cls):
+        """Recria a tabela inteira a partir de FechamentoSemanal."""
+        with transaction.atomic():
+            cls.objects.all().delete()
+            return len(cls._gravar(cls._totais_por_semana(FechamentoSemanal.objects.all())))
+
+
 # ----------------- Apontamento em Lote -----------------
 
 class ApontamentoDiarioLote(models.Model):
@@ -622,6 +1155,11 @@ class ApontamentoDiarioLote(models.Model):
         verbose_name = "Apontamento Diário em Lote"
         verbose_name_plural = "Apontamentos Diários em Lote"
         ordering = ['-data', '-created_at']
+        indexes = [
+            # Paginação por cursor (keyset) da listagem de lotes
+            models.Index(fields=['-data', '-created_at', '-id'], name='lote_data_created_id_idx'),
+            models.Index(fields=['obra', '-data', '-created_at', '-id'], name='lote_obra_data_created_idx'),
+        ]
     
     def __str__(self):
         producao = self.producao_total if self.producao_total else Decimal('0.00')
@@ -718,13 +1256,20 @@ class ApontamentoDiarioLote(models.Model):
         
         return campos
     
-    def gerar_apontamentos_individuais(self):
+    def gerar_apontamentos_individuais(self, em_lote=True):
         """
         Divide a produção total entre os pedreiros da equipe
         e cria apontamentos individuais.
+
+        em_lote=True (padrão): carrega a equipe uma única vez, monta apontamentos
+        e registros de produção em memória e grava tudo com bulk_create, sem
+        passar pelo save() de cada apontamento. O número de consultas não cresce
+        com o tamanho da equipe. em_lote=False mantém o fluxo antigo, registro
+        a registro.
         """
-        from apps.obras.models import EtapaHistorico
-        
+        if em_lote:
+            return self._gerar_apontamentos_em_lote()
+
         # Buscar funcionários deste lote
         funcionarios_lote = self.funcionarios.all()
         
@@ -738,6 +1283,7 @@ class ApontamentoDiarioLote(models.Model):
             # Se não há pedreiros, ainda assim criar apontamentos para serventes
             for func_lote in funcionarios_lote:
                 self._criar_apontamento_individual(func_lote, Decimal('0.00'))
+            self._normalizar_dias_equipe(funcionarios_lote)
             return
         
         # Calcular produção por pedreiro (somente se producao_total foi preenchida)
@@ -760,6 +1306,9 @@ class ApontamentoDiarioLote(models.Model):
             
             self._criar_apontamento_individual(func_lote, valor_produzido)
             apontamentos_criados += 1
+
+        # Normaliza o dia de toda a equipe de uma vez (em vez de um por save)
+        self._normalizar_dias_equipe(funcionarios_lote)
         
         # Registrar no histórico da etapa
         if self.etapa:
@@ -767,6 +1316,115 @@ class ApontamentoDiarioLote(models.Model):
         
         return apontamentos_criados
 
+    def _gerar_apontamentos_em_lote(self):
+        """Versão em lote de gerar_apontamentos_individuais (consultas fixas)."""
+        funcionarios_lote = list(self.funcionarios.select_related('funcionario'))
+        if not funcionarios_lote:
+            return
+
+        # Filtrar apenas PEDREIROS (serventes não contam na divisão)
+        pedreiros = [f for f in funcionarios_lote if f.funcionario.funcao == 'pedreiro']
+
+        producao_por_pedreiro = Decimal('0.00')
+        if pedreiros:
+            producao_total_dia = self._calcular_producao_total_dia()
+            if producao_total_dia > 0:
+                producao_por_pedreiro = (producao_total_dia / Decimal(len(pedreiros))).quantize(Decimal('0.01'))
+
+        apontamentos = [
+            self._montar_apontamento_individual(
+                func_lote,
+                producao_por_pedreiro if func_lote.funcionario.funcao == 'pedreiro' else Decimal('0.00'),
+            )
+            for func_lote in funcionarios_lote
+        ]
+
+        pares = [(f.funcionario_id, self.data) for f in funcionarios_lote]
+        with FechamentoSemanal.manter_totais(pares):
+            ApontamentoFuncionario.objects.bulk_create(apontamentos)
+            self._gravar_registros_producao_em_lote(pedreiros)
+            self._normalizar_dias_equipe(funcionarios_lote)
+            apontamentos_lote_gravados.send(
+                sender=type(self),
+                lote=self,
+                funcionario_ids=[f.funcionario_id for f in funcionarios_lote],
+            )
+
+            # Sem pedreiros não há divisão de produção nem histórico (como no fluxo antigo)
+            if not pedreiros:
+                return
+            if self.etapa:
+                self._registrar_historico_etapa(pedreiros, funcionarios_lote)
+
+        return len(apontamentos)
+
+    def _gravar_registros_producao_em_lote(self, pedreiros):
+        """
+        Cria/incrementa os RegistroProducao dos pedreiros do lote com uma
+        consulta de leitura, um bulk_create e um bulk_update.
+        """
+        campos_dict = self._get_campos_producao_dia()
+        if not campos_dict or not pedreiros:
+            return
+
+        # indicador -> quantidade por pedreiro (aliases do mesmo indicador somam)
+        quantidades = {}
+        for campo_etapa, indicador in self.MAPEAMENTO_CAMPOS_INDICADOR.items():
+            if not campos_dict.get(campo_etapa):
+                continue
+            quantidade_campo = Decimal(str(campos_dict[campo_etapa]))
+            if quantidade_campo <= 0:
+                continue
+            quantidade_por_pedreiro = (quantidade_campo / Decimal(len(pedreiros))).quantize(Decimal('0.01'))
+            quantidades[indicador] = quantidades.get(indicador, Decimal('0.00')) + quantidade_por_pedreiro
+
+        if not quantidades:
+            return
+
+        existentes = {
+            (registro.funcionario_id, registro.indicador): registro
+            for registro in RegistroProducao.objects.filter(
+                obra_id=self.obra_id,
+                data=self.data,
+                funcionario_id__in=[f.funcionario_id for f in pedreiros],
+                indicador__in=list(quantidades),
+            )
+        }
+
+        agora = timezone.now()
+        novos = []
+        atualizados = []
+        for func_lote in pedreiros:
+            for indicador, quantidade in quantidades.items():
+                registro = existentes.get((func_lote.funcionario_id, indicador))
+                if registro is None:
+                    novos.append(RegistroProducao(
+                        funcionario=func_lote.funcionario,
+                        data=self.data,
+                        obra_id=self.obra_id,
+                        indicador=indicador,
+                        quantidade=quantidade,
+                        etapa=self.etapa,
+                    ))
+                else:
+                    # Já existe registro no dia (outro lote): soma a nova quantidade
+                    registro.quantidade += quantidade
+                    registro.atualizado_em = agora
+                    atualizados.append(registro)
+
+        if novos:
+            RegistroProducao.objects.bulk_create(novos)
+        if atualizados:
+            RegistroProducao.objects.bulk_update(atualizados, ['quantidade', 'atualizado_em'])
+
+    def _normalizar_dias_equipe(self, funcionarios_lote):
+        """Normaliza horas/valor do dia para todos os funcionários do lote."""
+        funcionarios = {fl.funcionario_id: fl.funcionario for fl in funcionarios_lote}
+        ApontamentoFuncionario.normalizar_apontamentos_em_lote(
+            [(funcionario_id, self.data) for funcionario_id in funcionarios],
+            funcionarios=funcionarios,
+        )
+
     def _calcular_producao_total_dia(self):
         """
         Calcula um valor escalar para metragem_executada.
@@ -824,18 +1482,23 @@ class ApontamentoDiarioLote(models.Model):
             'percentual': '%',
         }.get(self.unidade_medida, self.unidade_medida or 'unidades')
 
-    def _criar_apontamento_individual(self, func_lote, valor_produzido):
-        """Cria um apontamento individual para um funcionário"""
+    def _montar_apontamento_individual(self, func_lote, valor_produzido):
+        """
+        Monta (sem salvar) o apontamento individual de um funcionário.
+        Aplica as mesmas regras de ApontamentoFuncionario.save() para fiscal.
+        """
         valor_diaria = func_lote.funcionario.valor_diaria or Decimal('0.00')
+        horas_trabalhadas = func_lote.horas_trabalhadas
         if func_lote.funcionario.funcao == 'fiscal':
             valor_diaria = Decimal('0.00')
+            horas_trabalhadas = Decimal('0.0')
 
-        ApontamentoFuncionario.objects.create(
+        return ApontamentoFuncionario(
             funcionario=func_lote.funcionario,
             obra=self.obra,
             etapa=self.etapa,
             data=self.data,
-            horas_trabalhadas=func_lote.horas_trabalhadas,
+            horas_trabalhadas=horas_trabalhadas,
             clima=self.clima,
             metragem_executada=valor_produzido,
             houve_ociosidade=self.houve_ociosidade,
@@ -846,17 +1509,25 @@ class ApontamentoDiarioLote(models.Model):
             valor_diaria=valor_diaria,
             possui_placa=self.possui_placa,
         )
-        
-        # Criar registros de produção individuais
+
+    def _get_campos_producao_dia(self):
+        """Campos de produção usados para criar RegistroProducao."""
         # Usar valores do DIA (se disponíveis) ao invés de valores ACUMULADOS da etapa
         if hasattr(self, '_valores_dia'):
             # Se _valores_dia existe, usar APENAS ele (mesmo que vazio)
             # Vazio significa que nenhum campo foi preenchido no dia (não criar registros)
-            campos_dict = self._valores_dia
-        else:
-            # Fallback: usar valores acumulados da etapa (compatibilidade com código antigo)
-            campos_dict = self.get_campos_etapa_dict()
-        
+            return self._valores_dia
+        # Fallback: usar valores acumulados da etapa (compatibilidade com código antigo)
+        return self.get_campos_etapa_dict()
+
+    def _criar_apontamento_individual(self, func_lote, valor_produzido):
+        """Cria um apontamento individual para um funcionário"""
+        # O dia é normalizado depois, para a equipe inteira (_normalizar_dias_equipe)
+        self._montar_apontamento_individual(func_lote, valor_produzido).save(normalizar=False)
+
+        # Criar registros de produção individuais
+        campos_dict = self._get_campos_producao_dia()
+
         # ✅ Só criar registros se houver campos com valores
         if campos_dict:
             self._criar_registro_producao(
@@ -867,10 +1538,12 @@ class ApontamentoDiarioLote(models.Model):
                 detalhes_producao=campos_dict
             )
     
-    def _registrar_historico_etapa(self, pedreiros):
+    def _registrar_historico_etapa(self, pedreiros, funcionarios_lote=None):
         """Registra o apontamento em lote no historico da etapa"""
         from apps.obras.models import EtapaHistorico
 
+        if funcionarios_lote is None:
+            funcionarios_lote = list(self.funcionarios.select_related('funcionario'))
         quantidade_pedreiros = len(pedreiros)
         producao_por_unidade = self._get_producao_por_unidade()
 
@@ -892,9 +1565,9 @@ class ApontamentoDiarioLote(models.Model):
             linhas.append("PRODUCAO DO DIA: 0.00")
 
         linhas.append("")
-        linhas.append(f"EQUIPE ({self.funcionarios.count()} funcionario(s)):")
+        linhas.append(f"EQUIPE ({len(funcionarios_lote)} funcionario(s)):")
 
-        for func_lote in self.funcionarios.all():
+        for func_lote in funcionarios_lote:
             func = func_lote.funcionario
             funcao_display = func.get_funcao_display()
             if func.funcao == 'pedreiro':
@@ -937,32 +1610,33 @@ class ApontamentoDiarioLote(models.Model):
             usuario=self.criado_por
         )
 
-    def _criar_registro_producao(self, funcionario, obra, etapa, data, detalhes_producao):
-        """Cria registros de produção individuais com base nos campos da etapa e seus valores"""
+    # ✅ CORREÇÃO PROBLEMA 2: Mapeamento COMPLETO de campos de etapa para indicadores
+    MAPEAMENTO_CAMPOS_INDICADOR = {
+        # Etapa 1 - Fundação
+        'alicerce_percentual': 'alicerce_percentual',
+        'levantar_alicerce_percentual': 'alicerce_percentual',
+        'parede_7fiadas_blocos': 'parede_7fiadas',
         
-        # ✅ CORREÇÃO PROBLEMA 2: Mapeamento COMPLETO de campos de etapa para indicadores
-        mapeamento_campos = {
-            # Etapa 1 - Fundação
-            'alicerce_percentual': 'alicerce_percentual',
-            'levantar_alicerce_percentual': 'alicerce_percentual',
-            'parede_7fiadas_blocos': 'parede_7fiadas',
-            
-            # Etapa 2 - Estrutura (CORRIGIDO E EXPANDIDO)
-            'respaldo_conclusao': 'respaldo_conclusao',
-            'fiadas_respaldo_dias': 'respaldo_conclusao',  # Alias
-            'laje_conclusao': 'laje_conclusao',
-            'montagem_laje_dias': 'laje_conclusao',  # Alias
-            'montagem_laje_conclusao': 'laje_conclusao',  # Alias adicional
-            'platibanda_metros': 'platibanda',
-            'platibanda_blocos': 'platibanda',  # Alias
-            'cobertura_conclusao': 'cobertura_conclusao',
-            'cobertura_dias': 'cobertura_conclusao',  # Alias
-            
-            # Etapa 3 - Instalações
-            'reboco_externo_m2': 'reboco_externo',
-            'reboco_interno_m2': 'reboco_interno',
-        }
+        # Etapa 2 - Estrutura (CORRIGIDO E EXPANDIDO)
+        'respaldo_conclusao': 'respaldo_conclusao',
+        'fiadas_respaldo_dias': 'respaldo_conclusao',  # Alias
+        'laje_conclusao': 'laje_conclusao',
+        'montagem_laje_dias': 'laje_conclusao',  # Alias
+        'montagem_laje_conclusao': 'laje_conclusao',  # Alias adicional
+        'platibanda_metros': 'platibanda',
+        'platibanda_blocos': 'platibanda',  # Alias
+        'cobertura_conclusao': 'cobertura_conclusao',
+        'cobertura_dias': 'cobertura_conclusao',  # Alias
         
+        # Etapa 3 - Instalações
+        'reboco_externo_m2': 'reboco_externo',
+        'reboco_interno_m2': 'reboco_interno',
+    }
+
+    def _criar_registro_producao(self, funcionario, obra, etapa, data, detalhes_producao):
+        """Cria registros de produção individuais com base nos campos da etapa e seus valores"""
+        mapeamento_campos = self.MAPEAMENTO_CAMPOS_INDICADOR
+
         # ✅ CORREÇÃO PROBLEMA 1: Para cada campo que foi preenchido, criar registro APENAS SE > 0
         for campo_etapa, indicador in mapeamento_campos.items():
             if campo_etapa in detalhes_producao and detalhes_producao[campo_etapa]:
@@ -1032,8 +1706,12 @@ class FuncionarioLote(models.Model):
 
 # ----------------- User profile for preferences -----------------
 from django.conf import settings
-from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver, Signal
+
+# Disparado quando um lote grava apontamentos/registros de produção com
+# bulk_create (que não dispara post_save). Argumentos: lote, funcionario_ids.
+apontamentos_lote_gravados = Signal()
 
 
 class UserProfile(models.Model):
@@ -1085,6 +1763,28 @@ def recalcular_diaria_apos_exclusao(sender, instance, **kwargs):
     )
 
 
+@receiver(pre_save, sender=FechamentoSemanal)
+def guardar_semana_fechamento_anterior(sender, instance, **kwargs):
+    """Guarda a semana anterior do fechamento para atualizar o resumo antigo em edições."""
+    instance._semana_resumo_anterior = None
+    if instance.pk:
+        instance._semana_resumo_anterior = (
+            FechamentoSemanal.objects.filter(pk=instance.pk)
+            .values_list('data_inicio', 'data_fim')
+            .first()
+        )
+
+
+@receiver(post_save, sender=FechamentoSemanal)
+@receiver(post_delete, sender=FechamentoSemanal)
+def atualizar_resumo_semana(sender, instance, **kwargs):
+    semanas = [(instance.data_inicio, instance.data_fim)]
+    anterior = getattr(instance, '_semana_resumo_anterior', None)
+    if anterior:
+        semanas.append(anterior)
+    ResumoSemanaFechamento.registrar(semanas)
+
+
 class HistoricoAlteracaoEtapa(models.Model):
     """
     Registra todas as alterações e exclusões em apontamentos/etapas.
@@ -1222,6 +1922,221 @@ class RegistroProducao(models.Model):
         return f"{self.funcionario.nome_completo} - {self.get_indicador_display()} - {self.data.strftime('%d/%m/%Y')}"
 
 
+class ResumoDiarioFuncionario(models.Model):
+    """
+    Resumo diário materializado por funcionário (uma linha por funcionário/dia)
+    para o hub do funcionário: horas, custo, metragem, obras, ociosidade/
+    retrabalho e produção por indicador.
+
+    Mantido pelos caminhos de escrita de apontamentos (FechamentoSemanal.
+    manter_totais) e pelos signals de RegistroProducao; o comando
+    `rebuild_resumo_diario` refaz a tabela.
+    """
+
+    funcionario = models.ForeignKey(
+        Funcionario,
+        on_delete=models.CASCADE,
+        related_name='resumos_diarios',
+        verbose_name="Funcionário"
+    )
+    data = models.DateField(verbose_name="Data")
+    qtd_apontamentos = models.PositiveIntegerField(default=0, verbose_name="Apontamentos")
+    horas = models.DecimalField(max_digits=6, decimal_places=1, default=Decimal('0.0'), verbose_name="Horas")
+    valor = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'), verbose_name="Valor (R$)")
+    metragem = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), verbose_name="Metragem")
+    houve_ociosidade = models.BooleanField(default=False, verbose_name="Houve Ociosidade")
+    houve_retrabalho = models.BooleanField(default=False, verbose_name="Houve Retrabalho")
+    clima = models.CharField(max_length=10, blank=True, verbose_name="Clima")
+    # {obra_id: {"horas", "valor", "metragem"}} dos apontamentos do dia
+    obras = models.JSONField(default=dict, blank=True, verbose_name="Obras")
+    # {numero_etapa: metragem} dos apontamentos do dia
+    etapas = models.JSONField(default=dict, blank=True, verbose_name="Etapas")
+    # {indicador: quantidade} dos RegistroProducao do dia
+    producao = models.JSONField(default=dict, blank=True, verbose_name="Produção por Indicador")
+    obras_producao = models.JSONField(default=list, blank=True, verbose_name="Obras com Produção")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Atualizado em")
+
+    class Meta:
+        verbose_name = "Resumo Diário do Funcionário"
+        verbose_name_plural = "Resumos Diários dos Funcionários"
+        ordering = ['funcionario', 'data']
+        unique_together = ['funcionario', 'data']
+
+    def __str__(self):
+        return f"{self.funcionario_id} - {self.data.strftime('%d/%m/%Y')}"
+
+    CAMPOS_RESUMO = [
+        'qtd_apontamentos', 'horas', 'valor', 'metragem', 'houve_ociosidade',
+        'houve_retrabalho', 'clima', 'obras', 'etapas', 'producao', 'obras_producao',
+    ]
+
+    @classmethod
+    def _calcular(cls, apontamentos, registros):
+        """Monta os resumos (em memória) a partir das linhas de apontamento e produção."""
+        resumos = {}
+
+        def resumo_do_par(funcionario_id, data):
+            chave = (funcionario_id, data)
+            if chave not in resumos:
+                resumos[chave] = cls(funcionario_id=funcionario_id, data=data, obras={}, etapas={}, producao={}, obras_producao=[])
+            return resumos[chave]
+
+        linhas = apontamentos.order_by('funcionario_id', 'data', 'created_at', 'pk').values_list(
+            'funcionario_id', 'data', 'obra_id', 'etapa__numero_etapa', 'clima',
+            'houve_ociosidade', 'houve_retrabalho', 'horas_trabalhadas', 'valor_diaria', 'metragem_executada',
+        )
+        for (funcionario_id, data, obra_id, numero_etapa, clima,
+             ociosidade, retrabalho, horas, valor, metragem) in linhas.iterator(chunk_size=2000):
+            resumo = resumo_do_par(funcionario_id, data)
+            horas = horas or Decimal('0.0')
+            valor = valor or Decimal('0.00')
+            metragem = metragem or Decimal('0.00')
+            resumo.qtd_apontamentos += 1
+            resumo.horas += horas
+            resumo.valor += valor
+            resumo.metragem += metragem
+            resumo.houve_ociosidade = resumo.houve_ociosidade or ociosidade
+            resumo.houve_retrabalho = resumo.houve_retrabalho or retrabalho
+            resumo.clima = resumo.clima or clima or ''
+            obra = resumo.obras.setdefault(str(obra_id), {'horas': '0.0', 'valor': '0.00', 'metragem': '0.00'})
+            obra['horas'] = str(Decimal(obra['horas']) + horas)
+            obra['valor'] = str(Decimal(obra['valor']) + valor)
+            obra['metragem'] = str(Decimal(obra['metragem']) + metragem)
+            if numero_etapa is not None:
+                chave_etapa = str(numero_etapa)
+                resumo.etapas[chave_etapa] = str(Decimal(resumo.etapas.get(chave_etapa, '0.00')) + metragem)
+
+        linhas = registros.order_by().values_list('funcionario_id', 'data', 'obra_id', 'indicador', 'quantidade')
+        for funcionario_id, data, obra_id, indicador, quantidade in linhas.iterator(chunk_size=2000):
+            resumo = resumo_do_par(funcionario_id, data)
+            resumo.producao[indicador] = str(Decimal(resumo.producao.get(indicador, '0.00')) + quantidade)
+            if obra_id not in resumo.obras_producao:
+                resumo.obras_producao.append(obra_id)
+
+        return resumos
+
+    @classmethod
+    def _gravar(cls, resumos):
+        if resumos:
+            cls.objects.bulk_create(
+                resumos,
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=['funcionario', 'data'],
+                update_fields=cls.CAMPOS_RESUMO + ['updated_at'],
+            )
+
+    @classmethod
+    def atualizar(cls, pares):
+        """
+        Recalcula os dias (funcionario_id, data) informados: duas leituras
+        (apontamentos e produção), um INSERT ... ON CONFLICT e a remoção dos
+        dias que ficaram vazios.
+        """
+        campo_data = cls._meta.get_field('data')
+        pares = {
+            (int(funcionario_id), campo_data.to_python(data))
+            for funcionario_id, data in pares
+            if funcionario_id and data
+        }
+        if not pares:
+            return 0
+        filtro = FechamentoSemanal._filtro_pares(pares)
+        with transaction.atomic():
+            resumos = cls._calcular(
+                ApontamentoFuncionario.objects.filter(filtro),
+                RegistroProducao.objects.filter(filtro),
+            )
+            cls._gravar(list(resumos.values()))
+            vazios = pares - set(resumos)
+            if vazios:
+                cls.objects.filter(FechamentoSemanal._filtro_pares(vazios)).delete()
+        return len(pares)
+
+    @classmethod
+    def registrar(cls, pares):
+        """Atualiza os dias agora ou, dentro de agrupar(), ao final do bloco."""
+        _registrar_pendentes(_resumo_diario, pares, cls.atualizar)
+
+    @classmethod
+    def agrupar(cls):
+        """Recalcula cada dia alterado dentro do bloco uma só vez, no final."""
+        return _agrupar_pendentes(_resumo_diario, cls.atualizar)
+
+    @classmethod
+    def reconstruir(cls, funcionarios=None, lote=200):
+        """
+        Recria os resumos (de todos ou dos funcionários informados), lendo
+        apontamentos e produção em blocos de `lote` funcionários.
+        """
+        if funcionarios is None:
+            funcionarios = Funcionario.objects.all()
+        ids = list(funcionarios.order_by('pk').values_list('pk', flat=True))
+        total = 0
+        for inicio in range(0, len(ids), lote):
+            bloco = ids[inicio:inicio + lote]
+            with transaction.atomic():
+                cls.objects.filter(funcionario_id__in=bloco).delete()
+                resumos = cls._calcular(
+                    ApontamentoFuncionario.objects.filter(funcionario_id__in=bloco),
+                    RegistroProducao.objects.filter(funcionario_id__in=bloco),
+                )
+                cls._gravar(list(resumos.values()))
+            total += len(resumos)
+        return total
+
+    # ----------------- Leitura -----------------
+
+    @classmethod
+    def do_periodo(cls, funcionario, data_inicio=None, data_fim=None):
+        """Resumos do funcionário no período (uma consulta pelo índice funcionario/data)."""
+        resumos = cls.objects.filter(funcionario=funcionario)
+        if data_inicio:
+            resumos = resumos.filter(data__gte=data_inicio)
+        if data_fim:
+            resumos = resumos.filter(data__lte=data_fim)
+        return resumos.order_by('data')
+
+    @staticmethod
+    def totalizar(resumos):
+        """
+        KPIs de uma lista de resumos (dias = dias com apontamento; ociosidade/
+        retrabalho contam dias).
+        """
+        trabalhados = [r for r in resumos if r.qtd_apontamentos]
+        return {
+            'total_dias': len(trabalhados),
+            'total_horas': sum((r.horas for r in trabalhados), Decimal('0.0')),
+            'total_valor': sum((r.valor for r in trabalhados), Decimal('0.00')),
+            'total_metragem': sum((r.metragem for r in trabalhados), Decimal('0.00')),
+            'dias_ociosidade': sum(1 for r in trabalhados if r.houve_ociosidade),
+            'dias_retrabalho': sum(1 for r in trabalhados if r.houve_retrabalho),
+        }
+
+    @staticmethod
+    def por_obra(resumos):
+        """Dias/horas/valor/metragem por obra ({obra_id: {...}}), ordenado por dias."""
+        obras = {}
+        for resumo in resumos:
+            for obra_id, valores in resumo.obras.items():
+                obra = obras.setdefault(int(obra_id), {
+                    'dias': 0, 'horas': Decimal('0.0'), 'valor': Decimal('0.00'), 'metragem': Decimal('0.00'),
+                })
+                obra['dias'] += 1
+                obra['horas'] += Decimal(valores['horas'])
+                obra['valor'] += Decimal(valores['valor'])
+                obra['metragem'] += Decimal(valores['metragem'])
+        return dict(sorted(obras.items(), key=lambda item: -item[1]['dias']))
+
+
+@receiver(post_save, sender=RegistroProducao)
+@receiver(post_delete, sender=RegistroProducao)
+@receiver(post_delete, sender=ApontamentoFuncionario)
+def atualizar_resumo_diario(sender, instance, **kwargs):
+    """Produção e exclusões em cascata (ex.: obra excluída) também alteram o resumo diário."""
+    ResumoDiarioFuncionario.registrar([(instance.funcionario_id, instance.data)])
+
+
 import uuid as _uuid
 import os as _os
 
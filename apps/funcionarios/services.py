@@ -0,0 +1,157 @@
+"""
+Exclusão em lote de apontamentos.
+
+`excluir_apontamentos` substitui o caminho objeto a objeto (delete() + signals
+por apontamento) por poucas instruções por bloco de ids:
+
+- um DELETE das fotos e um dos apontamentos;
+- um DELETE com anti-join dos RegistroProducao que ficaram órfãos (sem
+  apontamento do mesmo funcionário/obra/data/etapa) e dos fatos de relatório;
+- rateio dos dias afetados em lote (normalizar_apontamentos_em_lote), dentro
+  de FechamentoSemanal.manter_totais (fechamentos abertos e resumo diário);
+- um EtapaHistorico consolidado por etapa.
+
+Os signals de post_delete não são disparados (DELETE direto); os efeitos deles
+são aplicados em lote aqui.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Exists, OuterRef, Q
+
+from apps.obras.models import EtapaHistorico
+from apps.relatorios.models import FatoProducaoDiaria
+from apps.relatorios.services.cache_relatorio import invalidar_relatorios
+
+from .models import ApontamentoFuncionario, FechamentoSemanal, FotoApontamento, RegistroProducao
+
+# Quantidade de apontamentos excluídos por instrução.
+EXCLUSAO_LOTE_TAMANHO = 1000
+
+# Apontamentos listados individualmente no histórico consolidado de cada etapa.
+HISTORICO_MAX_LINHAS = 50
+
+
+def _mesma_etapa(apontamentos):
+    """Existe apontamento do mesmo funcionário/obra/data e mesma etapa (NULL = NULL)."""
+    mesmo_dia = apontamentos.filter(
+        funcionario_id=OuterRef('funcionario_id'),
+        obra_id=OuterRef('obra_id'),
+        data=OuterRef('data'),
+    )
+    return (
+        Exists(mesmo_dia.filter(etapa_id=OuterRef('etapa_id')))
+        | (Q(etapa__isnull=True) & Exists(mesmo_dia.filter(etapa__isnull=True)))
+    )
+
+
+def _registros_orfaos(ids, funcionario_ids, data_inicio, data_fim):
+    """RegistroProducao que perdem o último apontamento correspondente com a exclusão de `ids`."""
+    excluidos = ApontamentoFuncionario.objects.filter(pk__in=ids)
+    restantes = ApontamentoFuncionario.objects.exclude(pk__in=ids)
+    return (
+        RegistroProducao.objects
+        .filter(funcionario_id__in=funcionario_ids, data__range=(data_inicio, data_fim))
+        .filter(_mesma_etapa(excluidos))
+        .exclude(_mesma_etapa(restantes))
+    )
+
+
+def _raw_delete(queryset):
+    # DELETE único, sem coletar objetos nem disparar signals.
+    return queryset._raw_delete(queryset.db)
+
+
+def _descricao_historico(linhas):
+    datas = [linha['data'] for linha in linhas]
+    horas = sum((linha['horas_trabalhadas'] or Decimal('0') for linha in linhas), Decimal('0'))
+    partes = [
+        f"Apontamentos excluídos: {len(linhas)}",
+        f"Período: {min(datas).strftime('%d/%m/%Y')} a {max(datas).strftime('%d/%m/%Y')}",
+        f"Funcionários: {len({linha['funcionario_id'] for linha in linhas})}",
+        f"Horas: {horas}h",
+    ]
+    for linha in sorted(linhas, key=lambda l: (l['data'], l['funcionario__nome_completo']))[:HISTORICO_MAX_LINHAS]:
+        partes.append(
+            f"- {linha['data'].strftime('%d/%m/%Y')}: {linha['funcionario__nome_completo']} "
+            f"({linha['horas_trabalhadas']}h)"
+        )
+    if len(linhas) > HISTORICO_MAX_LINHAS:
+        partes.append(f"... e mais {len(linhas) - HISTORICO_MAX_LINHAS} apontamento(s)")
+    return '\n'.join(partes)
+
+
+def excluir_apontamentos(apontamentos, usuario=None, origem='Apontamentos Excluídos em Lote',
+                         historico=True, simular=False):
+    """
+    Exclui os apontamentos do queryset em lote.
+
+    usuario/origem: autor e origem do EtapaHistorico consolidado (um por etapa);
+    historico=False não grava histórico (a view já registrou o seu).
+    simular=True só calcula o que seria excluído.
+
+    Retorna {'apontamentos', 'dias', 'etapas', 'registros_orfaos', 'fotos', 'historicos'}.
+    """
+    linhas = list(
+        apontamentos.order_by().values(
+            'pk', 'funcionario_id', 'obra_id', 'etapa_id', 'data',
+            'horas_trabalhadas', 'funcionario__nome_completo',
+        )
+    )
+    ids = [linha['pk'] for linha in linhas]
+    pares = {(linha['funcionario_id'], linha['data']) for linha in linhas}
+    por_etapa = defaultdict(list)
+    for linha in linhas:
+        if linha['etapa_id']:
+            por_etapa[linha['etapa_id']].append(linha)
+
+    resultado = {
+        'apontamentos': len(ids),
+        'dias': len(pares),
+        'etapas': len(por_etapa),
+        'registros_orfaos': 0,
+        'fotos': 0,
+        'historicos': 0,
+    }
+    if not ids:
+        return resultado
+
+    funcionario_ids = {funcionario_id for funcionario_id, _ in pares}
+    data_inicio = min(data for _, data in pares)
+    data_fim = max(data for _, data in pares)
+
+    if simular:
+        resultado['registros_orfaos'] = _registros_orfaos(ids, funcionario_ids, data_inicio, data_fim).count()
+        resultado['fotos'] = FotoApontamento.objects.filter(apontamento_individual_id__in=ids).count()
+        resultado['historicos'] = len(por_etapa) if historico else 0
+        return resultado
+
+    with FechamentoSemanal.manter_totais(pares):
+        for inicio in range(0, len(ids), EXCLUSAO_LOTE_TAMANHO):
+            bloco = ids[inicio:inicio + EXCLUSAO_LOTE_TAMANHO]
+            orfaos = _registros_orfaos(bloco, funcionario_ids, data_inicio, data_fim)
+            _raw_delete(FatoProducaoDiaria.objects.filter(registro__in=orfaos.values('pk')))
+            resultado['registros_orfaos'] += _raw_delete(orfaos)
+            resultado['fotos'] += _raw_delete(FotoApontamento.objects.filter(apontamento_individual_id__in=bloco))
+            _raw_delete(ApontamentoFuncionario.objects.filter(pk__in=bloco))
+
+        ApontamentoFuncionario.normalizar_apontamentos_em_lote(pares)
+        FatoProducaoDiaria.atualizar_apontamentos(
+            {(linha['funcionario_id'], linha['obra_id'], linha['data']) for linha in linhas}
+        )
+
+        if historico and por_etapa:
+            EtapaHistorico.objects.bulk_create([
+                EtapaHistorico(
+                    etapa_id=etapa_id,
+                    usuario=usuario,
+                    origem=origem,
+                    descricao=_descricao_historico(linhas_etapa),
+                )
+                for etapa_id, linhas_etapa in por_etapa.items()
+            ])
+            resultado['historicos'] = len(por_etapa)
+
+    invalidar_relatorios()
+    return resultado
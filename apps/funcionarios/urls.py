@@ -50,4 +50,5 @@ urlpatterns = [
     path('api/itens-obra/', views.itens_obra_api, name='itens_obra_api'),
     path('set-theme/', views.set_theme, name='set_theme'),
     path('api/obras-autocomplete/', views.obras_autocomplete_api, name='obras_autocomplete_api'),
+    path('api/apontamento-funcionarios/', views.apontamento_funcionarios_api, name='apontamento_funcionarios_api'),
 ]
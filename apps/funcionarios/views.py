@@ -1,15 +1,16 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from .models import Funcionario, ApontamentoFuncionario, FechamentoSemanal
+from .models import Funcionario, ApontamentoFuncionario, FechamentoSemanal, ResumoSemanaFechamento
 from .models import ApontamentoDiarioLote, FuncionarioLote, RegistroProducao, FotoApontamento
-from .models import HistoricoAlteracaoEtapa
+from .models import HistoricoAlteracaoEtapa, ResumoDiarioFuncionario
+from .services import excluir_apontamentos
 from .forms import (
     FuncionarioForm, ApontamentoForm, FechamentoForm,
     ApontamentoDiarioCabecalhoForm, ApontamentoDiarioLoteForm,
 )
 from django.contrib import messages
 from django.utils import timezone
-from django.http import JsonResponse, HttpResponseForbidden, HttpResponse
+from django.http import JsonResponse, HttpResponseForbidden, HttpResponse, FileResponse, StreamingHttpResponse
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from urllib.parse import urlencode
 from apps.obras.models import (
@@ -17,27 +18,39 @@ from apps.obras.models import (
     Etapa1Fundacao, Etapa2Estrutura, Etapa3Instalacoes,
     Etapa4Acabamentos, Etapa5Finalizacao, EtapaHistorico,
 )
-from django.db import IntegrityError
-from django.db.models import Sum, Count, Q, Avg, F, Value
-from django.db.models.functions import Replace
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.db.models import Sum, Count, Q, Avg, Max, prefetch_related_objects
 import datetime
 from decimal import Decimal, InvalidOperation
 from collections import defaultdict
 import calendar
 from apps.obras.templatetags.obras_extras import brl
+from apps.busca.models import DocumentoBusca
+from apps.busca.autocomplete import etapas_da_obra, sugerir_funcionarios, sugerir_obras, versao_autocomplete
 from django.db import transaction
-from django.views.decorators.http import require_GET, require_http_methods
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET, require_http_methods
+import base64
+import csv
+import hashlib
 import json
+import logging
+import tempfile
 from io import BytesIO
 
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Alignment, Font, PatternFill
+from openpyxl.utils import get_column_letter
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib.units import cm
 from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
 
+logger = logging.getLogger(__name__)
+
 
 # ==================== ETAPA ITEMS HELPERS ====================
 
@@ -442,6 +455,47 @@ def _processar_campos_etapa_payload(etapa, campos_payload, usuario=None):
     return valores_producao_dia, campos_atualizados
 
 
+def _criar_funcionarios_lote(lote, funcionarios_ids, horas_trabalhadas_list):
+    """
+    Cria os FuncionarioLote do lote com uma consulta de funcionários e um
+    bulk_create. IDs inválidos, inativos ou repetidos são ignorados.
+    Retorna a quantidade de funcionários registrados.
+    """
+    ids_validos = []
+    for func_id in funcionarios_ids:
+        try:
+            ids_validos.append(int(func_id))
+        except (TypeError, ValueError):
+            ids_validos.append(None)
+    funcionarios = Funcionario.objects.filter(ativo=True).in_bulk(
+        [func_id for func_id in ids_validos if func_id is not None]
+    )
+
+    registros = []
+    ja_incluidos = set()
+    for i, func_id in enumerate(ids_validos):
+        funcionario = funcionarios.get(func_id)
+        if funcionario is None or funcionario.pk in ja_incluidos:
+            continue
+        try:
+            horas = Decimal(horas_trabalhadas_list[i]) if i < len(horas_trabalhadas_list) else Decimal('8.0')
+        except (ValueError, InvalidOperation):
+            continue
+        if funcionario.funcao == 'fiscal':
+            horas = Decimal('0.0')
+        elif horas <= Decimal('0.0'):
+            horas = Decimal('8.0')
+        registros.append(FuncionarioLote(
+            lote=lote,
+            funcionario=funcionario,
+            horas_trabalhadas=horas,
+        ))
+        ja_incluidos.add(funcionario.pk)
+
+    FuncionarioLote.objects.bulk_create(registros)
+    return len(registros)
+
+
 def _criar_lote_por_payload(base_data, etapa, request, funcionarios_ids, horas_trabalhadas_list, campos_payload, fotos=None):
     lote = ApontamentoDiarioLote.objects.create(
         obra=base_data['obra'],
@@ -457,23 +511,7 @@ def _criar_lote_por_payload(base_data, etapa, request, funcionarios_ids, horas_t
         criado_por=request.user,
     )
 
-    funcionarios_criados = 0
-    for i, func_id in enumerate(funcionarios_ids):
-        try:
-            funcionario = Funcionario.objects.get(pk=func_id, ativo=True)
-            horas = Decimal(horas_trabalhadas_list[i]) if i < len(horas_trabalhadas_list) else Decimal('8.0')
-            if funcionario.funcao == 'fiscal':
-                horas = Decimal('0.0')
-            elif horas <= Decimal('0.0'):
-                horas = Decimal('8.0')
-            FuncionarioLote.objects.create(
-                lote=lote,
-                funcionario=funcionario,
-                horas_trabalhadas=horas
-            )
-            funcionarios_criados += 1
-        except (Funcionario.DoesNotExist, ValueError, InvalidOperation):
-            continue
+    funcionarios_criados = _criar_funcionarios_lote(lote, funcionarios_ids, horas_trabalhadas_list)
 
     if funcionarios_criados == 0:
         lote.delete()
@@ -508,56 +546,34 @@ def _criar_lote_por_payload(base_data, etapa, request, funcionarios_ids, horas_t
 @login_required
 def funcionario_list(request):
     """Lista funcionários"""
-    funcionarios = Funcionario.objects.filter(ativo=True).order_by('nome_completo')
+    ativos = Funcionario.objects.filter(ativo=True)
+    filtro_resultado = Q()
 
     # Filtro por função
     funcoes_choices = list(Funcionario.FUNCAO_CHOICES)
     funcoes_validas = {key for key, _ in funcoes_choices}
     funcao_filter = request.GET.get('funcao', '')
     if funcao_filter in funcoes_validas:
-        funcionarios = funcionarios.filter(funcao=funcao_filter)
+        filtro_resultado &= Q(funcao=funcao_filter)
 
-    # Busca por nome ou CPF (ignora pontos/traços na comparação)
+    # Busca por nome, função ou CPF (índice da busca global, sem acentos/pontuação)
     busca = request.GET.get('q', '').strip()
     if busca:
-        import re
-        busca_lower = busca.lower()
-        funcoes_match = [
-            key for key, label in funcoes_choices
-            if busca_lower in key.lower() or busca_lower in str(label).lower()
-        ]
-        digits = re.sub(r'\D', '', busca)
-        if digits:
-            # remove '.' '-' and spaces from cpf field for comparison
-            funcionarios = funcionarios.annotate(
-                cpf_digits=Replace(
-                    Replace(
-                        Replace(F('cpf'), Value('.'), Value('')),
-                        Value('-'), Value('')
-                    ),
-                    Value(' '), Value('')
-                )
-            ).filter(
-                Q(nome_completo__icontains=busca)
-                | Q(cpf_digits__icontains=digits)
-                | Q(funcao__in=funcoes_match)
-            )
-        else:
-            funcionarios = funcionarios.filter(
-                Q(nome_completo__icontains=busca)
-                | Q(funcao__in=funcoes_match)
-            )
+        filtro_resultado &= Q(pk__in=DocumentoBusca.filtrar('funcionario', busca))
 
-    # Contadores
-    total_ativos = Funcionario.objects.filter(ativo=True).count()
-    total_pedreiros = Funcionario.objects.filter(ativo=True, funcao='pedreiro').count()
-    total_serventes = Funcionario.objects.filter(ativo=True, funcao='servente').count()
-    total_resultado = funcionarios.count()
-    funcoes_ativas_counts = dict(
-        Funcionario.objects.filter(ativo=True)
-        .values_list('funcao')
-        .annotate(total=Count('id'))
+    funcionarios = ativos.filter(filtro_resultado).order_by('nome_completo')
+
+    # Contadores (um único aggregate condicional sobre os ativos)
+    contadores = ativos.aggregate(
+        total_ativos=Count('id'),
+        total_resultado=Count('id', filter=filtro_resultado),
+        **{f'funcao_{key}': Count('id', filter=Q(funcao=key)) for key in funcoes_validas},
     )
+    total_ativos = contadores['total_ativos']
+    total_pedreiros = contadores['funcao_pedreiro']
+    total_serventes = contadores['funcao_servente']
+    total_resultado = contadores['total_resultado']
+    funcoes_ativas_counts = {key: contadores[f'funcao_{key}'] for key in funcoes_validas}
     funcoes_filtro = [
         {
             'key': key,
@@ -573,6 +589,7 @@ def funcionario_list(request):
         per_page = '15'
     per_page = int(per_page)
     paginator = Paginator(funcionarios, per_page)
+    paginator.count = total_resultado  # já contado no aggregate acima
     page = request.GET.get('page')
     try:
         funcionarios_page = paginator.page(page)
@@ -634,62 +651,47 @@ def funcionario_detail(request, pk):
             data_inicio = hoje - datetime.timedelta(days=30)
             data_fim = hoje
 
-    # --- Apontamentos no período ---
-    apontamentos = ApontamentoFuncionario.objects.filter(
-        funcionario=funcionario,
-        data__gte=data_inicio,
-        data__lte=data_fim
-    ).select_related('obra', 'etapa').order_by('-data')
+    # --- Resumo diário do período (uma leitura pelo índice funcionario/data) ---
+    resumos = list(ResumoDiarioFuncionario.do_periodo(funcionario, data_inicio, data_fim))
 
     # KPIs
-    kpis = apontamentos.aggregate(
-        total_dias=Count('data', distinct=True),
-        total_horas=Sum('horas_trabalhadas'),
-        total_valor=Sum('valor_diaria'),
-        total_metragem=Sum('metragem_executada'),
-        dias_ociosidade=Count('data', filter=Q(houve_ociosidade=True), distinct=True),
-        dias_retrabalho=Count('data', filter=Q(houve_retrabalho=True), distinct=True),
-    )
-    total_dias = kpis['total_dias'] or 0
-    total_horas = kpis['total_horas'] or Decimal('0.0')
-    total_valor = kpis['total_valor'] or Decimal('0.00')
-    total_metragem = kpis['total_metragem'] or Decimal('0.00')
-    dias_ociosidade = kpis['dias_ociosidade'] or 0
-    dias_retrabalho = kpis['dias_retrabalho'] or 0
+    kpis = ResumoDiarioFuncionario.totalizar(resumos)
+    total_dias = kpis['total_dias']
+    total_horas = kpis['total_horas']
+    total_valor = kpis['total_valor']
+    total_metragem = kpis['total_metragem']
+    dias_ociosidade = kpis['dias_ociosidade']
+    dias_retrabalho = kpis['dias_retrabalho']
     taxa_ociosidade = round(dias_ociosidade / total_dias * 100, 1) if total_dias else 0
     taxa_retrabalho = round(dias_retrabalho / total_dias * 100, 1) if total_dias else 0
     media_horas = round(total_horas / total_dias, 1) if total_dias else Decimal('0.0')
 
     # --- Obras trabalhadas no período ---
-    obras_periodo = (
-        apontamentos
-        .values('obra__pk', 'obra__nome')
-        .annotate(
-            dias=Count('data', distinct=True),
-            horas=Sum('horas_trabalhadas'),
-            valor=Sum('valor_diaria'),
-            metragem=Sum('metragem_executada'),
-        )
-        .order_by('-dias')
-    )
+    por_obra = ResumoDiarioFuncionario.por_obra(resumos)
+    nomes_obras = dict(Obra.all_objects.filter(pk__in=list(por_obra)).values_list('pk', 'nome'))
+    obras_periodo = [
+        {'obra__pk': obra_id, 'obra__nome': nomes_obras.get(obra_id, '—'), **valores}
+        for obra_id, valores in por_obra.items()
+    ]
 
     # --- Etapas trabalhadas ---
-    etapas_periodo = (
-        apontamentos
-        .filter(etapa__isnull=False)
-        .values('etapa__numero_etapa')
-        .annotate(
-            dias=Count('data', distinct=True),
-            metragem=Sum('metragem_executada'),
-        )
-        .order_by('etapa__numero_etapa')
-    )
     ETAPA_NOMES = {
         1: 'Fundação', 2: 'Estrutura', 3: 'Instalações',
         4: 'Acabamentos', 5: 'Finalização',
     }
-    for ep in etapas_periodo:
-        ep['etapa_nome'] = ETAPA_NOMES.get(ep['etapa__numero_etapa'], f"Etapa {ep['etapa__numero_etapa']}")
+    etapas_dias = defaultdict(lambda: {'dias': 0, 'metragem': Decimal('0.00')})
+    for resumo in resumos:
+        for numero, metragem in resumo.etapas.items():
+            etapas_dias[int(numero)]['dias'] += 1
+            etapas_dias[int(numero)]['metragem'] += Decimal(metragem)
+    etapas_periodo = [
+        {
+            'etapa__numero_etapa': numero,
+            'etapa_nome': ETAPA_NOMES.get(numero, f"Etapa {numero}"),
+            **valores,
+        }
+        for numero, valores in sorted(etapas_dias.items())
+    ]
 
     # --- Fechamentos no período ---
     fechamentos = FechamentoSemanal.objects.filter(
@@ -699,7 +701,12 @@ def funcionario_detail(request, pk):
     ).order_by('-data_inicio')
 
     # --- Últimos apontamentos (últimos 15) ---
-    ultimos_apontamentos = apontamentos[:15]
+    ultimos_apontamentos = (
+        ApontamentoFuncionario.objects
+        .filter(funcionario=funcionario, data__gte=data_inicio, data__lte=data_fim)
+        .select_related('obra', 'etapa')
+        .order_by('-data', '-created_at')[:15]
+    )
 
     context = {
         'funcionario': funcionario,
@@ -849,79 +856,153 @@ def _resumo_exportacao_apontamentos(request, apontamentos):
     }
 
 
+EXPORTACAO_CHUNK_SIZE = 2000
+EXPORTACAO_AMOSTRA_LARGURA = 200
+EXPORTACAO_CABECALHO = [
+    'Funcionario', 'Funcao', 'Obra', 'Etapa', 'Data',
+    'Horas', 'Clima', 'Valor', 'Status',
+]
+
+
+def _linhas_exportacao_apontamentos(apontamentos, limite=None):
+    """
+    Gera as linhas da exportacao direto de um values_list() percorrido com
+    iterator(), sem instanciar os modelos nem manter o resultado em memoria.
+    """
+    funcoes = dict(Funcionario.FUNCAO_CHOICES)
+    climas = dict(ApontamentoFuncionario.CLIMA_CHOICES)
+    etapas = dict(Etapa.ETAPA_CHOICES)
+
+    linhas = apontamentos.values_list(
+        'funcionario__nome_completo', 'funcionario__funcao', 'obra__nome',
+        'etapa__numero_etapa', 'etapa__obra__nome', 'data', 'horas_trabalhadas',
+        'clima', 'valor_diaria', 'houve_ociosidade', 'houve_retrabalho',
+    )
+    if limite is not None:
+        linhas = linhas[:limite]
+
+    for (nome, funcao, obra_nome, numero_etapa, etapa_obra_nome, data, horas,
+         clima, valor, ociosidade, retrabalho) in linhas.iterator(chunk_size=EXPORTACAO_CHUNK_SIZE):
+        if retrabalho:
+            status = 'Retrabalho'
+        elif ociosidade:
+            status = 'Ociosidade'
+        else:
+            status = 'OK'
+        yield [
+            nome,
+            funcoes.get(funcao, funcao),
+            obra_nome or '-',
+            f'{etapa_obra_nome} - {etapas.get(numero_etapa, numero_etapa)}' if numero_etapa else '-',
+            data.strftime('%d/%m/%Y'),
+            float(horas or 0),
+            climas.get(clima, clima),
+            float(valor or 0),
+            status,
+        ]
+
+
+def _larguras_colunas_exportacao(apontamentos):
+    """Larguras das colunas a partir do cabecalho e de uma amostra limitada das linhas."""
+    larguras = [len(titulo) for titulo in EXPORTACAO_CABECALHO]
+    for linha in _linhas_exportacao_apontamentos(apontamentos, limite=EXPORTACAO_AMOSTRA_LARGURA):
+        for indice, valor in enumerate(linha):
+            larguras[indice] = max(larguras[indice], len(str(valor)))
+    return [min(largura + 2, 40) for largura in larguras]
+
+
 def _exportar_apontamentos_excel(request, apontamentos):
+    """
+    Exporta em planilha write-only: as linhas sao gravadas em arquivo temporario
+    a medida que chegam do banco e o arquivo final e enviado em blocos.
+    """
     resumo = _resumo_exportacao_apontamentos(request, apontamentos)
-    wb = Workbook()
-    ws = wb.active
-    ws.title = 'Apontamentos'
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Apontamentos')
     moeda_fmt = 'R$ #,##0.00'
     header_fill = PatternFill(fill_type='solid', fgColor='0D6EFD')
     total_fill = PatternFill(fill_type='solid', fgColor='E2F0D9')
 
-    ws.append(['Relatorio de Diarias'])
-    ws.append([f"Periodo: {resumo['periodo']}"])
-    ws.append(['Valor Total', float(resumo['valor_total'])])
+    # Em modo write-only larguras e paineis precisam ser definidos antes das linhas.
+    for indice, largura in enumerate(_larguras_colunas_exportacao(apontamentos), start=1):
+        ws.column_dimensions[get_column_letter(indice)].width = largura
+    ws.freeze_panes = 'A7'
+
+    def celula(valor, **estilos):
+        cell = WriteOnlyCell(ws, value=valor)
+        for atributo, estilo in estilos.items():
+            setattr(cell, atributo, estilo)
+        return cell
+
+    esquerda = Alignment(horizontal='left')
+    centro = Alignment(horizontal='center')
+    direita = Alignment(horizontal='right')
+
+    ws.append([celula('Relatorio de Diarias', font=Font(bold=True, size=14), alignment=esquerda)])
+    ws.append([celula(f"Periodo: {resumo['periodo']}", font=Font(bold=True), alignment=esquerda)])
+    ws.append([
+        celula('Valor Total', font=Font(bold=True), alignment=esquerda),
+        celula(float(resumo['valor_total']), number_format=moeda_fmt, alignment=esquerda),
+    ])
     ws.append([f"Gerado em: {timezone.localtime():%d/%m/%Y %H:%M}"])
     ws.append([])
     ws.append([
-        'Funcionario', 'Funcao', 'Obra', 'Etapa', 'Data',
-        'Horas', 'Clima', 'Valor', 'Status',
+        celula(titulo, font=Font(bold=True, color='FFFFFF'), fill=header_fill, alignment=centro)
+        for titulo in EXPORTACAO_CABECALHO
     ])
 
-    ws['A1'].font = Font(bold=True, size=14)
-    ws['A2'].font = Font(bold=True)
-    ws['A3'].font = Font(bold=True)
-    ws['B3'].number_format = moeda_fmt
-    ws['A1'].alignment = Alignment(horizontal='left')
-    ws['A2'].alignment = Alignment(horizontal='left')
-    ws['A3'].alignment = Alignment(horizontal='left')
-    ws['B3'].alignment = Alignment(horizontal='left')
-
-    for cell in ws[6]:
-        cell.font = Font(bold=True)
-        cell.fill = header_fill
-        cell.alignment = Alignment(horizontal='center')
-        cell.font = Font(bold=True, color='FFFFFF')
-
-    for ap in apontamentos:
-        ws.append([
-            ap.funcionario.nome_completo,
-            ap.funcionario.get_funcao_display(),
-            ap.obra.nome if ap.obra else '-',
-            str(ap.etapa) if ap.etapa else '-',
-            ap.data.strftime('%d/%m/%Y'),
-            float(ap.horas_trabalhadas or 0),
-            ap.get_clima_display(),
-            float(ap.valor_diaria or 0),
-            _texto_status_apontamento(ap),
-        ])
+    for linha in _linhas_exportacao_apontamentos(apontamentos):
+        linha[5] = celula(linha[5], alignment=centro)
+        linha[7] = celula(linha[7], number_format=moeda_fmt, alignment=direita)
+        linha[8] = celula(linha[8], alignment=centro)
+        ws.append(linha)
 
     ws.append([])
-    ws.append(['Valor Total', '', '', '', '', '', '', float(resumo['valor_total']), ''])
-    for cell in ws[ws.max_row]:
-        cell.font = Font(bold=True)
-        cell.fill = total_fill
-
-    for row in ws.iter_rows(min_row=7, max_row=ws.max_row - 2):
-        row[5].alignment = Alignment(horizontal='center')
-        row[7].number_format = moeda_fmt
-        row[7].alignment = Alignment(horizontal='right')
-        row[8].alignment = Alignment(horizontal='center')
-
-    ws.cell(row=ws.max_row, column=8).number_format = moeda_fmt
-    ws.freeze_panes = 'A7'
-
-    for column_cells in ws.columns:
-        max_length = max(len(str(cell.value or '')) for cell in column_cells)
-        ws.column_dimensions[column_cells[0].column_letter].width = min(max_length + 2, 40)
+    total = ['Valor Total', '', '', '', '', '', '', float(resumo['valor_total']), '']
+    ws.append([
+        celula(
+            valor,
+            font=Font(bold=True),
+            fill=total_fill,
+            **({'number_format': moeda_fmt} if indice == 7 else {}),
+        )
+        for indice, valor in enumerate(total)
+    ])
 
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    arquivo = tempfile.TemporaryFile()
+    wb.save(arquivo)
+    arquivo.seek(0)
+    return FileResponse(
+        arquivo,
+        as_attachment=True,
+        filename=f'apontamentos_{timezone.now():%Y%m%d_%H%M%S}.xlsx',
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
     )
+
+
+class _BufferEco:
+    """Pseudo-arquivo para csv.writer: devolve a linha em vez de acumula-la."""
+
+    def write(self, valor):
+        return valor
+
+
+def _exportar_apontamentos_csv(request, apontamentos):
+    """Exporta em CSV via StreamingHttpResponse, linha a linha a partir do banco."""
+    writer = csv.writer(_BufferEco(), delimiter=';')
+
+    def gerar():
+        yield '\ufeff'
+        yield writer.writerow(EXPORTACAO_CABECALHO)
+        for linha in _linhas_exportacao_apontamentos(apontamentos):
+            linha[5] = f'{linha[5]:.2f}'.replace('.', ',')
+            linha[7] = f'{linha[7]:.2f}'.replace('.', ',')
+            yield writer.writerow(linha)
+
+    response = StreamingHttpResponse(gerar(), content_type='text/csv; charset=utf-8')
     response['Content-Disposition'] = (
-        f'attachment; filename="apontamentos_{timezone.now():%Y%m%d_%H%M%S}.xlsx"'
+        f'attachment; filename="apontamentos_{timezone.now():%Y%m%d_%H%M%S}.csv"'
     )
-    wb.save(response)
     return response
 
 
@@ -1003,7 +1084,14 @@ def apontamento_list(request):
     exportar = request.GET.get('export')
     if exportar == 'excel':
         return _exportar_apontamentos_excel(request, qs)
+    if exportar == 'csv':
+        return _exportar_apontamentos_csv(request, qs)
     if exportar == 'pdf':
+        if request.GET.get('segundo_plano'):
+            from apps.relatorios.services.exportacao_jobs import enfileirar_exportacao
+
+            job = enfileirar_exportacao('apontamentos_pdf', request)
+            return redirect('relatorios:exportacao_detail', pk=job.pk)
         return _exportar_apontamentos_pdf(request, qs)
 
     totais = qs.aggregate(
@@ -1260,36 +1348,6 @@ def _apontamento_diario_legado(request):
 def apontamento_delete(request, pk):
     """Remove um apontamento"""
     ap = get_object_or_404(ApontamentoFuncionario, pk=pk)
-    obra_id = ap.obra_id
-    data = ap.data
-    funcionario_id = ap.funcionario_id
-    etapa_id = ap.etapa_id
-
-    def _limpar_registros_producao_orfaos(func_id, ob_id, dt, et_id):
-        """
-        Remove RegistroProducao órfão após exclusão de apontamento individual.
-        Só exclui quando não existe mais apontamento para o mesmo funcionário/obra/data/etapa.
-        """
-        qs_ap = ApontamentoFuncionario.objects.filter(
-            funcionario_id=func_id,
-            obra_id=ob_id,
-            data=dt,
-        )
-        qs_reg = RegistroProducao.objects.filter(
-            funcionario_id=func_id,
-            obra_id=ob_id,
-            data=dt,
-        )
-
-        if et_id is None:
-            qs_ap = qs_ap.filter(etapa__isnull=True)
-            qs_reg = qs_reg.filter(etapa__isnull=True)
-        else:
-            qs_ap = qs_ap.filter(etapa_id=et_id)
-            qs_reg = qs_reg.filter(etapa_id=et_id)
-
-        if not qs_ap.exists():
-            qs_reg.delete()
 
     if request.method == 'POST':
         # Registrar exclusão no histórico da etapa antes de deletar
@@ -1318,8 +1376,9 @@ def apontamento_delete(request, pk):
                 descricao='\n'.join(linhas)
             )
 
-        ap.delete()
-        _limpar_registros_producao_orfaos(funcionario_id, obra_id, data, etapa_id)
+        # Mesmo caminho da exclusão em lote: remove o RegistroProducao que ficar
+        # órfão e recalcula o rateio do dia, fechamentos abertos e resumo diário.
+        excluir_apontamentos(ApontamentoFuncionario.objects.filter(pk=ap.pk), historico=False)
         messages.success(request, 'Apontamento removido.')
         # Redirect back to diario if referer suggests it
         next_url = request.POST.get('next', '')
@@ -1330,40 +1389,28 @@ def apontamento_delete(request, pk):
 
 # ==================== FECHAMENTOS ====================
 
-@login_required
-def fechamento_list(request):
-    """Lista fechamentos agrupados por semana"""
-    from django.db.models import Sum, Count, Q, Min, Max
+FECHAMENTO_SEMANAS_POR_PAGINA = 20
+FECHAMENTO_FUNCIONARIOS_POR_PAGINA = 50
 
-    # Agrupar por semana (data_inicio, data_fim)
-    semanas_qs = (
-        FechamentoSemanal.objects
-        .values('data_inicio', 'data_fim')
-        .annotate(
-            total_funcionarios=Count('id'),
-            total_dias=Sum('total_dias'),
-            total_valor=Sum('total_valor'),
-            total_ociosidade=Sum('dias_ociosidade'),
-            total_retrabalho=Sum('dias_retrabalho'),
-            qtd_fechados=Count('id', filter=Q(status='fechado')),
-            qtd_pagos=Count('id', filter=Q(status='pago')),
-        )
-        .order_by('-data_inicio')
-    )
 
-    semanas = list(semanas_qs)
+@login_required
+def fechamento_list(request):
+    """Lista fechamentos agrupados por semana (paginada, a partir do resumo semanal)"""
+    semanas_qs = ResumoSemanaFechamento.objects.order_by('-data_inicio', '-data_fim')
 
-    # Calcular status geral de cada semana
-    for s in semanas:
-        if s['qtd_pagos'] == s['total_funcionarios']:
-            s['status_geral'] = 'pago'
-        elif s['qtd_pagos'] > 0:
-            s['status_geral'] = 'parcial'
-        else:
-            s['status_geral'] = 'fechado'
+    paginator = Paginator(semanas_qs, FECHAMENTO_SEMANAS_POR_PAGINA)
+    page = request.GET.get('page')
+    try:
+        semanas = paginator.page(page)
+    except PageNotAnInteger:
+        semanas = paginator.page(1)
+    except EmptyPage:
+        semanas = paginator.page(paginator.num_pages)
 
     context = {
         'semanas': semanas,
+        'page_obj': semanas,
+        'ultima_semana': semanas[0] if semanas.number == 1 and semanas.object_list else semanas_qs.first(),
         'title': 'Fechamentos Semanais',
     }
     return render(request, 'funcionarios/fechamento_list.html', context)
@@ -1400,29 +1447,28 @@ def fechamento_semana_detail(request, data_inicio):
 
     dt_fim = dt_inicio + datetime.timedelta(days=5)  # seg a sáb
 
-    fechamentos = (
-        FechamentoSemanal.objects
-        .filter(data_inicio=dt_inicio)
-        .select_related('funcionario')
-        .order_by('funcionario__nome_completo')
+    # Totais da semana a partir do resumo (pode haver mais de um data_fim)
+    totais = ResumoSemanaFechamento.objects.filter(data_inicio=dt_inicio).aggregate(
+        total_funcionarios=Sum('total_funcionarios'),
+        total_dias=Sum('total_dias'),
+        total_valor=Sum('total_valor'),
+        total_ociosidade=Sum('total_ociosidade'),
+        total_retrabalho=Sum('total_retrabalho'),
+        qtd_fechados=Sum('qtd_fechados'),
+        qtd_pagos=Sum('qtd_pagos'),
+        data_fim=Max('data_fim'),
     )
-
-    if not fechamentos.exists():
+    if not totais['total_funcionarios']:
         messages.warning(request, 'Nenhum fechamento encontrado para esta semana.')
         return redirect('funcionarios:fechamento_list')
 
-    dt_fim_real = fechamentos.first().data_fim
+    dt_fim_real = totais['data_fim']
 
-    # Totais da semana
-    from django.db.models import Sum, Count, Q
-    totais = fechamentos.aggregate(
-        total_funcionarios=Count('id'),
-        total_dias=Sum('total_dias'),
-        total_valor=Sum('total_valor'),
-        total_ociosidade=Sum('dias_ociosidade'),
-        total_retrabalho=Sum('dias_retrabalho'),
-        qtd_fechados=Count('id', filter=Q(status='fechado')),
-        qtd_pagos=Count('id', filter=Q(status='pago')),
+    fechamentos = (
+        FechamentoSemanal.objects
+        .filter(data_inicio=dt_inicio)
+        .select_related('funcionario')
+        .order_by('funcionario__nome_completo', 'pk')
     )
 
     # Filtro por status
@@ -1480,11 +1526,26 @@ def fechamento_semana_detail(request, data_inicio):
         })
         d += datetime.timedelta(days=1)
 
-    # Buscar apontamentos da semana para mostrar dia/obra por funcionário
+    paginator = Paginator(fechamentos, FECHAMENTO_FUNCIONARIOS_POR_PAGINA)
+    page = request.GET.get('page')
+    try:
+        fechamentos_page = paginator.page(page)
+    except PageNotAnInteger:
+        fechamentos_page = paginator.page(1)
+    except EmptyPage:
+        fechamentos_page = paginator.page(paginator.num_pages)
+    fechamentos_list = list(fechamentos_page.object_list)
+
+    # Apontamentos da semana (dia/obra) só dos funcionários desta página
     apontamentos_semana = (
         ApontamentoFuncionario.objects
-        .filter(data__gte=dt_inicio, data__lte=dt_fim_real)
+        .filter(
+            funcionario_id__in=[f.funcionario_id for f in fechamentos_list],
+            data__gte=dt_inicio,
+            data__lte=dt_fim_real,
+        )
         .select_related('obra')
+        .only('funcionario_id', 'data', 'obra__nome')
         .order_by('data')
     )
     # Agrupar por funcionário: lista de {data, obra_nome}
@@ -1495,13 +1556,16 @@ def fechamento_semana_detail(request, data_inicio):
             'obra': apt.obra.nome if apt.obra else '—',
         })
 
-    # Converter fechamentos para lista para poder anotar
-    fechamentos_list = list(fechamentos)
     for f in fechamentos_list:
         f.apontamentos_semana = apts_por_func.get(f.funcionario_id, [])
 
+    querystring = request.GET.copy()
+    querystring.pop('page', None)
+
     context = {
         'fechamentos': fechamentos_list,
+        'page_obj': fechamentos_page,
+        'querystring': querystring.urlencode(),
         'data_inicio': dt_inicio,
         'data_fim': dt_fim_real,
         'totais': totais,
@@ -1542,6 +1606,7 @@ def fechamento_semana_pagar(request, data_inicio):
     hoje = timezone.now().date()
     with transaction.atomic():
         updated = fechamentos_qs.exclude(status='pago').update(status='pago', data_pagamento=hoje)
+        ResumoSemanaFechamento.atualizar(fechamentos_qs.values_list('data_inicio', 'data_fim').distinct())
 
     messages.success(request, f'{updated} fechamento(s) marcado(s) como pago.')
     return redirect('funcionarios:fechamento_semana_detail', data_inicio=data_inicio)
@@ -1660,7 +1725,8 @@ def fechamento_semana_delete(request, data_inicio):
         total_valor = fechamentos.aggregate(Sum('total_valor'))['total_valor__sum'] or Decimal('0.00')
         
         try:
-            fechamentos.delete()
+            with ResumoSemanaFechamento.agrupar():
+                fechamentos.delete()
             total_valor_str = brl(total_valor)
             messages.success(
                 request,
@@ -1726,37 +1792,16 @@ def fechamento_auto(request):
             )
             return redirect('funcionarios:fechamento_list')
 
-        funcionarios = Funcionario.objects.filter(ativo=True).exclude(funcao='fiscal')
-        criados = 0
-        existentes = 0
-
-        for func in funcionarios:
-            has_ap = ApontamentoFuncionario.objects.filter(
-                funcionario=func,
-                data__gte=data_inicio,
-                data__lte=data_fim
-            ).exists()
-            if not has_ap:
-                continue
+        resultado = FechamentoSemanal.gerar_em_lote(data_inicio, data_fim)
+        tempos = ', '.join(f'{fase} {segundos:.2f}s' for fase, segundos in resultado['tempos'].items())
+        logger.info('Fechamento automático %s a %s: %s', data_inicio, data_fim, tempos)
+        criados = resultado['criados']
+        existentes = resultado['atualizados']
 
-            existing = FechamentoSemanal.objects.filter(
-                funcionario=func, data_inicio=data_inicio, data_fim=data_fim
-            ).first()
-            if existing:
-                existing.calcular_totais()
-                existentes += 1
-            else:
-                f = FechamentoSemanal(
-                    funcionario=func,
-                    data_inicio=data_inicio,
-                    data_fim=data_fim,
-                    status='fechado'
-                )
-                f.save()
-                f.calcular_totais()
-                criados += 1
-
-        messages.success(request, f'Fechamento automático concluído: {criados} criados, {existentes} atualizados.')
+        messages.success(
+            request,
+            f'Fechamento automático concluído: {criados} criados, {existentes} atualizados ({tempos}).'
+        )
         return redirect('funcionarios:fechamento_list')
 
     # GET: show form to select period
@@ -1857,16 +1902,29 @@ def funcionario_historico(request, pk):
     cal = calendar.Calendar(firstweekday=0)  # Monday first
     month_days = cal.monthdayscalendar(ano, mes)
 
-    apontamentos_mes = ApontamentoFuncionario.objects.filter(
-        funcionario=funcionario,
-        data__year=ano,
-        data__month=mes
-    ).select_related('obra', 'etapa')
+    primeiro_dia = datetime.date(ano, mes, 1)
+    ultimo_dia = datetime.date(ano, mes, calendar.monthrange(ano, mes)[1])
+    resumos_mes = list(ResumoDiarioFuncionario.do_periodo(funcionario, primeiro_dia, ultimo_dia))
+    por_obra = ResumoDiarioFuncionario.por_obra(resumos_mes)
+    nomes_obras = dict(
+        Obra.all_objects.filter(
+            pk__in=list(por_obra)
+        ).values_list('pk', 'nome')
+    )
 
-    # Map by day
+    # Map by day (obra com mais horas no dia)
     ap_by_day = {}
-    for ap in apontamentos_mes:
-        ap_by_day[ap.data.day] = ap
+    for resumo in resumos_mes:
+        if not resumo.qtd_apontamentos:
+            continue
+        obra_id = max(resumo.obras, key=lambda chave: Decimal(resumo.obras[chave]['horas']))
+        ap_by_day[resumo.data.day] = {
+            'obra_nome': nomes_obras.get(int(obra_id), '—'),
+            'horas': resumo.horas,
+            'etapa': min((int(numero) for numero in resumo.etapas), default=None),
+            'houve_ociosidade': resumo.houve_ociosidade,
+            'houve_retrabalho': resumo.houve_retrabalho,
+        }
 
     # Build calendar with data
     calendar_weeks = []
@@ -1885,19 +1943,13 @@ def funcionario_historico(request, pk):
         calendar_weeks.append(week_data)
 
     # Stats for the month (one diária per unique date)
-    stats = apontamentos_mes.aggregate(
-        total_dias=Count('data', distinct=True),
-        total_horas=Sum('horas_trabalhadas'),
-        total_valor=Sum('valor_diaria'),
-        dias_ociosidade=Count('data', filter=Q(houve_ociosidade=True), distinct=True),
-        dias_retrabalho=Count('data', filter=Q(houve_retrabalho=True), distinct=True),
-    )
+    stats = ResumoDiarioFuncionario.totalizar(resumos_mes)
 
     # Obras trabalhadas no mês
-    obras_mes = apontamentos_mes.values('obra__nome').annotate(
-        dias=Count('data', distinct=True),
-        horas=Sum('horas_trabalhadas'),
-    ).order_by('-dias')
+    obras_mes = [
+        {'obra__nome': nomes_obras.get(obra_id, '—'), 'dias': valores['dias'], 'horas': valores['horas']}
+        for obra_id, valores in por_obra.items()
+    ]
 
     # Navigation
     prev_month = datetime.date(ano, mes, 1) - datetime.timedelta(days=1)
@@ -1948,14 +2000,14 @@ def funcionario_medias_individuais(request, pk):
         data_inicio = hoje - datetime.timedelta(days=90)
         data_fim = hoje
     
-    # Buscar produções do pedreiro
-    producoes = RegistroProducao.objects.filter(
-        funcionario=funcionario,
-        data__range=[data_inicio, data_fim]
-    )
-    
+    # Produção diária do pedreiro (resumo materializado)
+    resumos = [
+        resumo
+        for resumo in ResumoDiarioFuncionario.do_periodo(funcionario, data_inicio, data_fim)
+        if resumo.producao
+    ]
+
     # Calcular médias por indicador
-    from collections import defaultdict
     medias_por_etapa = defaultdict(list)
     
     # Mapear indicadores para etapas
@@ -1969,37 +2021,35 @@ def funcionario_medias_individuais(request, pk):
         'reboco_externo': (3, 'Reboco Externo', 'm²'),
         'reboco_interno': (3, 'Reboco Interno', 'm²'),
     }
-    
-    for indicador_code in producoes.order_by().values_list('indicador', flat=True).distinct():
-        prods = producoes.filter(indicador=indicador_code)
-        
-        if prods.exists():
-            # Calcular média CORRETA (evitando o problema de divisão errada)
-            total_producao = sum(float(p.quantidade) for p in prods)
-            total_dias = prods.values('data').distinct().count()
-            
-            if total_dias > 0:
-                media = total_producao / total_dias
-            else:
-                media = 0
-            
-            etapa_num, nome, unidade = INDICADOR_ETAPA.get(
-                indicador_code, 
-                (0, indicador_code, '')
-            )
-            
-            medias_por_etapa[etapa_num].append({
-                'codigo': indicador_code,
-                'nome': nome,
-                'media': round(media, 2),
-                'unidade': unidade,
-                'total_producao': round(total_producao, 2),
-                'total_dias': total_dias,
-            })
+
+    # indicador -> (quantidade total, dias com produção)
+    totais_indicador = defaultdict(lambda: [Decimal('0.00'), 0])
+    for resumo in resumos:
+        for indicador_code, quantidade in resumo.producao.items():
+            totais_indicador[indicador_code][0] += Decimal(quantidade)
+            totais_indicador[indicador_code][1] += 1
+
+    for indicador_code, (total_producao, total_dias) in totais_indicador.items():
+        # Média por dia com produção do indicador
+        media = total_producao / total_dias if total_dias else Decimal('0')
+
+        etapa_num, nome, unidade = INDICADOR_ETAPA.get(
+            indicador_code, 
+            (0, indicador_code, '')
+        )
+
+        medias_por_etapa[etapa_num].append({
+            'codigo': indicador_code,
+            'nome': nome,
+            'media': round(float(media), 2),
+            'unidade': unidade,
+            'total_producao': round(float(total_producao), 2),
+            'total_dias': total_dias,
+        })
     
     # Calcular totais gerais
-    total_dias_trabalhados = producoes.values('data').distinct().count()
-    total_obras = producoes.values('obra').distinct().count()
+    total_dias_trabalhados = len(resumos)
+    total_obras = len({obra_id for resumo in resumos for obra_id in resumo.obras_producao})
     
     context = {
         'funcionario': funcionario,
@@ -2117,13 +2167,21 @@ def apontamentos_api(request):
     return JsonResponse(result)
 
 
+def _etag_autocomplete(request, *args, **kwargs):
+    """ETag das APIs de autocomplete: versão do índice em memória + querystring."""
+    querystring = hashlib.md5(request.GET.urlencode().encode()).hexdigest()[:12]
+    return f"{versao_autocomplete()}-{querystring}"
+
+
 @login_required
 @require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_etag_autocomplete)
 def obras_autocomplete_api(request):
-    """Autocomplete API for Obra by name. Returns limited list to avoid heavy queries.
+    """Autocomplete API for Obra by name. Served from the in-memory index (no DB query).
 
     Query params:
-    - q: partial name (required, min 2 chars recommended)
+    - q: partial name (required; each word matches as a prefix, accents ignored)
     - limit: max results (optional, default 10, max 50)
     """
     q = request.GET.get('q', '').strip()
@@ -2136,34 +2194,59 @@ def obras_autocomplete_api(request):
         limit = 10
     limit = max(1, min(limit, 50))
 
-    # Basic search: name contains q (case-insensitive). Use only active, planning or in_progress
-    obras_qs = Obra.objects.filter(
-        ativo=True,
-        status__in=['planejamento', 'em_andamento'],
-        nome__icontains=q
-    ).order_by('nome')[:limit]
+    # Só obras ativas em planejamento/andamento
+    obras = sugerir_obras(q, limite=limit, status=('planejamento', 'em_andamento'))
+    results = [{'id': o['id'], 'text': o['nome']} for o in obras]
+
+    return JsonResponse({'results': results})
+
+
+@login_required
+@require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_etag_autocomplete)
+def apontamento_funcionarios_api(request):
+    """Funcionários ativos para os seletores dos apontamentos (índice em memória).
 
-    results = []
-    for o in obras_qs:
-        results.append({'id': o.pk, 'text': o.nome})
+    Query params:
+    - q: nome parcial (opcional; sem q retorna todos os ativos em ordem alfabética)
+    - limit: máximo de resultados (opcional; padrão sem limite)
+    """
+    q = request.GET.get('q', '').strip()
+    try:
+        limit = max(0, int(request.GET.get('limit', 0)))
+    except (TypeError, ValueError):
+        limit = 0
 
+    results = [
+        {
+            'id': f['id'],
+            'nome_completo': f['nome_completo'],
+            'funcao': f['funcao'],
+            'funcao_display': f['funcao_display'],
+        }
+        for f in sugerir_funcionarios(q, limite=limit or None)
+    ]
     return JsonResponse({'results': results})
 
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_etag_autocomplete)
 def etapas_por_obra_api(request):
     """API para retornar etapas de uma obra (para preencher select dinamicamente)"""
     obra_id = request.GET.get('obra_id')
-    if not obra_id:
+    try:
+        obra_id = int(obra_id)
+    except (TypeError, ValueError):
         return JsonResponse({'etapas': []})
 
-    etapas = Etapa.objects.filter(
-        obra_id=obra_id,
-        obra__ativo=True,
-        obra__status__in=['planejamento', 'em_andamento'],
+    etapas = etapas_da_obra(
+        obra_id,
+        status_obra=('planejamento', 'em_andamento'),
         status='em_andamento',
-    ).order_by('numero_etapa')
-    data = [{'id': e.id, 'label': e.get_numero_etapa_display()} for e in etapas]
+    )
+    data = [{'id': e['id'], 'label': e['label']} for e in etapas]
     return JsonResponse({'etapas': data})
 
 
@@ -2235,7 +2318,6 @@ def apontamento_lote_create(request):
                 messages.error(request, '❌ Adicione pelo menos 1 funcionário!')
                 context = {
                     'form': form_lote,
-                    'funcionarios': Funcionario.objects.filter(ativo=True).order_by('nome_completo'),
                     'title': 'Apontamento Diário em Lote'
                 }
                 return render(request, 'funcionarios/apontamento_lote_form.html', context)
@@ -2311,7 +2393,6 @@ def apontamento_lote_create(request):
                     messages.error(request, '❌ Nenhuma etapa salva no rascunho pôde ser processada.')
                     context = {
                         'form': form_lote,
-                        'funcionarios': Funcionario.objects.filter(ativo=True).order_by('nome_completo'),
                         'title': 'Apontamento Diário em Lote'
                     }
                     return render(request, 'funcionarios/apontamento_lote_form.html', context)
@@ -2322,31 +2403,13 @@ def apontamento_lote_create(request):
             lote.save()
             
             # Criar registros FuncionarioLote
-            funcionarios_criados = 0
-            for i, func_id in enumerate(funcionarios_ids):
-                try:
-                    funcionario = Funcionario.objects.get(pk=func_id, ativo=True)
-                    horas = Decimal(horas_trabalhadas_list[i]) if i < len(horas_trabalhadas_list) else Decimal('8.0')
-                    if funcionario.funcao == 'fiscal':
-                        horas = Decimal('0.0')
-                    elif horas <= Decimal('0.0'):
-                        horas = Decimal('8.0')
-                    
-                    FuncionarioLote.objects.create(
-                        lote=lote,
-                        funcionario=funcionario,
-                        horas_trabalhadas=horas
-                    )
-                    funcionarios_criados += 1
-                except (Funcionario.DoesNotExist, ValueError, InvalidOperation):
-                    continue
+            funcionarios_criados = _criar_funcionarios_lote(lote, funcionarios_ids, horas_trabalhadas_list)
             
             if funcionarios_criados == 0:
                 lote.delete()
                 messages.error(request, '❌ Nenhum funcionário válido foi adicionado!')
                 context = {
                     'form': form_lote,
-                    'funcionarios': Funcionario.objects.filter(ativo=True).order_by('nome_completo'),
                     'title': 'Apontamento Diário em Lote'
                 }
                 return render(request, 'funcionarios/apontamento_lote_form.html', context)
@@ -2497,8 +2560,7 @@ def apontamento_lote_create(request):
             lote._valores_dia = valores_producao_dia
             
             # Debug: verificar quantidade de pedreiros
-            total_funcionarios = lote.funcionarios.count()
-            pedreiros_count = sum(1 for f in lote.funcionarios.all() if f.funcionario.funcao == 'pedreiro')
+            pedreiros_count = lote.funcionarios.filter(funcionario__funcao='pedreiro').count()
             
             # Gerar apontamentos individuais
             apontamentos_criados = lote.gerar_apontamentos_individuais()
@@ -2572,79 +2634,168 @@ def apontamento_lote_create(request):
 
         form_lote = ApontamentoDiarioLoteForm(initial=initial) if initial else ApontamentoDiarioLoteForm()
     
-    # Buscar funcionários ativos
-    funcionarios = Funcionario.objects.filter(ativo=True).order_by('nome_completo')
-    funcionarios_json = json.dumps([
-        {
-            'id': f.id,
-            'nome_completo': f.nome_completo,
-            'funcao': f.funcao,
-            'funcao_display': f.get_funcao_display()
-        } for f in funcionarios
-    ])
-    
+    # Funcionários ativos são carregados pelo formulário via apontamento_funcionarios_api
     context = {
         'form': form_lote,
-        'funcionarios': funcionarios,
-        'funcionarios_json': funcionarios_json,
         'title': 'Apontamento Diário em Lote'
     }
     
     return render(request, 'funcionarios/apontamento_lote_form.html', context)
 
 
+LOTES_POR_PAGINA = 20
+LOTES_CONTAGEM_TIMEOUT = 300
+
+
+def _codificar_cursor_lote(lote):
+    valor = f'{lote.data.isoformat()}|{lote.created_at.isoformat()}|{lote.pk}'
+    return base64.urlsafe_b64encode(valor.encode()).decode().rstrip('=')
+
+
+def _decodificar_cursor_lote(cursor):
+    """Cursor (data, created_at, id) da paginação; None se inválido."""
+    if not cursor:
+        return None
+    try:
+        valor = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        data_str, created_str, pk_str = valor.split('|')
+        return (
+            datetime.date.fromisoformat(data_str),
+            datetime.datetime.fromisoformat(created_str),
+            int(pk_str),
+        )
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def _filtro_keyset_lote(cursor, depois=True):
+    """
+    Linhas depois (ou antes) do cursor na ordem (-data, -created_at, -id).
+    """
+    data, created_at, pk = cursor
+    if depois:
+        return (
+            Q(data__lt=data)
+            | Q(data=data, created_at__lt=created_at)
+            | Q(data=data, created_at=created_at, pk__lt=pk)
+        )
+    return (
+        Q(data__gt=data)
+        | Q(data=data, created_at__gt=created_at)
+        | Q(data=data, created_at=created_at, pk__gt=pk)
+    )
+
+
+def _contagem_estimada_lotes(lotes, filtros):
+    """
+    Total de lotes para exibição: contagem em cache por filtro (alguns
+    minutos de atraso são aceitáveis). Sem filtros, no PostgreSQL, usa a
+    estimativa do catálogo (reltuples) em vez de COUNT(*).
+    """
+    chave = 'funcionarios:lotes:contagem:' + hashlib.md5(
+        urlencode(sorted(filtros.items())).encode()
+    ).hexdigest()
+    total = cache.get(chave)
+    if total is not None:
+        return total
+
+    total = None
+    if not filtros and connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [ApontamentoDiarioLote._meta.db_table],
+            )
+            linha = cursor.fetchone()
+            if linha and linha[0] and linha[0] > 0:
+                total = int(linha[0])
+    if total is None:
+        total = lotes.count()
+    cache.set(chave, total, LOTES_CONTAGEM_TIMEOUT)
+    return total
+
+
 @login_required
 def apontamento_lote_list(request):
-    """Lista apontamentos em lote com agrupamento visual por data/obra/etapa"""
+    """
+    Lista apontamentos em lote com agrupamento visual por data/obra/etapa.
+
+    Paginação por cursor (keyset) em (data, created_at, id): cada página lê e
+    faz prefetch só das suas linhas, então a página 1 e a 500 custam o mesmo.
+    """
     lotes = ApontamentoDiarioLote.objects.select_related(
         'obra', 'etapa', 'criado_por'
-    ).prefetch_related('funcionarios__funcionario').order_by('-data', '-created_at')
+    )
     
     # Filtros
     obra_id = request.GET.get('obra')
     data_inicio = request.GET.get('data_inicio')
     data_fim = request.GET.get('data_fim')
+    filtros = {}
     
     if obra_id:
         lotes = lotes.filter(obra_id=obra_id)
+        filtros['obra'] = obra_id
     if data_inicio:
         try:
             lotes = lotes.filter(data__gte=datetime.datetime.strptime(data_inicio, '%Y-%m-%d').date())
+            filtros['data_inicio'] = data_inicio
         except ValueError:
             pass
     if data_fim:
         try:
             lotes = lotes.filter(data__lte=datetime.datetime.strptime(data_fim, '%Y-%m-%d').date())
+            filtros['data_fim'] = data_fim
         except ValueError:
             pass
+
+    ordem = ('-data', '-created_at', '-id')
+    ordem_inversa = ('data', 'created_at', 'id')
+    cursor_depois = _decodificar_cursor_lote(request.GET.get('depois'))
+    cursor_antes = _decodificar_cursor_lote(request.GET.get('antes'))
+    ultima = request.GET.get('ultima') == '1'
+
+    # Busca uma linha a mais para saber se existe página seguinte
+    if cursor_antes or ultima:
+        janela = lotes.order_by(*ordem_inversa)
+        if cursor_antes:
+            janela = janela.filter(_filtro_keyset_lote(cursor_antes, depois=False))
+        lotes_pagina = list(janela[:LOTES_POR_PAGINA + 1])
+        tem_anterior = len(lotes_pagina) > LOTES_POR_PAGINA
+        lotes_pagina = lotes_pagina[:LOTES_POR_PAGINA][::-1]
+        tem_proxima = not ultima
+    else:
+        janela = lotes.order_by(*ordem)
+        if cursor_depois:
+            janela = janela.filter(_filtro_keyset_lote(cursor_depois))
+        lotes_pagina = list(janela[:LOTES_POR_PAGINA + 1])
+        tem_proxima = len(lotes_pagina) > LOTES_POR_PAGINA
+        lotes_pagina = lotes_pagina[:LOTES_POR_PAGINA]
+        tem_anterior = cursor_depois is not None
+
+    prefetch_related_objects(lotes_pagina, 'funcionarios__funcionario')
     
-    # Agrupar por data + obra + etapa para destacar visualmente
+    # Agrupar por data + obra + etapa para destacar visualmente (só a janela exibida)
     cores = ['table-primary', 'table-success', 'table-warning', 'table-info', 'table-light']
     grupo_cores = {}
-    idx_cor = 0
-    lotes_list = list(lotes)
     lote_cor_map = {}
-    
-    for lote in lotes_list:
-        chave = f"{lote.data}_{lote.obra_id}_{lote.etapa_id if lote.etapa else 'sem_etapa'}"
+    for lote in lotes_pagina:
+        chave = (lote.data, lote.obra_id, lote.etapa_id)
         if chave not in grupo_cores:
-            grupo_cores[chave] = cores[idx_cor % len(cores)]
-            idx_cor += 1
+            grupo_cores[chave] = cores[len(grupo_cores) % len(cores)]
         lote_cor_map[lote.pk] = grupo_cores[chave]
-    
-    # Pagination
-    paginator = Paginator(lotes, 20)
-    page = request.GET.get('page')
-    try:
-        page_obj = paginator.page(page)
-    except PageNotAnInteger:
-        page_obj = paginator.page(1)
-    except EmptyPage:
-        page_obj = paginator.page(paginator.num_pages)
-    
+
+    querystring = urlencode(filtros)
     context = {
-        'lotes': page_obj,
+        'lotes': lotes_pagina,
         'lote_cor_map': lote_cor_map,
+        'total_lotes': _contagem_estimada_lotes(lotes, filtros),
+        'lotes_por_pagina': LOTES_POR_PAGINA,
+        'tem_anterior': tem_anterior,
+        'tem_proxima': tem_proxima,
+        'cursor_anterior': _codificar_cursor_lote(lotes_pagina[0]) if lotes_pagina and tem_anterior else '',
+        'cursor_proxima': _codificar_cursor_lote(lotes_pagina[-1]) if lotes_pagina and tem_proxima else '',
+        'querystring': querystring,
         'title': 'Apontamentos em Lote',
         'obras': Obra.objects.filter(ativo=True).order_by('nome'),
     }
@@ -3267,19 +3418,20 @@ def apontamento_lote_delete(request, pk):
     # PASSO 1: Reverter produção nas etapas (legado)
     reverter_producao_etapa(lote)
 
-    # PASSO 2: Excluir registros de produção
-    RegistroProducao.objects.filter(
-        obra=obra,
-        data=data,
-        etapa=etapa
-    ).delete()
-
-    # PASSO 3: Excluir apontamentos individuais vinculados
-    ApontamentoFuncionario.objects.filter(
-        obra=obra,
-        data=data,
-        etapa=etapa
-    ).delete()
+    with ResumoDiarioFuncionario.agrupar():
+        # PASSO 2: Excluir registros de produção
+        RegistroProducao.objects.filter(
+            obra=obra,
+            data=data,
+            etapa=etapa
+        ).delete()
+
+        # PASSO 3: Excluir apontamentos individuais vinculados
+        # (fechamentos abertos da semana recebem a diferença)
+        excluir_apontamentos(
+            ApontamentoFuncionario.objects.filter(obra=obra, data=data, etapa=etapa),
+            historico=False,
+        )
 
     # PASSO 4: Registrar no histórico
     HistoricoAlteracaoEtapa.objects.create(
@@ -3365,19 +3517,23 @@ def apontamento_lote_edit(request, pk):
             # PASSO 1: Reverter produção antiga
             reverter_producao_etapa(lote)
 
-            # PASSO 2: Excluir registros de produção antigos
-            RegistroProducao.objects.filter(
-                obra=lote.obra,
-                data=lote.data,
-                etapa=lote.etapa
-            ).delete()
+            with ResumoDiarioFuncionario.agrupar():
+                # PASSO 2: Excluir registros de produção antigos
+                RegistroProducao.objects.filter(
+                    obra=lote.obra,
+                    data=lote.data,
+                    etapa=lote.etapa
+                ).delete()
 
-            # PASSO 3: Excluir apontamentos individuais antigos
-            ApontamentoFuncionario.objects.filter(
-                obra=lote.obra,
-                data=lote.data,
-                etapa=lote.etapa
-            ).delete()
+                # PASSO 3: Excluir apontamentos individuais antigos
+                # (fechamentos abertos recebem a diferença; os novos entram no PASSO 8)
+                apontamentos_antigos = ApontamentoFuncionario.objects.filter(
+                    obra=lote.obra,
+                    data=lote.data,
+                    etapa=lote.etapa
+                )
+                with FechamentoSemanal.manter_totais(apontamentos_antigos.values_list('funcionario_id', 'data')):
+                    apontamentos_antigos.delete()
 
             # PASSO 4: Salvar lote atualizado
             lote_atualizado = form.save()
@@ -3389,23 +3545,7 @@ def apontamento_lote_edit(request, pk):
             horas_trabalhadas_list = request.POST.getlist('horas_trabalhadas')
             funcionarios_ids = [f for f in funcionarios_ids if f]
 
-            funcionarios_criados = 0
-            for i, func_id in enumerate(funcionarios_ids):
-                try:
-                    funcionario = Funcionario.objects.get(pk=func_id, ativo=True)
-                    horas = Decimal(horas_trabalhadas_list[i]) if i < len(horas_trabalhadas_list) else Decimal('8.0')
-                    if funcionario.funcao == 'fiscal':
-                        horas = Decimal('0.0')
-                    elif horas <= Decimal('0.0'):
-                        horas = Decimal('8.0')
-                    FuncionarioLote.objects.create(
-                        lote=lote,
-                        funcionario=funcionario,
-                        horas_trabalhadas=horas,
-                    )
-                    funcionarios_criados += 1
-                except (Funcionario.DoesNotExist, ValueError, InvalidOperation):
-                    continue
+            funcionarios_criados = _criar_funcionarios_lote(lote, funcionarios_ids, horas_trabalhadas_list)
 
             if funcionarios_criados == 0:
                 messages.error(request, '❌ Nenhum funcionário válido foi adicionado!')
@@ -3542,24 +3682,11 @@ def apontamento_lote_edit(request, pk):
     else:
         form = ApontamentoDiarioLoteForm(instance=lote)
 
-    # Serializar funcionários para JS
-    todos_funcionarios = Funcionario.objects.filter(ativo=True).order_by('nome_completo')
-    funcionarios_json = json.dumps([
-        {
-            'id': f.id,
-            'nome': f.nome_completo,
-            'funcao': f.funcao,
-            'funcao_display': f.get_funcao_display(),
-        }
-        for f in todos_funcionarios
-    ])
-
+    # Demais funcionários ativos são carregados pelo formulário via apontamento_funcionarios_api
     context = {
         'form': form,
         'lote': lote,
         'funcionarios_atuais': funcionarios_atuais,
-        'funcionarios': todos_funcionarios,
-        'funcionarios_json': funcionarios_json,
         'title': f'Editar Apontamento - {lote.data.strftime("%d/%m/%Y")}',
     }
 
@@ -1,9 +1,50 @@
+import threading
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.functional import SimpleLazyObject
+
 from .models import Obra
 
-def recent_obras(request):
-    """Return last 6 obras for navbar quick access."""
+# Cache por processo das obras recentes. Uma versão no cache do Django
+# (compartilhada entre workers quando há Redis) é incrementada pelos signals
+# de Obra; cada processo descarta a sua cópia quando a versão muda.
+CHAVE_VERSAO_OBRAS_RECENTES = 'obras:recentes:versao'
+_obras_recentes = {'versao': None, 'obras': None}
+_obras_recentes_lock = threading.Lock()
+
+
+def _versao_obras_recentes():
+    cache.add(CHAVE_VERSAO_OBRAS_RECENTES, 1, timeout=None)
+    return cache.get(CHAVE_VERSAO_OBRAS_RECENTES) or 1
+
+
+def _incrementar_versao_obras_recentes():
+    _obras_recentes['versao'] = None
     try:
-        obras = list(Obra.objects.filter(ativo=True).order_by('-created_at')[:6])
-    except Exception:
-        obras = []
-    return {'recent_obras': obras}
+        cache.incr(CHAVE_VERSAO_OBRAS_RECENTES)
+    except ValueError:
+        cache.set(CHAVE_VERSAO_OBRAS_RECENTES, _versao_obras_recentes() + 1, timeout=None)
+
+
+def invalidar_obras_recentes():
+    """Descarta a lista em cache quando a transação atual for confirmada."""
+    transaction.on_commit(_incrementar_versao_obras_recentes)
+
+
+def _carregar_obras_recentes():
+    versao = _versao_obras_recentes()
+    with _obras_recentes_lock:
+        if _obras_recentes['versao'] != versao:
+            try:
+                obras = list(Obra.objects.filter(ativo=True).order_by('-created_at')[:6])
+            except Exception:
+                return []
+            _obras_recentes['versao'] = versao
+            _obras_recentes['obras'] = obras
+        return list(_obras_recentes['obras'])
+
+
+def recent_obras(request):
+    """Return last 6 obras for navbar quick access (avaliado só se o template usar)."""
+    return {'recent_obras': SimpleLazyObject(_carregar_obras_recentes)}
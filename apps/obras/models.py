@@ -1,7 +1,7 @@
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
 from decimal import Decimal
@@ -749,3 +749,11 @@ def criar_etapas_automaticamente(sender, instance, created, **kwargs):
             distribuir_datas_etapas(instance)
         except Exception as e:
             print(f"Erro ao distribuir datas para obra {instance.pk}: {str(e)}")
+
+
+@receiver(post_save, sender=Obra)
+@receiver(post_delete, sender=Obra)
+def invalidar_cache_obras_recentes(sender, **kwargs):
+    """Lista de obras recentes (navbar) precisa ser recarregada."""
+    from apps.obras.context_processors import invalidar_obras_recentes
+    invalidar_obras_recentes()
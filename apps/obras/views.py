@@ -26,6 +26,7 @@ from django.urls import reverse
 from django.core.paginator import Paginator
 from django.db.models import Q
 from apps.clientes.models import Cliente
+from apps.busca.models import DocumentoBusca
 import re
 
 
@@ -146,7 +147,7 @@ def obra_list(request):
     data_termino_de = request.GET.get('data_termino_de')
     data_termino_ate = request.GET.get('data_termino_ate')
     if q:
-        qs = qs.filter(nome__icontains=q)
+        qs = qs.filter(pk__in=DocumentoBusca.filtrar('obra', q))
     if cliente:
         qs = qs.filter(cliente__nome__icontains=cliente)
     if cpf:
@@ -334,30 +335,23 @@ def _retornar_ferramentas_para_deposito(obra, usuario):
     Cria registros de movimentação (retorno_deposito) para auditoria.
     Remove também todas as conferências de ferramentas da obra.
     """
-    from apps.ferramentas.models import (
-        LocalizacaoFerramenta, MovimentacaoFerramenta, ConferenciaFerramenta
-    )
-
-    localizacoes = LocalizacaoFerramenta.objects.filter(
-        local_tipo='obra',
-        obra=obra
-    ).select_related('ferramenta')
+    from apps.ferramentas.models import ConferenciaFerramenta, LocalizacaoFerramenta
+    from apps.ferramentas.services import movimentar_em_lote
 
+    itens = list(
+        LocalizacaoFerramenta.objects.filter(local_tipo='obra', obra=obra, quantidade__gt=0)
+        .values_list('ferramenta_id', 'quantidade')
+    )
     qtd_retornadas = 0
-    for loc in localizacoes:
-        if loc.quantidade > 0:
-            # MovimentacaoFerramenta.save() auto-atualiza LocalizacaoFerramenta
-            MovimentacaoFerramenta.objects.create(
-                ferramenta=loc.ferramenta,
-                quantidade=loc.quantidade,
-                tipo='retorno_deposito',
-                origem_tipo='obra',
-                obra_origem=obra,
-                destino_tipo='deposito',
-                responsavel=usuario,
-                observacoes=f'Retorno automático ao depósito — Obra "{obra.nome}" excluída',
-            )
-            qtd_retornadas += 1
+    if itens:
+        # Um retorno_deposito por ferramenta, gravados e aplicados em lote.
+        qtd_retornadas = len(movimentar_em_lote(
+            itens,
+            tipo='retorno_deposito',
+            responsavel=usuario,
+            obra_origem=obra,
+            observacoes=f'Retorno automático ao depósito — Obra "{obra.nome}" excluída',
+        ))
 
     # Excluir conferências de ferramentas vinculadas à obra
     ConferenciaFerramenta.objects.filter(obra=obra).delete()
@@ -1,4 +1,15 @@
 from django.contrib import admin
 
+from .models import ExportacaoJob
+
 # ProducaoDiaria foi removido — dados unificados em ApontamentoFuncionario.
 # Admin de relatórios agora registra ApontamentoFuncionario (já registrado em funcionarios/admin).
+
+
+@admin.register(ExportacaoJob)
+class ExportacaoJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'tipo', 'status', 'progresso', 'usuario', 'created_at', 'concluido_em']
+    list_filter = ['tipo', 'status']
+    search_fields = ['usuario__username', 'nome_arquivo']
+    readonly_fields = ['parametros', 'iniciado_em', 'concluido_em', 'created_at']
+    date_hierarchy = 'created_at'
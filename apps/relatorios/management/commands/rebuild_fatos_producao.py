@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.relatorios.models import FatoProducaoDiaria
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstroi a tabela de fatos de producao (FatoProducaoDiaria) a partir de "
+        "RegistroProducao. Normalmente nao e necessario: a tabela e mantida pelos signals."
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = FatoProducaoDiaria.reconstruir()
+        self.stdout.write(self.style.SUCCESS(f"Fatos de producao reconstruidos: {total}"))
@@ -0,0 +1,75 @@
+# Generated by Django 5.0.1 on 2026-10-17 17:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def popular_fatos(apps, schema_editor):
+    RegistroProducao = apps.get_model('funcionarios', 'RegistroProducao')
+    ApontamentoFuncionario = apps.get_model('funcionarios', 'ApontamentoFuncionario')
+    FatoProducaoDiaria = apps.get_model('relatorios', 'FatoProducaoDiaria')
+
+    apontamento = ApontamentoFuncionario.objects.filter(
+        funcionario_id=OuterRef('funcionario_id'),
+        obra_id=OuterRef('obra_id'),
+        data=OuterRef('data'),
+    )
+    linhas = (
+        RegistroProducao.objects
+        .annotate(_tem_apontamento=Exists(apontamento))
+        .values_list(
+            'pk', 'funcionario_id', 'obra_id', 'etapa_id',
+            'indicador', 'data', 'quantidade', '_tem_apontamento',
+        )
+        .order_by()
+    )
+    FatoProducaoDiaria.objects.bulk_create(
+        (
+            FatoProducaoDiaria(
+                registro_id=pk,
+                funcionario_id=funcionario_id,
+                obra_id=obra_id,
+                etapa_id=etapa_id,
+                indicador=indicador,
+                data=data,
+                quantidade=quantidade,
+                tem_apontamento=tem_apontamento,
+            )
+            for pk, funcionario_id, obra_id, etapa_id, indicador, data, quantidade, tem_apontamento
+            in linhas.iterator(chunk_size=2000)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funcionarios', '0024_alter_funcionario_funcao'),
+        ('obras', '0012_etapa1fundacao_aterro_contrapiso_inicio_and_more'),
+        ('relatorios', '0002_remove_producaodiaria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FatoProducaoDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('indicador', models.CharField(choices=[('alicerce_percentual', 'Levantar Alicerce (%)'), ('parede_7fiadas', 'Parede até 7 Fiadas (blocos)'), ('respaldo_conclusao', 'Respaldo - Conclusão (%)'), ('laje_conclusao', 'Laje - Conclusão (%)'), ('platibanda', 'Platibanda (metros lineares)'), ('cobertura_conclusao', 'Cobertura - Conclusão (%)'), ('reboco_externo', 'Reboco Externo (m²)'), ('reboco_interno', 'Reboco Interno (m²)')], max_length=30, verbose_name='Indicador')),
+                ('data', models.DateField(verbose_name='Data')),
+                ('quantidade', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Quantidade Produzida')),
+                ('tem_apontamento', models.BooleanField(default=False, verbose_name='Possui Apontamento')),
+                ('etapa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='fatos_producao', to='obras.etapa', verbose_name='Etapa')),
+                ('funcionario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fatos_producao', to='funcionarios.funcionario', verbose_name='Funcionário')),
+                ('obra', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fatos_producao', to='obras.obra', verbose_name='Obra')),
+                ('registro', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='fato', to='funcionarios.registroproducao', verbose_name='Registro de Produção')),
+            ],
+            options={
+                'verbose_name': 'Fato de Produção Diária',
+                'verbose_name_plural': 'Fatos de Produção Diária',
+                'indexes': [models.Index(fields=['indicador', 'data'], name='fato_prod_ind_data_idx'), models.Index(fields=['funcionario', 'data'], name='fato_prod_func_data_idx'), models.Index(fields=['obra', 'data'], name='fato_prod_obra_data_idx'), models.Index(fields=['funcionario', 'obra', 'data'], name='fato_prod_func_obra_data_idx')],
+            },
+        ),
+        migrations.RunPython(popular_fatos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.1 on 2026-10-17 17:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relatorios', '0003_fatoproducaodiaria'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportacaoJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('relatorio_producao_pdf', 'Relatório de Produção (PDF)'), ('relatorio_producao_excel', 'Relatório de Produção (Excel)'), ('ferramentas_pdf', 'Relatório de Ferramentas (PDF)'), ('ferramentas_xlsx', 'Relatório de Ferramentas (Excel)'), ('apontamentos_pdf', 'Relatório de Diárias (PDF)')], max_length=40, verbose_name='Tipo')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('processando', 'Processando'), ('concluido', 'Concluído'), ('erro', 'Erro')], default='pendente', max_length=20, verbose_name='Status')),
+                ('progresso', models.PositiveSmallIntegerField(default=0, verbose_name='Progresso (%)')),
+                ('parametros', models.JSONField(blank=True, default=dict, verbose_name='Parâmetros')),
+                ('arquivo', models.FileField(blank=True, upload_to='exportacoes/%Y/%m/', verbose_name='Arquivo')),
+                ('nome_arquivo', models.CharField(blank=True, max_length=150, verbose_name='Nome do Arquivo')),
+                ('mensagem_erro', models.TextField(blank=True, verbose_name='Mensagem de Erro')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True, verbose_name='Iniciado em')),
+                ('concluido_em', models.DateTimeField(blank=True, null=True, verbose_name='Concluído em')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='exportacoes', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Exportação',
+                'verbose_name_plural': 'Exportações',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['usuario', '-created_at'], name='exportacao_usuario_idx')],
+            },
+        ),
+    ]
@@ -1,3 +1,307 @@
 # Modelo ProducaoDiaria foi removido.
 # Toda a lógica de produção diária agora usa ApontamentoFuncionario
 # do app funcionarios como fonte única de dados.
+
+from django.contrib.auth.models import User
+from django.db import models
+from django.db.models import Exists, F, OuterRef, Q
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from apps.funcionarios.models import (
+    ApontamentoDiarioLote,
+    ApontamentoFuncionario,
+    RegistroProducao,
+    apontamentos_lote_gravados,
+)
+
+
+class FatoProducaoDiaria(models.Model):
+    """
+    Fato diário de produção (desnormalizado) para os rankings de relatórios.
+
+    Uma linha por RegistroProducao, com a marcação `tem_apontamento` já
+    calculada (existe ApontamentoFuncionario para o mesmo funcionário/obra/data).
+    Mantida incrementalmente pelos signals abaixo; `reconstruir()` refaz tudo.
+    """
+
+    registro = models.OneToOneField(
+        RegistroProducao,
+        on_delete=models.CASCADE,
+        related_name='fato',
+        verbose_name="Registro de Produção"
+    )
+    funcionario = models.ForeignKey(
+        'funcionarios.Funcionario',
+        on_delete=models.CASCADE,
+        related_name='fatos_producao',
+        verbose_name="Funcionário"
+    )
+    obra = models.ForeignKey(
+        'obras.Obra',
+        on_delete=models.CASCADE,
+        related_name='fatos_producao',
+        verbose_name="Obra"
+    )
+    etapa = models.ForeignKey(
+        'obras.Etapa',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='fatos_producao',
+        verbose_name="Etapa"
+    )
+    indicador = models.CharField(
+        max_length=30,
+        choices=RegistroProducao.INDICADOR_CHOICES,
+        verbose_name="Indicador"
+    )
+    data = models.DateField(verbose_name="Data")
+    quantidade = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        verbose_name="Quantidade Produzida"
+    )
+    tem_apontamento = models.BooleanField(
+        default=False,
+        verbose_name="Possui Apontamento"
+    )
+
+    class Meta:
+        verbose_name = "Fato de Produção Diária"
+        verbose_name_plural = "Fatos de Produção Diária"
+        indexes = [
+            models.Index(fields=['indicador', 'data'], name='fato_prod_ind_data_idx'),
+            models.Index(fields=['funcionario', 'data'], name='fato_prod_func_data_idx'),
+            models.Index(fields=['obra', 'data'], name='fato_prod_obra_data_idx'),
+            models.Index(fields=['funcionario', 'obra', 'data'], name='fato_prod_func_obra_data_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.funcionario_id} - {self.indicador} - {self.data}"
+
+    CAMPOS_SINCRONIZADOS = ['funcionario', 'obra', 'etapa', 'indicador', 'data', 'quantidade', 'tem_apontamento']
+
+    @staticmethod
+    def _apontamento_correspondente():
+        return ApontamentoFuncionario.objects.filter(
+            funcionario_id=OuterRef('funcionario_id'),
+            obra_id=OuterRef('obra_id'),
+            data=OuterRef('data'),
+        )
+
+    @classmethod
+    def sincronizar(cls, registros):
+        """
+        Grava (insert ou update) os fatos dos RegistroProducao do queryset
+        com um SELECT e um INSERT ... ON CONFLICT por bloco.
+        """
+        linhas = (
+            registros
+            .annotate(_tem_apontamento=Exists(cls._apontamento_correspondente()))
+            .values_list(
+                'pk', 'funcionario_id', 'obra_id', 'etapa_id',
+                'indicador', 'data', 'quantidade', '_tem_apontamento',
+            )
+            .order_by()
+        )
+        fatos = [
+            cls(
+                registro_id=pk,
+                funcionario_id=funcionario_id,
+                obra_id=obra_id,
+                etapa_id=etapa_id,
+                indicador=indicador,
+                data=data,
+                quantidade=quantidade,
+                tem_apontamento=tem_apontamento,
+            )
+            for pk, funcionario_id, obra_id, etapa_id, indicador, data, quantidade, tem_apontamento in linhas
+        ]
+        if fatos:
+            cls.objects.bulk_create(
+                fatos,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['registro'],
+                update_fields=cls.CAMPOS_SINCRONIZADOS,
+            )
+        return len(fatos)
+
+    @classmethod
+    def atualizar_apontamentos(cls, chaves):
+        """
+        Recalcula `tem_apontamento` dos fatos das chaves (funcionario_id, obra_id, data)
+        com um único UPDATE.
+        """
+        filtro = Q()
+        for funcionario_id, obra_id, data in set(chaves):
+            if funcionario_id and obra_id and data:
+                filtro |= Q(funcionario_id=funcionario_id, obra_id=obra_id, data=data)
+        if not filtro:
+            return 0
+        return cls.objects.filter(filtro).update(
+            tem_apontamento=Exists(cls._apontamento_correspondente())
+        )
+
+    @classmethod
+    def reconstruir(cls):
+        """Recria a tabela inteira a partir de RegistroProducao."""
+        cls.objects.all().delete()
+        return cls.sincronizar(RegistroProducao.objects.all())
+
+
+class ExportacaoJob(models.Model):
+    """
+    Geração de PDF/Excel fora da requisição.
+
+    A view cria o job com os parâmetros (querystring) da exportação; o executor
+    configurado em EXPORTACAO_EXECUTOR renderiza o arquivo em MEDIA_ROOT e a
+    tela de acompanhamento consulta o status até liberar o download.
+    """
+
+    TIPO_CHOICES = [
+        ('relatorio_producao_pdf', 'Relatório de Produção (PDF)'),
+        ('relatorio_producao_excel', 'Relatório de Produção (Excel)'),
+        ('ferramentas_pdf', 'Relatório de Ferramentas (PDF)'),
+        ('ferramentas_xlsx', 'Relatório de Ferramentas (Excel)'),
+        ('apontamentos_pdf', 'Relatório de Diárias (PDF)'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pendente', 'Pendente'),
+        ('processando', 'Processando'),
+        ('concluido', 'Concluído'),
+        ('erro', 'Erro'),
+    ]
+
+    tipo = models.CharField(max_length=40, choices=TIPO_CHOICES, verbose_name="Tipo")
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pendente',
+        verbose_name="Status"
+    )
+    progresso = models.PositiveSmallIntegerField(default=0, verbose_name="Progresso (%)")
+    parametros = models.JSONField(default=dict, blank=True, verbose_name="Parâmetros")
+    arquivo = models.FileField(upload_to='exportacoes/%Y/%m/', blank=True, verbose_name="Arquivo")
+    nome_arquivo = models.CharField(max_length=150, blank=True, verbose_name="Nome do Arquivo")
+    mensagem_erro = models.TextField(blank=True, verbose_name="Mensagem de Erro")
+    usuario = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='exportacoes',
+        verbose_name="Usuário"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Criado em")
+    iniciado_em = models.DateTimeField(null=True, blank=True, verbose_name="Iniciado em")
+    concluido_em = models.DateTimeField(null=True, blank=True, verbose_name="Concluído em")
+
+    class Meta:
+        verbose_name = "Exportação"
+        verbose_name_plural = "Exportações"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['usuario', '-created_at'], name='exportacao_usuario_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} - {self.get_status_display()}"
+
+    @property
+    def finalizado(self):
+        return self.status in ('concluido', 'erro')
+
+    def atualizar_progresso(self, progresso):
+        """Grava só o progresso (UPDATE direto) para a tela de acompanhamento."""
+        self.progresso = max(0, min(int(progresso), 100))
+        type(self).objects.filter(pk=self.pk).update(progresso=self.progresso)
+
+
+class VersaoDados(models.Model):
+    """
+    Contador de versão guardado no banco, compartilhado por todos os workers.
+
+    Os snapshots em cache usam a versão na chave; incrementá-la após o commit
+    invalida o snapshot em todos os processos, mesmo com cache local (locmem).
+    """
+
+    chave = models.CharField(max_length=100, unique=True, verbose_name="Chave")
+    valor = models.PositiveBigIntegerField(default=0, verbose_name="Versão")
+
+    class Meta:
+        verbose_name = "Versão dos Dados"
+        verbose_name_plural = "Versões dos Dados"
+
+    def __str__(self):
+        return f"{self.chave} = {self.valor}"
+
+    @classmethod
+    def atual(cls, chave):
+        return cls.objects.filter(chave=chave).values_list('valor', flat=True).first() or 0
+
+    @classmethod
+    def incrementar(cls, chave):
+        """Incrementa a versão com um UPDATE atômico (cria o contador na primeira vez)."""
+        if cls.objects.filter(chave=chave).update(valor=F('valor') + 1):
+            return
+        _, criado = cls.objects.get_or_create(chave=chave, defaults={'valor': 1})
+        if not criado:
+            cls.objects.filter(chave=chave).update(valor=F('valor') + 1)
+
+
+# ----------------- Manutenção incremental -----------------
+
+@receiver(post_save, sender=RegistroProducao)
+def sincronizar_fato_producao(sender, instance, **kwargs):
+    FatoProducaoDiaria.sincronizar(RegistroProducao.objects.filter(pk=instance.pk))
+
+
+# Exclusão de RegistroProducao remove o fato via CASCADE (OneToOne).
+
+
+@receiver(pre_save, sender=ApontamentoFuncionario)
+def guardar_chave_apontamento_anterior(sender, instance, **kwargs):
+    """Guarda funcionário/obra/data anteriores para atualizar o fato antigo em edições."""
+    instance._chave_fato_anterior = None
+    if instance.pk:
+        instance._chave_fato_anterior = (
+            ApontamentoFuncionario.objects.filter(pk=instance.pk)
+            .values_list('funcionario_id', 'obra_id', 'data')
+            .first()
+        )
+
+
+@receiver(post_save, sender=ApontamentoFuncionario)
+@receiver(post_delete, sender=ApontamentoFuncionario)
+def atualizar_fato_apos_apontamento(sender, instance, **kwargs):
+    chaves = [(instance.funcionario_id, instance.obra_id, instance.data)]
+    anterior = getattr(instance, '_chave_fato_anterior', None)
+    if anterior:
+        chaves.append(anterior)
+    FatoProducaoDiaria.atualizar_apontamentos(chaves)
+
+
+@receiver(apontamentos_lote_gravados, sender=ApontamentoDiarioLote)
+def sincronizar_fatos_lote(sender, lote, funcionario_ids, **kwargs):
+    FatoProducaoDiaria.sincronizar(
+        RegistroProducao.objects.filter(
+            obra_id=lote.obra_id,
+            data=lote.data,
+            funcionario_id__in=funcionario_ids,
+        )
+    )
+
+
+# ----------------- Invalidação do snapshot de relatórios -----------------
+
+@receiver(post_save, sender=RegistroProducao)
+@receiver(post_delete, sender=RegistroProducao)
+@receiver(post_save, sender=ApontamentoFuncionario)
+@receiver(post_delete, sender=ApontamentoFuncionario)
+@receiver(apontamentos_lote_gravados, sender=ApontamentoDiarioLote)
+def invalidar_snapshot_relatorios(sender, **kwargs):
+    from apps.relatorios.services.cache_relatorio import invalidar_relatorios
+    invalidar_relatorios()
@@ -3,13 +3,15 @@ Análises baseadas em RegistroProducao - Rankings por indicador específico.
 Este módulo substitui/complementa o analytics.py oferecendo detalhamento por indicador.
 """
 
+import heapq
 from collections import defaultdict
 from decimal import Decimal
 
-from django.db.models import Avg, Count, Sum, Q, Max, Min, Value, DecimalField, Exists, OuterRef
+from django.db.models import Avg, Count, Sum, Q, Max, Min, Value, DecimalField
 from django.db.models.functions import Coalesce
 
 from apps.funcionarios.models import RegistroProducao, Funcionario, ApontamentoFuncionario
+from apps.relatorios.models import FatoProducaoDiaria
 
 
 # Mapeamento de indicadores para etapas
@@ -92,21 +94,18 @@ UNIDADES_INDICADORES = {
 
 
 def _base_qs(filtros: dict | None = None):
-    """Retorna queryset base de RegistroProducao com filtros opcionais."""
+    """
+    Retorna queryset base de FatoProducaoDiaria com filtros opcionais.
+
+    Usa a tabela de fatos (uma linha por RegistroProducao) em vez de anotar
+    cada RegistroProducao com um Exists correlacionado: a marcação de
+    apontamento correspondente já vem gravada em `tem_apontamento`.
+    """
     # Mantém relatórios consistentes com apontamentos reais:
     # só considera registros de produção que ainda possuem apontamento correspondente.
-    apontamento_relacionado = ApontamentoFuncionario.objects.filter(
-        funcionario_id=OuterRef('funcionario_id'),
-        obra_id=OuterRef('obra_id'),
-        data=OuterRef('data'),
-    )
-
-    qs = (
-        RegistroProducao.objects
-        .filter(funcionario__funcao='pedreiro')
-        .annotate(_tem_apontamento=Exists(apontamento_relacionado))
-        .filter(_tem_apontamento=True)
-        .select_related('funcionario', 'obra', 'etapa')
+    qs = FatoProducaoDiaria.objects.filter(
+        tem_apontamento=True,
+        funcionario__funcao='pedreiro',
     )
     if not filtros:
         return qs
@@ -125,81 +124,105 @@ def _base_qs(filtros: dict | None = None):
     return qs
 
 
-def ranking_por_indicador(indicador, filtros=None, top=3, bottom=3):
+def _estatisticas_por_indicador(filtros=None, indicadores=None):
     """
-    Retorna ranking dos melhores e piores pedreiros para um indicador específico.
-    Calcula: média de quantidade produzida por dia trabalhado.
-    
-    CORREÇÃO CRÍTICA: Calcula média corretamente em Python!
-    
-    Args:
-        indicador: string do indicador (ex: 'alicerce_percentual', 'parede_7fiadas')
-        filtros: dict com filtros opcionais
-        top: quantidade de melhores
-        bottom: quantidade de piores
-    
+    Agrega produção por (indicador, funcionário) em UMA consulta.
+
     Returns:
-        dict com 'melhores' e 'piores', cada um com lista de pedreiros ordenados
+        dict {indicador: [{'funcionario_id', 'nome', 'media_producao', 'total_dias'}, ...]}
     """
-    qs = _base_qs(filtros).filter(
-        indicador=indicador,
-        quantidade__gt=0  # Ignora registros zerados
-    )
-    
-    # Agrupar por funcionário (SEM calcular média no Django)
+    qs = _base_qs(filtros).filter(quantidade__gt=0)  # Ignora registros zerados
+    if indicadores is not None:
+        qs = qs.filter(indicador__in=list(indicadores))
+
+    # Agrupar por indicador + funcionário (SEM calcular média no Django)
     stats = (
         qs
-        .values('funcionario_id', 'funcionario__nome_completo')
+        .values('indicador', 'funcionario_id', 'funcionario__nome_completo')
         .annotate(
             total_valor=Sum('quantidade'),
             total_dias=Count('data', distinct=True),
         )
         .order_by()
     )
-    
+
     # ===== CALCULAR MÉDIA CORRETAMENTE EM PYTHON =====
-    resultado_lista = []
+    por_indicador = defaultdict(list)
     for row in stats:
         total_valor = float(row['total_valor'] or 0)
         total_dias = int(row['total_dias'] or 0)
-        
+
         # Calcular média: Total ÷ Dias
         if total_dias > 0:
             media_producao = total_valor / total_dias
         else:
             media_producao = 0
-        
-        resultado_lista.append({
+
+        por_indicador[row['indicador']].append({
             'funcionario_id': row['funcionario_id'],
             'nome': row['funcionario__nome_completo'],
             'media_producao': round(media_producao, 2),  # ← MÉDIA CORRETA!
             'total_dias': total_dias,
         })
-    
-    # Ordenar por média (maior primeiro)
-    resultado_lista = sorted(resultado_lista, key=lambda x: x['media_producao'], reverse=True)
-    
+    return por_indicador
+
+
+def _chave_media(item):
+    return item['media_producao']
+
+
+def _montar_ranking(indicador, linhas, top=3, bottom=3, completo=True):
+    """
+    Monta o dict de ranking de um indicador a partir das linhas agregadas.
+    Melhores/piores saem de heaps (nlargest/nsmallest), sem ordenar a lista inteira;
+    a lista completa ordenada só é montada quando `completo=True`.
+    """
+    melhores = heapq.nlargest(top, linhas, key=_chave_media)
+    if len(linhas) > top:
+        # Piores em ordem decrescente (o pior por último)
+        piores = heapq.nsmallest(bottom, linhas, key=_chave_media)[::-1]
+    else:
+        # Poucos pedreiros: lista invertida (o pior primeiro)
+        piores = heapq.nsmallest(bottom, linhas, key=_chave_media)
+
     # Obter nome e unidade do indicador
     nome_indicador = dict(RegistroProducao.INDICADOR_CHOICES).get(indicador, indicador)
     unidade = UNIDADES_INDICADORES.get(indicador, '')
-    
-    return {
+
+    ranking = {
         'indicador': indicador,
         'nome': nome_indicador,
         'unidade': unidade,
-        'ranking': resultado_lista,  # Lista completa ordenada
-        'melhores': resultado_lista[:top],
-        'piores': resultado_lista[-bottom:] if len(resultado_lista) > top else resultado_lista[::-1][:bottom],
+        'melhores': melhores,
+        'piores': piores,
     }
+    if completo:
+        ranking['ranking'] = sorted(linhas, key=_chave_media, reverse=True)  # Lista completa ordenada
+    return ranking
 
 
-def ranking_geral_por_etapas(filtros=None, top=3, bottom=3):
+def ranking_por_indicador(indicador, filtros=None, top=3, bottom=3):
     """
-    Retorna rankings de TODOS os indicadores organizados por etapa.
+    Retorna ranking dos melhores e piores pedreiros para um indicador específico.
+    Calcula: média de quantidade produzida por dia trabalhado.
+    
+    CORREÇÃO CRÍTICA: Calcula média corretamente em Python!
+    
+    Args:
+        indicador: string do indicador (ex: 'alicerce_percentual', 'parede_7fiadas')
+        filtros: dict com filtros opcionais
+        top: quantidade de melhores
+        bottom: quantidade de piores
     
     Returns:
-        Lista de etapas, cada uma com seus indicadores e seus rankings
+        dict com 'melhores' e 'piores', cada um com lista de pedreiros ordenados
     """
+    estatisticas = _estatisticas_por_indicador(filtros, indicadores=[indicador])
+    return _montar_ranking(indicador, estatisticas.get(indicador, []), top, bottom)
+
+
+def _ranking_por_etapas(estatisticas, top=3, bottom=3):
+    """Organiza por etapa os rankings já agregados em `estatisticas`."""
     resultado = []
     
     for num_etapa, indicadores_info in sorted(INDICADORES_POR_ETAPA.items()):
@@ -211,7 +234,13 @@ def ranking_geral_por_etapas(filtros=None, top=3, bottom=3):
         
         for info_indicador in indicadores_info:
             indicador_codigo = info_indicador['indicador']
-            ranking = ranking_por_indicador(indicador_codigo, filtros, top, bottom)
+            ranking = _montar_ranking(
+                indicador_codigo,
+                estatisticas.get(indicador_codigo, []),
+                top,
+                bottom,
+                completo=False,
+            )
             
             # Só adiciona se tiver dados
             if ranking['melhores'] or ranking['piores']:
@@ -231,6 +260,22 @@ def ranking_geral_por_etapas(filtros=None, top=3, bottom=3):
     return resultado
 
 
+def ranking_geral_por_etapas(filtros=None, top=3, bottom=3):
+    """
+    Retorna rankings de TODOS os indicadores organizados por etapa.
+    Todos os indicadores saem de uma única agregação (indicador, funcionário).
+    
+    Returns:
+        Lista de etapas, cada uma com seus indicadores e seus rankings
+    """
+    indicadores = [
+        info['indicador']
+        for indicadores_info in INDICADORES_POR_ETAPA.values()
+        for info in indicadores_info
+    ]
+    return _ranking_por_etapas(_estatisticas_por_indicador(filtros, indicadores), top, bottom)
+
+
 def media_rendimento_por_pedreiro(filtros=None):
     """
     Retorna média geral de rendimento de cada pedreiro considerando TODOS os indicadores.
@@ -519,15 +564,16 @@ def gerar_relatorio_completo_indicadores(filtros=None):
         'reboco_interno',
     ]
     
-    # Gerar ranking para cada indicador
-    rankings_indicadores = {}
-    for indicador in indicadores:
-        ranking = ranking_por_indicador(indicador, filtros, top=10, bottom=0)
-        if ranking:  # Só incluir se houver dados
-            rankings_indicadores[indicador] = ranking
+    # Uma única agregação alimenta o ranking por etapas e os rankings por indicador
+    estatisticas = _estatisticas_por_indicador(filtros, indicadores)
+
+    rankings_indicadores = {
+        indicador: _montar_ranking(indicador, estatisticas.get(indicador, []), top=10, bottom=0)
+        for indicador in indicadores
+    }
     
     return {
-        'ranking_por_etapas': ranking_geral_por_etapas(filtros, top=3, bottom=3),
+        'ranking_por_etapas': _ranking_por_etapas(estatisticas, top=3, bottom=3),
         'media_dias_etapa': media_dias_por_etapa(filtros),
         'media_individual': media_rendimento_por_pedreiro(filtros),
         'rankings_indicadores': rankings_indicadores,  # NOVO: rankings separados por indicador
@@ -0,0 +1,81 @@
+"""
+Snapshot em cache do relatório completo por indicadores.
+
+O dashboard e as exportações (PDF/Excel) usam o mesmo relatório; o snapshot
+é guardado no cache do Django (locmem por padrão, Redis se REDIS_URL estiver
+configurado) com chave = filtros normalizados + versão dos dados.
+
+A versão é um contador no banco (VersaoDados), incrementado após o commit
+sempre que RegistroProducao ou ApontamentoFuncionario mudam. Por estar no
+banco, a invalidação vale para todos os workers mesmo com o cache locmem.
+Snapshots de versões antigas deixam de ser lidos e expiram sozinhos.
+"""
+
+import datetime
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from apps.relatorios.services.analytics_indicadores import gerar_relatorio_completo_indicadores
+
+
+CHAVE_VERSAO = 'relatorios:indicadores:versao'
+
+
+def _cache():
+    return caches[getattr(settings, 'RELATORIOS_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'RELATORIOS_CACHE_TIMEOUT', 600)
+
+
+def versao_dados():
+    """Versão atual dos dados de produção (uma leitura por chave única)."""
+    from apps.relatorios.models import VersaoDados
+    return VersaoDados.atual(CHAVE_VERSAO)
+
+
+def _incrementar_versao():
+    from apps.relatorios.models import VersaoDados
+    VersaoDados.incrementar(CHAVE_VERSAO)
+
+
+def invalidar_relatorios():
+    """Invalida os snapshots quando a transação atual for confirmada."""
+    transaction.on_commit(_incrementar_versao)
+
+
+def normalizar_filtros(filtros: dict | None) -> dict:
+    """Normaliza o dict de FiltroRelatorioForm.get_filtros() para uso em chave."""
+    normalizados = {}
+    for chave, valor in (filtros or {}).items():
+        if valor in (None, ''):
+            continue
+        if isinstance(valor, (datetime.date, datetime.datetime)):
+            valor = valor.isoformat()
+        normalizados[chave] = str(valor)
+    return normalizados
+
+
+def _chave_snapshot(filtros, versao):
+    serializado = json.dumps(normalizar_filtros(filtros), sort_keys=True)
+    digest = hashlib.sha1(serializado.encode('utf-8')).hexdigest()
+    return f'relatorios:indicadores:v{versao}:{digest}'
+
+
+def relatorio_completo_indicadores(filtros: dict | None = None) -> dict:
+    """
+    Retorna gerar_relatorio_completo_indicadores(filtros) a partir do snapshot
+    em cache, calculando e guardando apenas quando não houver snapshot válido.
+    """
+    cache = _cache()
+    chave = _chave_snapshot(filtros, versao_dados())
+    dados = cache.get(chave)
+    if dados is None:
+        dados = gerar_relatorio_completo_indicadores(filtros or None)
+        cache.set(chave, dados, timeout=_timeout())
+    return dados
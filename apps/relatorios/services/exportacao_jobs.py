@@ -0,0 +1,198 @@
+"""
+Fila de exportações (PDF/Excel) em segundo plano.
+
+`enfileirar_exportacao` cria o ExportacaoJob e o despacha para o executor
+definido em settings.EXPORTACAO_EXECUTOR:
+
+- 'celery': tarefa `apps.relatorios.tasks.gerar_exportacao` (requer broker);
+- 'thread': pool de threads local ao processo (padrão sem broker);
+- 'sync':   executa na própria chamada (testes / linha de comando).
+
+`executar_exportacao` é o ponto único de execução usado pelos três.
+"""
+
+import datetime
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.http import HttpRequest, QueryDict
+from django.utils import timezone
+
+from apps.relatorios.models import ExportacaoJob
+
+logger = logging.getLogger(__name__)
+
+# Parâmetros de controle que não fazem parte dos filtros da exportação.
+PARAMETROS_IGNORADOS = {'export', 'segundo_plano', 'page', 'page_media', 'page_apontamentos',
+                        'page_obra', 'page_ferramenta', 'page_historico'}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# ----------------- Renderizadores -----------------
+
+def _request_da_exportacao(job):
+    """Reconstrói um HttpRequest mínimo (GET + usuário) para reaproveitar os filtros das views."""
+    request = HttpRequest()
+    request.method = 'GET'
+    querystring = QueryDict(mutable=True)
+    for chave, valores in (job.parametros.get('GET') or {}).items():
+        querystring.setlist(chave, valores)
+    request.GET = querystring
+    request.user = job.usuario
+    return request
+
+
+def _timestamp():
+    return datetime.datetime.now().strftime('%Y%m%d_%H%M')
+
+
+def _relatorio_producao_filtros(job):
+    from apps.relatorios.forms import FiltroRelatorioForm
+
+    request = _request_da_exportacao(job)
+    form = FiltroRelatorioForm(request.GET or None)
+    return form.get_filtros() if form.is_valid() else {}
+
+
+def _renderizar_relatorio_producao_pdf(job):
+    from apps.relatorios.services.exports import exportar_pdf
+
+    filtros = _relatorio_producao_filtros(job)
+    job.atualizar_progresso(20)
+    return f'relatorio_producao_{_timestamp()}.pdf', exportar_pdf(filtros).getvalue()
+
+
+def _renderizar_relatorio_producao_excel(job):
+    from apps.relatorios.services.exports import exportar_excel
+
+    filtros = _relatorio_producao_filtros(job)
+    job.atualizar_progresso(20)
+    return f'relatorio_producao_{_timestamp()}.xlsx', exportar_excel(filtros).getvalue()
+
+
+def _renderizar_ferramentas_pdf(job):
+    from apps.ferramentas.views import _build_ferramenta_relatorio_data, _gerar_pdf_ferramenta_relatorio
+
+    context = _build_ferramenta_relatorio_data(_request_da_exportacao(job), paginate=False)
+    job.atualizar_progresso(40)
+    pdf = _gerar_pdf_ferramenta_relatorio(context, base_url=job.parametros.get('base_url'))
+    if pdf is None:
+        raise RuntimeError('Não foi possível gerar o PDF deste relatório.')
+    return 'relatorio_ferramentas.pdf', pdf
+
+
+def _renderizar_ferramentas_xlsx(job):
+    from apps.ferramentas.views import _build_ferramenta_relatorio_data, _exportar_ferramenta_relatorio_excel
+
+    context = _build_ferramenta_relatorio_data(_request_da_exportacao(job), paginate=False)
+    job.atualizar_progresso(40)
+    return 'relatorio_ferramentas.xlsx', _exportar_ferramenta_relatorio_excel(context).content
+
+
+def _renderizar_apontamentos_pdf(job):
+    from apps.funcionarios.views import _aplicar_filtros_apontamentos, _exportar_apontamentos_pdf
+
+    request = _request_da_exportacao(job)
+    response = _exportar_apontamentos_pdf(request, _aplicar_filtros_apontamentos(request))
+    return f'apontamentos_{timezone.now():%Y%m%d_%H%M%S}.pdf', response.content
+
+
+RENDERIZADORES = {
+    'relatorio_producao_pdf': _renderizar_relatorio_producao_pdf,
+    'relatorio_producao_excel': _renderizar_relatorio_producao_excel,
+    'ferramentas_pdf': _renderizar_ferramentas_pdf,
+    'ferramentas_xlsx': _renderizar_ferramentas_xlsx,
+    'apontamentos_pdf': _renderizar_apontamentos_pdf,
+}
+
+
+# ----------------- Execução -----------------
+
+def executar_exportacao(job_id):
+    """Renderiza o arquivo do job e grava o resultado (ou o erro) no próprio job."""
+    atualizados = ExportacaoJob.objects.filter(pk=job_id, status='pendente').update(
+        status='processando',
+        progresso=5,
+        iniciado_em=timezone.now(),
+    )
+    if not atualizados:
+        # Já executado (ou em execução) por outro worker.
+        return None
+
+    job = ExportacaoJob.objects.select_related('usuario').get(pk=job_id)
+    try:
+        nome_arquivo, conteudo = RENDERIZADORES[job.tipo](job)
+        job.atualizar_progresso(90)
+        job.nome_arquivo = nome_arquivo
+        job.arquivo.save(nome_arquivo, ContentFile(conteudo), save=False)
+        job.status = 'concluido'
+        job.progresso = 100
+    except Exception as exc:
+        logger.exception('Falha na exportação %s (%s)', job.pk, job.tipo)
+        job.status = 'erro'
+        job.mensagem_erro = str(exc) or exc.__class__.__name__
+    job.concluido_em = timezone.now()
+    job.save(update_fields=['status', 'progresso', 'arquivo', 'nome_arquivo', 'mensagem_erro', 'concluido_em'])
+    return job
+
+
+def _executar_em_thread(job_id):
+    try:
+        executar_exportacao(job_id)
+    finally:
+        close_old_connections()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'EXPORTACAO_THREADS', 2),
+                thread_name_prefix='exportacao',
+            )
+        return _pool
+
+
+def _despachar(job_id):
+    executor = getattr(settings, 'EXPORTACAO_EXECUTOR', 'thread')
+    if executor == 'sync':
+        executar_exportacao(job_id)
+    elif executor == 'celery':
+        from apps.relatorios.tasks import gerar_exportacao
+        transaction.on_commit(lambda: gerar_exportacao.delay(job_id))
+    else:
+        transaction.on_commit(lambda: _get_pool().submit(_executar_em_thread, job_id))
+
+
+def parametros_da_request(request):
+    """Querystring da exportação (sem paginação/controle) e URL base para recursos do PDF."""
+    return {
+        'GET': {
+            chave: request.GET.getlist(chave)
+            for chave in request.GET
+            if chave not in PARAMETROS_IGNORADOS
+        },
+        'base_url': request.build_absolute_uri('/'),
+    }
+
+
+def enfileirar_exportacao(tipo, request):
+    """Cria o job de exportação para a request atual e o envia ao executor."""
+    if tipo not in RENDERIZADORES:
+        raise ValueError(f'Tipo de exportação desconhecido: {tipo}')
+    job = ExportacaoJob.objects.create(
+        tipo=tipo,
+        parametros=parametros_da_request(request),
+        usuario=request.user if request.user.is_authenticated else None,
+    )
+    _despachar(job.pk)
+    if getattr(settings, 'EXPORTACAO_EXECUTOR', 'thread') == 'sync':
+        job.refresh_from_db()
+    return job
@@ -29,7 +29,7 @@ import openpyxl
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
 
-from apps.relatorios.services.analytics_indicadores import gerar_relatorio_completo_indicadores
+from apps.relatorios.services.cache_relatorio import relatorio_completo_indicadores
 
 
 # ═══════════════════════════════════════════
@@ -66,7 +66,7 @@ def _table_style():
 
 def exportar_pdf(filtros: dict | None = None) -> io.BytesIO:
     """Gera relatório completo em PDF e retorna BytesIO."""
-    dados = gerar_relatorio_completo_indicadores(filtros)
+    dados = relatorio_completo_indicadores(filtros)
     buf = io.BytesIO()
     doc = SimpleDocTemplate(
         buf,
@@ -207,7 +207,7 @@ def _auto_width(ws):
 
 def exportar_excel(filtros: dict | None = None) -> io.BytesIO:
     """Gera relatório completo em Excel e retorna BytesIO."""
-    dados = gerar_relatorio_completo_indicadores(filtros)
+    dados = relatorio_completo_indicadores(filtros)
     wb = openpyxl.Workbook()
 
     # ── Aba 1: Ranking ──
@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from apps.relatorios.services.exportacao_jobs import executar_exportacao
+
+
+@shared_task(name='relatorios.gerar_exportacao')
+def gerar_exportacao(job_id):
+    job = executar_exportacao(job_id)
+    return job.status if job else None
@@ -11,6 +11,10 @@ urlpatterns = [
     # Exportações
     path('exportar/pdf/', views.exportar_relatorio_pdf, name='exportar_pdf'),
     path('exportar/excel/', views.exportar_relatorio_excel, name='exportar_excel'),
+    # Exportações em segundo plano (PDF/Excel de qualquer módulo)
+    path('exportacoes/<int:pk>/', views.exportacao_detail, name='exportacao_detail'),
+    path('exportacoes/<int:pk>/status/', views.exportacao_status, name='exportacao_status'),
+    path('exportacoes/<int:pk>/download/', views.exportacao_download, name='exportacao_download'),
     # Relatório diário por funcionário (CSV)
     path('funcionario/diario/', views.relatorio_funcionario_diario, name='relatorio_funcionario_diario'),
 ]
@@ -3,15 +3,18 @@ import datetime
 
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
-from django.http import HttpResponse, JsonResponse
-from django.shortcuts import render
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
 
 from apps.funcionarios.models import ApontamentoFuncionario
 from apps.obras.models import Etapa
 from apps.relatorios.forms import FiltroRelatorioForm
+from apps.relatorios.models import ExportacaoJob
 from apps.relatorios.services.analytics import gerar_relatorio_completo, apontamentos_periodo
-from apps.relatorios.services.analytics_indicadores import gerar_relatorio_completo_indicadores
+from apps.relatorios.services.cache_relatorio import relatorio_completo_indicadores
 from apps.relatorios.services.exports import exportar_pdf, exportar_excel
+from apps.relatorios.services.exportacao_jobs import enfileirar_exportacao
 
 
 def _build_pagination_context(request, page_obj, param_name):
@@ -40,7 +43,7 @@ def relatorio_dashboard(request):
     filtros = form.get_filtros() if form.is_valid() else {}
     filtros_informados = bool(filtros)
 
-    dados = gerar_relatorio_completo_indicadores(filtros if filtros_informados else None)
+    dados = relatorio_completo_indicadores(filtros if filtros_informados else None)
     apontamentos = apontamentos_periodo(filtros if filtros_informados else None)
 
     media_individual_lista = dados['media_individual']
@@ -79,6 +82,10 @@ def relatorio_dashboard(request):
 @login_required
 def exportar_relatorio_pdf(request):
     """Exporta o relatório completo em PDF."""
+    if request.GET.get('segundo_plano'):
+        job = enfileirar_exportacao('relatorio_producao_pdf', request)
+        return redirect('relatorios:exportacao_detail', pk=job.pk)
+
     form = FiltroRelatorioForm(request.GET or None)
     filtros = form.get_filtros() if form.is_valid() else {}
 
@@ -93,6 +100,10 @@ def exportar_relatorio_pdf(request):
 @login_required
 def exportar_relatorio_excel(request):
     """Exporta o relatório completo em Excel."""
+    if request.GET.get('segundo_plano'):
+        job = enfileirar_exportacao('relatorio_producao_excel', request)
+        return redirect('relatorios:exportacao_detail', pk=job.pk)
+
     form = FiltroRelatorioForm(request.GET or None)
     filtros = form.get_filtros() if form.is_valid() else {}
 
@@ -183,3 +194,50 @@ def etapas_por_obra(request):
     data = [{'id': e.id, 'nome': e.get_numero_etapa_display()} for e in etapas]
     return JsonResponse({'etapas': data})
 
+
+# ==================== EXPORTAÇÕES EM SEGUNDO PLANO ====================
+
+def _exportacao_do_usuario(request, pk):
+    qs = ExportacaoJob.objects.all()
+    if not request.user.is_superuser:
+        qs = qs.filter(usuario=request.user)
+    return get_object_or_404(qs, pk=pk)
+
+
+def _status_exportacao(job):
+    return {
+        'id': job.pk,
+        'tipo': job.tipo,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'progresso': job.progresso,
+        'finalizado': job.finalizado,
+        'mensagem_erro': job.mensagem_erro,
+        'download_url': reverse('relatorios:exportacao_download', args=[job.pk]) if job.status == 'concluido' else None,
+    }
+
+
+@login_required
+def exportacao_detail(request, pk):
+    """Tela de acompanhamento de uma exportação (consulta o status até liberar o download)."""
+    job = _exportacao_do_usuario(request, pk)
+    return render(request, 'relatorios/exportacao_detail.html', {
+        'job': job,
+        'status_inicial': _status_exportacao(job),
+        'title': 'Exportação',
+    })
+
+
+@login_required
+def exportacao_status(request, pk):
+    """Status/progresso da exportação em JSON (polling)."""
+    return JsonResponse(_status_exportacao(_exportacao_do_usuario(request, pk)))
+
+
+@login_required
+def exportacao_download(request, pk):
+    """Download do arquivo gerado."""
+    job = _exportacao_do_usuario(request, pk)
+    if job.status != 'concluido' or not job.arquivo:
+        raise Http404('Exportação ainda não disponível.')
+    return FileResponse(job.arquivo.open('rb'), as_attachment=True, filename=job.nome_arquivo)
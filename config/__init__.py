@@ -1 +1,8 @@
 # Config package
+
+try:
+    from .celery import app as celery_app
+except ImportError:  # Celery é opcional: sem ele as exportações usam o executor local.
+    celery_app = None
+
+__all__ = ('celery_app',)
@@ -35,3 +35,62 @@ def resolve_area_from_request(app_name: str, view_name: str) -> str:
 
     return ''
 
+
+
+# ----------------- Resolução de permissões -----------------
+#
+# Todas as GroupAreaPermission dos grupos do usuário são lidas em uma única
+# consulta e reduzidas a um bitmap por área (view/create/edit/delete). O mapa
+# fica memorizado só na request: não há cache entre requests, para que uma
+# permissão revogada valha já na próxima request em qualquer worker.
+
+ACTION_BITS: Dict[str, int] = {
+    'view': 1,
+    'create': 2,
+    'edit': 4,
+    'delete': 8,
+}
+
+
+def _carregar_permissoes(user) -> Dict[str, int]:
+    try:
+        from apps.configuracoes.models import GroupAreaPermission
+    except Exception:
+        return {}
+
+    permissoes: Dict[str, int] = {}
+    linhas = GroupAreaPermission.objects.filter(group__user=user).values_list(
+        'area', 'can_view', 'can_create', 'can_edit', 'can_delete',
+    )
+    for area, can_view, can_create, can_edit, can_delete in linhas:
+        bits = (
+            (ACTION_BITS['view'] if can_view else 0)
+            | (ACTION_BITS['create'] if can_create else 0)
+            | (ACTION_BITS['edit'] if can_edit else 0)
+            | (ACTION_BITS['delete'] if can_delete else 0)
+        )
+        permissoes[area] = permissoes.get(area, 0) | bits
+    return permissoes
+
+
+def permissoes_por_area(user, request=None) -> Dict[str, int]:
+    """Mapa área -> bitmap de ações do usuário (uma consulta, memorizada na request)."""
+    if request is not None:
+        memorizado = getattr(request, '_permissoes_area', None)
+        if memorizado is not None and memorizado[0] == user.pk:
+            return memorizado[1]
+
+    permissoes = _carregar_permissoes(user)
+
+    if request is not None:
+        request._permissoes_area = (user.pk, permissoes)
+    return permissoes
+
+
+def has_area_permission(user, area: str, action: str, request=None) -> bool:
+    if not area:
+        return True
+    if user.is_superuser:
+        return True
+    bit = ACTION_BITS.get(action, ACTION_BITS['view'])
+    return bool(permissoes_por_area(user, request).get(area, 0) & bit)
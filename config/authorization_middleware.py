@@ -1,6 +1,6 @@
 from django.http import HttpResponseForbidden
 
-from config.access_control import resolve_area_from_request
+from config.access_control import has_area_permission, resolve_area_from_request
 
 
 class ModulePermissionMiddleware:
@@ -21,6 +21,11 @@ class ModulePermissionMiddleware:
 
     ALLOWED_VIEW_NAMES = {
         'funcionarios:set_theme',
+        # Exportações são criadas pelas views de cada módulo (já protegidas)
+        # e só ficam visíveis para o próprio usuário.
+        'relatorios:exportacao_detail',
+        'relatorios:exportacao_status',
+        'relatorios:exportacao_download',
     }
 
     def __init__(self, get_response):
@@ -45,38 +50,18 @@ class ModulePermissionMiddleware:
             return self.get_response(request)
 
         area = resolve_area_from_request(app_name, view_name)
-        if not self._has_area_permission(user, area, 'view'):
+        if not self._has_area_permission(user, area, 'view', request):
             return HttpResponseForbidden('Você não tem permissão para acessar este módulo.')
 
         required_action = self._required_action(request.method, view_name)
-        if request.method not in self.SAFE_METHODS and not self._has_area_permission(user, area, required_action):
+        if request.method not in self.SAFE_METHODS and not self._has_area_permission(user, area, required_action, request):
             return HttpResponseForbidden('Você não tem permissão para alterar dados neste módulo.')
 
         return self.get_response(request)
 
     @staticmethod
-    def _has_area_permission(user, area: str, action: str) -> bool:
-        if not area:
-            return True
-        if user.is_superuser:
-            return True
-        try:
-            from apps.configuracoes.models import GroupAreaPermission
-        except Exception:
-            return False
-
-        field_name = {
-            'view': 'can_view',
-            'create': 'can_create',
-            'edit': 'can_edit',
-            'delete': 'can_delete',
-        }.get(action, 'can_view')
-
-        return GroupAreaPermission.objects.filter(
-            group__user=user,
-            area=area,
-            **{field_name: True},
-        ).exists()
+    def _has_area_permission(user, area: str, action: str, request=None) -> bool:
+        return has_area_permission(user, area, action, request)
 
     @staticmethod
     def _required_action(method: str, view_name: str) -> str:
@@ -0,0 +1,14 @@
+"""
+Aplicação Celery do projeto (usada apenas quando CELERY_BROKER_URL está definido).
+
+Worker: celery -A config worker -l info
+"""
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+app = Celery('config')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -1,3 +1,6 @@
+from config.access_control import ACTION_BITS, permissoes_por_area
+
+
 def navigation_permissions(request):
     user = getattr(request, 'user', None)
 
@@ -22,13 +25,6 @@ def navigation_permissions(request):
             nav_perms[key] = True
         return {'nav_perms': nav_perms}
 
-    try:
-        from apps.configuracoes.models import GroupAreaPermission
-    except Exception:
-        nav_perms['admin'] = bool(user.is_staff)
-        nav_perms['configuracoes'] = bool(user.is_staff)
-        return {'nav_perms': nav_perms}
-
     area_map = {
         'obras': 'obras',
         'funcionarios': 'funcionarios',
@@ -38,12 +34,9 @@ def navigation_permissions(request):
         'analytics': 'analytics',
         'relatorios': 'relatorios',
     }
+    permissoes = permissoes_por_area(user, request)
     for nav_key, area in area_map.items():
-        nav_perms[nav_key] = GroupAreaPermission.objects.filter(
-            group__user=user,
-            area=area,
-            can_view=True,
-        ).exists()
+        nav_perms[nav_key] = bool(permissoes.get(area, 0) & ACTION_BITS['view'])
 
     nav_perms['fiscalizacao'] = False
     nav_perms['admin'] = bool(user.is_staff)
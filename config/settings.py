@@ -77,6 +77,7 @@ INSTALLED_APPS += [
     'apps.fornecedores',
     'apps.relatorios',
     'apps.configuracoes',
+    'apps.busca',
 ]
 
 MIDDLEWARE = [
@@ -168,6 +169,43 @@ STATICFILES_DIRS = [
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Cache (snapshots de relatórios, etc.)
+# Sem REDIS_URL usa cache local em memória (por processo). Com vários workers,
+# configure REDIS_URL para que a invalidação valha para todos.
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'construtora-default',
+        }
+    }
+
+# Snapshot do relatório por indicadores (segundos)
+RELATORIOS_CACHE_ALIAS = 'default'
+RELATORIOS_CACHE_TIMEOUT = config('RELATORIOS_CACHE_TIMEOUT', default=600, cast=int)
+
+# Exportações PDF/Excel em segundo plano
+# 'celery' (requer CELERY_BROKER_URL), 'thread' (pool local ao processo) ou 'sync'.
+CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='')
+CELERY_TASK_IGNORE_RESULT = True
+EXPORTACAO_EXECUTOR = config('EXPORTACAO_EXECUTOR', default='celery' if CELERY_BROKER_URL else 'thread')
+EXPORTACAO_THREADS = config('EXPORTACAO_THREADS', default=2, cast=int)
+
+# models.W040: o índice de cobertura apont_func_data_cov_idx de
+# ApontamentoFuncionario usa INCLUDE, que só o PostgreSQL suporta; nos outros
+# bancos (SQLite de desenvolvimento) ele é criado sem as colunas extras. O aviso
+# só é silenciado fora do PostgreSQL.
+if 'postgresql' not in DATABASES['default']['ENGINE']:
+    SILENCED_SYSTEM_CHECKS = ['models.W040']
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
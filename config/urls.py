@@ -22,6 +22,7 @@ urlpatterns = [
     path('analytics/', include('apps.analytics.urls')),
     path('relatorios/', include('apps.relatorios.urls')),
     path('configuracoes/', include('apps.configuracoes.urls')),
+    path('busca/', include('apps.busca.urls')),
     
     # Authentication
     path('accounts/', include('django.contrib.auth.urls')),
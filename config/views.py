@@ -1,6 +1,9 @@
 from django.contrib.auth.decorators import login_required
+from django.db import DatabaseError
 from django.shortcuts import redirect
 
+from config.access_control import has_area_permission
+
 
 @login_required
 def home_redirect(request):
@@ -22,13 +25,11 @@ def home_redirect(request):
     ]
 
     try:
-        from apps.configuracoes.models import GroupAreaPermission
         for area, route_name in ordered_modules:
-            if GroupAreaPermission.objects.filter(
-                group__user=user, area=area, can_view=True
-            ).exists():
+            if has_area_permission(user, area, 'view', request):
                 return redirect(route_name)
-    except Exception:
+    except DatabaseError:
+        # Tabela de permissões por área indisponível (ex.: migrações pendentes)
         for app_label, route_name in ordered_modules:
             if user.has_module_perms(app_label):
                 return redirect(route_name)